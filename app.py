@@ -1,15 +1,30 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, send_file
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, send_file, Response, stream_with_context, abort, g
+from werkzeug.security import safe_join
 from flask_session import Session
-from werkzeug.security import generate_password_hash, check_password_hash
 from redis import Redis
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
-from werkzeug.utils import secure_filename
-import calendar
-import pandas as pd
-import io
+import uuid
 import logging   # <--- ini baris import logging
+import skema
+import db
+import klasifikasi
+import kuota
+import rekap
+import ekspor
+import sandi
+import halaman
+import versi
+import unggahan
+import pratinjau
+import kalender
+import tugas
+import metrik
+import kompresi
+import sesi
+import cari
+import snapshot
+import notifikasi
 
 # setup logging
 logging.basicConfig(
@@ -39,8 +54,10 @@ if not SECRET_KEY:
 app.secret_key = SECRET_KEY
 
 # --- Konfigurasi Session ---
+# sqlite (default): tabel sesi di database utama, redis: Redis SESSION_REDIS (lihat sesi.py).
+# Jenis lain (misalnya filesystem) masih memakai Flask-Session.
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = os.getenv("SESSION_TYPE", "filesystem")
+app.config["SESSION_TYPE"] = os.getenv("SESSION_TYPE", "sqlite")
 
 # Cookie Hardening
 app.config["SESSION_COOKIE_HTTPONLY"] = True
@@ -53,16 +70,67 @@ app.config["SESSION_COOKIE_SECURE"] = bool(
 if app.config["SESSION_TYPE"] == "redis":
     app.config["SESSION_REDIS"] = Redis.from_url(os.getenv("SESSION_REDIS"))
 
-Session(app)
+if app.config["SESSION_TYPE"] not in ("sqlite", "redis"):
+    Session(app)
+
+# Dipakai template untuk memilih thumbnail atau tautan biasa
+app.jinja_env.globals['bisa_dipratinjau'] = pratinjau.bisa_dipratinjau
 
 # --- Konfigurasi Path Database ---
 DATABASE = os.getenv("DATABASE", "database.db")
 
+# --- Migrasi skema otomatis saat start (set AUTO_MIGRATE=0 untuk mematikan) ---
+if str(os.getenv("AUTO_MIGRATE", "1")).lower() in ("1", "true", "yes"):
+    versi_baru = skema.jalankan_migrasi(DATABASE)
+    if versi_baru:
+        app.logger.info(f"Migrasi skema diterapkan: {versi_baru}")
+
+# --- Koneksi Database (pool per worker, WAL) ---
+db.init_app(app, DATABASE)
+
+# --- Rute laporan membaca snapshot (LAPORAN_SNAPSHOT=1, diperbarui worker tugas.py; lihat snapshot.py) ---
+if snapshot.AKTIF:
+    db.atur_snapshot(snapshot.FILE)
+
+# --- Session server-side (setelah db.init_app karena memakai pool koneksi) ---
+if app.config["SESSION_TYPE"] == "sqlite":
+    sesi.init_app(app)
+elif app.config["SESSION_TYPE"] == "redis":
+    sesi.init_app(app, app.config["SESSION_REDIS"])
+
+# --- Notifikasi klarifikasi ke dashboard Kajur (SSE, lihat notifikasi.py) ---
+# Redis pub/sub kalau ada (wajib untuk lebih dari satu proses web), selain itu broker di memori proses.
+if os.getenv("NOTIFIKASI_REDIS"):
+    notifikasi.init_app(Redis.from_url(os.getenv("NOTIFIKASI_REDIS")))
+else:
+    notifikasi.init_app(app.config.get("SESSION_REDIS"))
+
+# --- Metrik latensi & SQL per request, dibaca lewat /metrics (lihat metrik.py) ---
+metrik.init_app(app)
+
+# --- Kompresi gzip/brotli untuk respons teks (lihat kompresi.py; KOMPRESI=0 untuk mematikan) ---
+kompresi.init_app(app)
+
+# --- Worker tugas latar belakang di dalam proses web (hanya untuk satu proses / development).
+# Di production jalankan proses terpisah: python tugas.py worker (lihat Procfile).
+if str(os.getenv("TUGAS_WORKER_INTERNAL", "0")).lower() in ("1", "true", "yes"):
+    tugas.mulai_thread_worker(DATABASE)
+
 # --- Fungsi Bantuan ---
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+def get_db_connection(readonly=False):
+    # Koneksi dipinjam dari pool sekali per request dan dikembalikan otomatis
+    # di teardown, jadi rute tidak perlu memanggil conn.close().
+    return db.get_db(readonly=readonly)
+
+def koneksi_laporan():
+    """(koneksi baca, koneksi tulis rekap_cache, waktu snapshot) untuk rute laporan.
+
+    Kalau yang terbaca snapshot, koneksi tulis None: grid yang belum ada di cache
+    dihitung tanpa disimpan (lihat snapshot.py).
+    """
+    conn = db.get_db_laporan()
+    data_per = snapshot.dibuat(conn)
+    return conn, (None if data_per else get_db_connection()), data_per
 
 # --- Rute Utama dan Login ---
 @app.route('/')
@@ -95,14 +163,18 @@ def login():
         nip = request.form['nip']
         password = request.form['password']
 
-        conn = get_db_connection()
-        user = conn.execute(
-            'SELECT * FROM users WHERE nip = ? AND password = ?',
-            (nip, password)
-        ).fetchone()
-        conn.close()
+        conn = get_db_connection(readonly=True)
+        user = conn.execute('SELECT * FROM users WHERE nip = ?', (nip,)).fetchone()
+
+        try:
+            password_cocok = user is not None and sandi.cocok(user['password'], password)
+        except sandi.ServerSibuk:
+            return render_template('login.html', error='Server sedang sibuk, silakan coba lagi sebentar.'), 503
+
+        if password_cocok:
+            # Password plaintext / hash lama di-upgrade tanpa menahan response
+            sandi.jadwalkan_rehash(user['nip'], user['password'], password)
 
-        if user:
             # Simpan data ke session
             session['user_id'] = user['nip']
             session['user_name'] = user['nama_lengkap']
@@ -155,9 +227,32 @@ def login_blocked():
 
 
 
+# --- Kebijakan Cache per Rute ---
+# Rute yang tidak terdaftar (semua halaman HTML yang butuh login) tetap no-store,
+# supaya tombol Back setelah logout tidak menampilkan halaman lama.
+#   'etag'      : JSON dengan weak ETag dari versi data (versi.jawab_json), dijawab 304 kalau belum berubah
+#   'immutable' : file upload; nama blob = hash isinya (unggahan.py), jadi isinya tidak pernah berubah
+# Rute bisa meminta no-store untuk satu respons dengan g.jangan_cache = True.
+UPLOAD_MAX_AGE = int(os.getenv("UPLOAD_MAX_AGE", str(365 * 24 * 3600)))
+KEBIJAKAN_CACHE = {
+    'get_absensi_summary': 'etag',
+    'api_absensi': 'etag',
+    'api_klarifikasi': 'etag',
+    'api_pengguna': 'etag',
+    'api_cuti': 'etag',
+    'api_cari': 'etag',
+    'uploaded_file': 'immutable',
+    'pratinjau_file': 'immutable',
+}
+
 # Handle Back Session 
 @app.after_request
 def add_no_cache_headers(response):
+    kebijakan = KEBIJAKAN_CACHE.get(request.endpoint)
+    if kebijakan and response.status_code in (200, 206, 304) and not g.get('jangan_cache'):
+        if kebijakan == 'immutable':
+            response.headers["Cache-Control"] = f"private, max-age={UPLOAD_MAX_AGE}, immutable"
+        return response
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, private, max-age=0"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
@@ -175,77 +270,32 @@ def dashboard_dosen():
 
     # --- SEMUA OPERASI DATABASE DILAKUKAN DI SINI ---
     
-    # 1. Mengambil data riwayat absensi
-    records_raw = conn.execute('SELECT *, rowid as id FROM attendance WHERE nip = ? ORDER BY tanggal DESC', (user_nip,)).fetchall()
+    # 1. Mengambil halaman pertama riwayat absensi (sisanya dimuat lewat /api/absensi)
+    processed_records, next_cursor = halaman_absensi(conn, user_nip)
     
     # 2. Mengambil jatah cuti tahunan dosen
     user_data = conn.execute("SELECT jatah_cuti_tahunan FROM users WHERE nip = ?", (user_nip,)).fetchone()
     
-    # 3. Menghitung total cuti yang sudah terpakai tahun ini
-    current_year = str(datetime.now().year)
-    total_cuti_terpakai_data = conn.execute(
-        """
-        SELECT COUNT(*) as total FROM attendance 
-        WHERE nip = ? 
-        AND status = 'Disetujui Kajur' 
-        AND keterangan LIKE '%Cuti%'
-        AND strftime('%Y', tanggal) = ?
-        """,
-        (user_nip, current_year)
-    ).fetchone()
+    # 3. Total cuti tahunan yang sudah terpakai tahun ini (dari ledger kuota)
+    total_cuti_terpakai = kuota.cuti_terpakai(conn, user_nip, datetime.now().year)
 
     # --- BLOK BARU: HITUNG KUOTA LUPA ABSEN BULAN INI ---
-    current_month = datetime.now().strftime('%Y-%m')
-    lupa_masuk_data = conn.execute("SELECT COUNT(*) as total FROM clarifications WHERE nip = ? AND jenis_surat = 'Lupa Absen Masuk' AND strftime('%Y-%m', tanggal_pengajuan) = ?", (user_nip, current_month)).fetchone()
-    lupa_pulang_data = conn.execute("SELECT COUNT(*) as total FROM clarifications WHERE nip = ? AND jenis_surat = 'Lupa Absen Pulang' AND strftime('%Y-%m', tanggal_pengajuan) = ?", (user_nip, current_month)).fetchone()
-    
-    lupa_masuk_count = lupa_masuk_data['total'] if lupa_masuk_data else 0
-    lupa_pulang_count = lupa_pulang_data['total'] if lupa_pulang_data else 0
+    pengajuan_bulan_ini = kuota.jumlah_klarifikasi(conn, user_nip, datetime.now().strftime('%Y-%m'))
+    lupa_masuk_count = pengajuan_bulan_ini.get('Lupa Absen Masuk', 0)
+    lupa_pulang_count = pengajuan_bulan_ini.get('Lupa Absen Pulang', 0)
     # --- AKHIR BLOK BARU ---
 
-    conn.close() 
 
     # --- KALKULASI DAN PEMROSESAN DATA (TANPA AKSES DB) ---
 
     jatah_cuti_tahunan = user_data['jatah_cuti_tahunan'] if user_data and user_data['jatah_cuti_tahunan'] is not None else 0
-    total_cuti_terpakai = total_cuti_terpakai_data['total'] if total_cuti_terpakai_data else 0
     sisa_cuti_tahunan = jatah_cuti_tahunan - total_cuti_terpakai
     
-    processed_records = []
-    # ... (Sisa dari blok pemrosesan Anda tidak diubah sama sekali)
-    for record in records_raw:
-        rec = dict(record)
-        rec['tanggal_formatted'] = datetime.strptime(rec['tanggal'], '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y')
-        jam_masuk, jam_pulang = rec.get('jam masuk'), rec.get('jam pulang')
-        time_fmt = '%H:%M:%S.%f'
-        rec['jam_masuk_formatted'] = datetime.strptime(jam_masuk, time_fmt).strftime('%H:%M') if jam_masuk else " - "
-        rec['jam_pulang_formatted'] = datetime.strptime(jam_pulang, time_fmt).strftime('%H:%M') if jam_pulang else " - "
-        status, keterangan = rec['status'], rec['keterangan']
-        
-        if status and status.strip() == "Menunggu Persetujuan Kajur":
-            rec.update({'status_text': 'Menunggu Persetujuan Kajur', 'status_color': 'yellow', 'checkbox_enabled': False})
-        elif status and status.strip() == "Disetujui Kajur":
-            if keterangan:
-                rec.update({'status_text': keterangan, 'status_color': 'green', 'checkbox_enabled': False})
-            else:
-                rec.update({'status_text': 'Disetujui Kajur', 'status_color': 'green', 'checkbox_enabled': False})
-        elif status and status.strip() == "Ditolak Kajur":
-            rec.update({'status_text': f"Ditolak: {keterangan}", 'status_color': 'red', 'checkbox_enabled': True})
-        elif jam_masuk and jam_pulang:
-            dur = datetime.strptime(jam_pulang, time_fmt) - datetime.strptime(jam_masuk, time_fmt)
-            if dur.total_seconds() >= 4 * 3600:
-                rec.update({'status_text': 'Kehadiran Terpenuhi', 'status_color': 'green', 'checkbox_enabled': False})
-            else:
-                rec.update({'status_text': 'Kehadiran Kurang Dari 4 Jam', 'status_color': 'red', 'checkbox_enabled': False})
-        else:
-            rec.update({'status_text': 'Perlu Klarifikasi', 'status_color': 'red', 'checkbox_enabled': True})
-        processed_records.append(rec)
-        
     # Mengirim semua data (termasuk data kuota) ke template
     return render_template(
         'dashboard_dosen.html',
         records=processed_records,
-        records_json=processed_records,
+        next_cursor=next_cursor,
         jatah_cuti=jatah_cuti_tahunan,
         cuti_terpakai=total_cuti_terpakai,
         sisa_cuti=sisa_cuti_tahunan,
@@ -273,20 +323,15 @@ def submit_klarifikasi():
 
         # --- BLOK BARU: VALIDASI BATAS MAKSIMAL PENGAJUAN ---
         if jenis_surat in ["Lupa Absen Masuk", "Lupa Absen Pulang"]:
-            current_month = datetime.now().strftime('%Y-%m')
             nip = session['user_id']
             
-            # Hitung berapa kali jenis surat ini sudah diajukan di bulan ini
-            count_data = conn.execute("""
-                SELECT COUNT(*) as total FROM clarifications 
-                WHERE nip = ? AND jenis_surat = ? AND strftime('%Y-%m', tanggal_pengajuan) = ?
-            """, (nip, jenis_surat, current_month)).fetchone()
-            
-            existing_count = count_data['total'] if count_data else 0
+            # Hitung berapa kali jenis surat ini sudah diajukan di bulan ini (dari ledger kuota)
+            pengajuan_bulan_ini = kuota.jumlah_klarifikasi(conn, nip, datetime.now().strftime('%Y-%m'))
+            existing_count = pengajuan_bulan_ini.get(jenis_surat, 0)
 
             # Jika sudah 2x atau lebih, gagalkan proses
-            if existing_count >= 2:
-                # Koneksi ditutup di dalam blok finally, jadi kita tidak perlu menutupnya di sini
+            if existing_count >= kuota.BATAS_LUPA_ABSEN:
+                # Koneksi dikembalikan ke pool otomatis di akhir request
                 flash(f"GAGAL: Anda sudah mencapai batas maksimal (2x) untuk pengajuan '{jenis_surat}' di bulan ini.", "error")
                 return redirect(url_for('dashboard_dosen'))
         # --- AKHIR BLOK BARU ---
@@ -296,19 +341,21 @@ def submit_klarifikasi():
         if 'file_bukti' in request.files:
             file = request.files['file_bukti']
             if file.filename != '':
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                filename = secure_filename(f"{session['user_id']}-{timestamp}-{file.filename}")
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
+                # Disimpan berdasarkan isi (sha256), file yang sama hanya tersimpan sekali
+                file_path = unggahan.simpan(file, app.config['UPLOAD_FOLDER'])
+                # Thumbnail & preview dibuat di latar belakang
+                pratinjau.antrekan(unggahan.path_file(file_path, app.config['UPLOAD_FOLDER']))
 
+        klarifikasi_baru = []
         for record_id in record_ids:
             att_rec = conn.execute("SELECT tanggal FROM attendance WHERE rowid = ?", (record_id,)).fetchone()
             if not att_rec:
                 continue
 
-            conn.execute("""
+            klarifikasi_baru.append(conn.execute("""
                 INSERT INTO clarifications (nip, nama_lengkap, jurusan, tanggal_klarifikasi, kategori_surat, jenis_surat, file_bukti)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
+                RETURNING *
             """, (
                 session.get('user_id'), 
                 session.get('user_name'),
@@ -317,23 +364,23 @@ def submit_klarifikasi():
                 request.form['kategori_surat'], 
                 request.form['jenis_surat'], 
                 file_path
-            ))
+            )).fetchone())
             
-            conn.execute("UPDATE attendance SET status = 'Menunggu Persetujuan Kajur', keterangan = '' WHERE rowid = ?", (record_id,))
+            conn.execute("UPDATE absensi SET status = 'Menunggu Persetujuan Kajur', keterangan = '' WHERE id = ?", (record_id,))
 
         conn.commit()
+        if klarifikasi_baru:
+            # Muncul langsung di dashboard Kajur jurusan ini
+            notifikasi.terbitkan(conn, session.get('user_jurusan'), 'baru',
+                                 klarifikasi=[notifikasi.data_klarifikasi(row) for row in klarifikasi_baru])
         flash("Klarifikasi berhasil diajukan dan sedang menunggu persetujuan.", "success")
 
     except Exception as e:
         if conn:
             conn.rollback()
         flash(f"Terjadi kesalahan saat mengajukan klarifikasi: {e}", "error")
-        print(f"ERROR submit_klarifikasi: {e}")
+        app.logger.exception("submit_klarifikasi gagal untuk %s", session.get('user_id'))
 
-    finally:
-        if conn:
-            conn.close()
-            
     return redirect(url_for('dashboard_dosen'))
 
 # --- Rute Kajur ---
@@ -345,11 +392,8 @@ def dashboard_kajur():
     kajur_jurusan = session['user_jurusan']
     conn = get_db_connection()
 
-    # 1. Ambil data klarifikasi yang menunggu (seperti sebelumnya)
-    pending_clarifications = conn.execute(
-        "SELECT * FROM clarifications WHERE status = 'Menunggu Kajur' AND jurusan = ?",
-        (kajur_jurusan,)
-    ).fetchall()
+    # 1. Ambil data klarifikasi yang menunggu. Perubahan berikutnya datang lewat /stream/klarifikasi
+    pending_clarifications = notifikasi.klarifikasi_menunggu(conn, kajur_jurusan)
 
     # 2. TAMBAHAN: Ambil daftar dosen di jurusan yang sama
     dosen_list = conn.execute(
@@ -357,44 +401,156 @@ def dashboard_kajur():
         (kajur_jurusan,)
     ).fetchall()
 
-    conn.close()
 
     # Kirim kedua data ke halaman HTML
     return render_template('dashboard_kajur.html', records=pending_clarifications, dosen_list=dosen_list)
 
+# Stream SSE antrean klarifikasi jurusan Kajur (lihat notifikasi.py)
+@app.route('/stream/klarifikasi')
+def stream_klarifikasi():
+    if 'user_role' not in session or session['user_role'] != 'Kajur':
+        return {"error": "Unauthorized"}, 403
+    # Menyambung ulang: browser mengirim id event terakhir (id klarifikasi terbesar yang sudah diterima)
+    setelah = request.headers.get('Last-Event-ID') or request.args.get('setelah') or 0
+    try:
+        setelah = max(0, int(setelah))
+    except ValueError:
+        setelah = 0
+    respons = notifikasi.stream(session['user_jurusan'], setelah)
+    if respons is None:
+        return {"error": "Terlalu banyak stream aktif, coba lagi nanti"}, 503, {"Retry-After": "30"}
+    return respons
+
+MAKS_KLARIFIKASI_MASSAL = 500
+
+def proses_klarifikasi_batch(conn, ids, action, alasan, jurusan):
+    """Setujui/tolak banyak klarifikasi dalam satu transaksi.
+
+    Hanya klarifikasi jurusan Kajur yang masih 'Menunggu Kajur' yang diproses.
+    Mengembalikan {id: 'ok' | 'tidak_ditemukan' | 'bukan_jurusan' | 'sudah_diproses'}.
+    """
+    # BEGIN IMMEDIATE: status yang dibaca di bawah tidak bisa berubah sampai commit
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            f"SELECT id, nip, tanggal_klarifikasi, jurusan, status FROM clarifications WHERE id IN ({', '.join('?' * len(ids))})",
+            ids
+        ).fetchall()
+        ditemukan = {row['id']: row for row in rows}
+
+        hasil, diproses = {}, []
+        for clarification_id in ids:
+            rec = ditemukan.get(clarification_id)
+            if rec is None:
+                hasil[clarification_id] = 'tidak_ditemukan'
+            elif rec['jurusan'] != jurusan:
+                hasil[clarification_id] = 'bukan_jurusan'
+            elif rec['status'] != 'Menunggu Kajur':
+                hasil[clarification_id] = 'sudah_diproses'
+            else:
+                hasil[clarification_id] = 'ok'
+                diproses.append((clarification_id, rec['nip'], skema.nomor_hari(rec['tanggal_klarifikasi'])))
+
+        if action == 'setuju':
+            conn.executemany("UPDATE clarifications SET status = 'Disetujui', tanggal_proses = CURRENT_TIMESTAMP WHERE id = ?",
+                             [(cid,) for cid, _, _ in diproses])
+            conn.executemany("UPDATE absensi SET status = 'Disetujui Kajur' WHERE nip = ? AND nomor_hari = ?",
+                             [(nip, hari) for _, nip, hari in diproses])
+        else:
+            conn.executemany("UPDATE clarifications SET status = 'Ditolak', alasan_penolakan = ?, tanggal_proses = CURRENT_TIMESTAMP WHERE id = ?",
+                             [(alasan, cid) for cid, _, _ in diproses])
+            conn.executemany("UPDATE absensi SET status = 'Ditolak Kajur', keterangan = ? WHERE nip = ? AND nomor_hari = ?",
+                             [(alasan, nip, hari) for _, nip, hari in diproses])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if diproses:
+        # Hilang dari antrean dashboard Kajur lain di jurusan yang sama
+        notifikasi.terbitkan(conn, jurusan, 'diproses', ids=[cid for cid, _, _ in diproses],
+                             status='Disetujui' if action == 'setuju' else 'Ditolak')
+    return hasil
+
+# Pesan flash untuk hasil proses_klarifikasi_batch selain 'ok'
+PESAN_GAGAL_KLARIFIKASI = {
+    'tidak_ditemukan': "GAGAL: Klarifikasi tidak ditemukan.",
+    'bukan_jurusan': "GAGAL: Klarifikasi ini bukan dari jurusan Anda.",
+    'sudah_diproses': "GAGAL: Klarifikasi ini sudah diproses sebelumnya.",
+}
+
 @app.route('/proses_klarifikasi', methods=['POST'])
 def proses_klarifikasi():
     if 'user_role' not in session or session['user_role'] != 'Kajur':
         return redirect(url_for('login'))
     
-    clarification_id = request.form['clarification_id']
+    try:
+        clarification_id = int(request.form.get('clarification_id'))
+    except (TypeError, ValueError):
+        flash("Klarifikasi tidak valid.", "error")
+        return redirect(url_for('dashboard_kajur'))
     action = request.form.get('action')
-    conn = get_db_connection()
-    clarif_rec = conn.execute("SELECT * FROM clarifications WHERE id = ?", (clarification_id,)).fetchone()
-    dosen_nip, att_date = clarif_rec['nip'], clarif_rec['tanggal_klarifikasi'].split(' ')[0]
-    
-    if action == 'setuju':
-        conn.execute("UPDATE clarifications SET status = 'Disetujui', tanggal_proses = CURRENT_TIMESTAMP WHERE id = ?", (clarification_id,))
-        conn.execute("UPDATE attendance SET status = 'Disetujui Kajur' WHERE nip = ? AND date(tanggal) = ?", (dosen_nip, att_date))
-    elif action == 'tolak':
-        alasan = request.form.get('alasan_penolakan', '')
-        conn.execute("UPDATE clarifications SET status = 'Ditolak', alasan_penolakan = ?, tanggal_proses = CURRENT_TIMESTAMP WHERE id = ?", (alasan, clarification_id))
-        conn.execute("UPDATE attendance SET status = 'Ditolak Kajur', keterangan = ? WHERE nip = ? AND date(tanggal) = ?", (alasan, dosen_nip, att_date))
-    
-    conn.commit()
-    conn.close()
+    if action not in ('setuju', 'tolak'):
+        flash("Aksi harus 'setuju' atau 'tolak'.", "error")
+        return redirect(url_for('dashboard_kajur'))
+
+    hasil = proses_klarifikasi_batch(get_db_connection(), [clarification_id], action,
+                                     request.form.get('alasan_penolakan', ''), session['user_jurusan'])
+    if hasil[clarification_id] == 'ok':
+        flash("Klarifikasi disetujui." if action == 'setuju' else "Klarifikasi ditolak.", "success")
+    else:
+        flash(PESAN_GAGAL_KLARIFIKASI[hasil[clarification_id]], "error")
     return redirect(url_for('dashboard_kajur'))
 
+# Versi massal: JSON {"ids": [..], "action": "setuju"|"tolak", "alasan": ".."}
+# -> {"hasil": {"<id>": "ok" | "tidak_ditemukan" | "bukan_jurusan" | "sudah_diproses"}, "diproses": n}
+@app.route('/proses_klarifikasi_massal', methods=['POST'])
+def proses_klarifikasi_massal():
+    if 'user_role' not in session or session['user_role'] != 'Kajur':
+        return {"error": "Unauthorized"}, 403
+
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    alasan = (data.get('alasan') or '').strip()
+    try:
+        ids = list(dict.fromkeys(int(i) for i in data.get('ids') or []))
+    except (TypeError, ValueError):
+        return {"error": "ids harus berupa daftar angka"}, 400
+
+    if action not in ('setuju', 'tolak'):
+        return {"error": "action harus 'setuju' atau 'tolak'"}, 400
+    if action == 'tolak' and not alasan:
+        return {"error": "Alasan penolakan wajib diisi"}, 400
+    if not ids or len(ids) > MAKS_KLARIFIKASI_MASSAL:
+        return {"error": f"Jumlah klarifikasi harus 1 sampai {MAKS_KLARIFIKASI_MASSAL}"}, 400
+
+    hasil = proses_klarifikasi_batch(get_db_connection(), ids, action, alasan, session['user_jurusan'])
+    return {"hasil": hasil, "diproses": sum(1 for h in hasil.values() if h == 'ok')}
+
 # --- Rute Admin ---
 @app.route('/dashboard_admin')
 def dashboard_admin():
     if 'user_role' not in session or session['user_role'] != 'Admin':
         return redirect(url_for('login'))
-    conn = get_db_connection()
-    all_users = conn.execute("SELECT * FROM users ORDER BY role, nama_lengkap").fetchall()
-    all_history = conn.execute("SELECT * FROM clarifications ORDER BY tanggal_pengajuan DESC").fetchall()
-    conn.close()
-    return render_template('dashboard_admin.html', users=all_users, histories=all_history)
+    conn = get_db_connection(readonly=True)
+    # Halaman pertama saja; sisanya dimuat lewat /api/pengguna
+    users, next_cursor = halaman_pengguna(conn)
+    snapshot_dibuat = snapshot.dibuat(db.get_db_laporan()) if snapshot.AKTIF else None
+    return render_template('dashboard_admin.html', users=users, next_cursor=next_cursor,
+                           snapshot_aktif=snapshot.AKTIF, snapshot_dibuat=snapshot_dibuat)
+
+# Statistik pemakaian pool koneksi database untuk worker yang melayani request ini
+@app.route('/statistik_db')
+def statistik_db():
+    if 'user_role' not in session or session['user_role'] != 'Admin':
+        return {"error": "Unauthorized"}, 403
+    return db.statistik_pool()
+
+# Metrik Prometheus: admin yang login, atau scraper dengan "Authorization: Bearer $METRICS_TOKEN"
+@app.route('/metrics')
+def metrics():
+    if not metrik.boleh_akses():
+        return {"error": "Unauthorized"}, 403
+    return Response(metrik.teks_prometheus(sesi.statistik_aktif(app), notifikasi.statistik()), mimetype='text/plain; version=0.0.4')
 
 @app.route('/tambah_pengguna', methods=['GET', 'POST'])
 def tambah_pengguna():
@@ -408,7 +564,7 @@ def tambah_pengguna():
         detail_jurusan = request.form['detail_jurusan']
         role = request.form['role']
         conn = get_db_connection()
-        hashed_password = generate_password_hash(password)
+        hashed_password = sandi.buat_hash(password)
         conn.execute("""
             INSERT INTO users (nip, password, nama_lengkap, jurusan, "detail jurusan", role)
             VALUES (?, ?, ?, ?, ?, ?)
@@ -418,7 +574,6 @@ def tambah_pengguna():
         #     VALUES (?, ?, ?, ?, ?, ?)
         # """, (nip, password, nama_lengkap, jurusan, detail_jurusan, role))
         conn.commit()
-        conn.close()
         return redirect(url_for('dashboard_admin'))
     return render_template('tambah_pengguna.html')
 
@@ -442,48 +597,44 @@ def input_cuti():
         # 1. Validasi NIP
         dosen_info = conn.execute("SELECT * FROM users WHERE nip = ?", (nip,)).fetchone()
         if not dosen_info:
-            conn.close()
             flash(f"GAGAL: NIP '{nip}' tidak ditemukan di database.", "error")
             return redirect(url_for('input_cuti'))
 
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-        
-        # 2. Validasi setiap tanggal absensi sebelum diproses
+        if end_date < start_date:
+            flash("GAGAL: Tanggal selesai tidak boleh sebelum tanggal mulai.", "error")
+            return redirect(url_for('input_cuti'))
+
+        # 2. Validasi semua hari kerja dalam rentang sekaligus: satu query kalender JOIN absensi.
+        #    Akhir pekan dan hari libur (tabel kalender, lihat kalender.py) dilewati.
+        hari_rentang = kalender.hari_cuti(conn, nip, start_date_str, end_date_str)
+        if len(hari_rentang) != (end_date - start_date).days + 1:
+            flash(f"GAGAL: Rentang tanggal di luar kalender. Jalankan: python kalender.py isi {start_date.year} {end_date.year}", "error")
+            return redirect(url_for('input_cuti'))
+
         dates_to_update = []
-        current_date_check = start_date
-        while current_date_check <= end_date:
-            if current_date_check.weekday() < 5: # 0=Senin, 4=Jumat
-                date_str_check = current_date_check.strftime('%Y-%m-%d')
-                
-                record = conn.execute("SELECT rowid, \"jam masuk\", \"jam pulang\" FROM attendance WHERE nip = ? AND date(tanggal) = ?", (nip, date_str_check)).fetchone()
-                
-                if not record or (record['jam masuk'] is not None or record['jam pulang'] is not None):
-                    conn.close()
-                    error_reason = "sudah terisi (Kehadiran Terpenuhi atau Perlu Klarifikasi)"
-                    if not record:
-                        error_reason = "tidak ditemukan"
-                    
-                    flash(f"GAGAL: Input cuti untuk tanggal {date_str_check} tidak diizinkan karena data absensi {error_reason}.", "error")
-                    return redirect(url_for('input_cuti'))
-                
-                dates_to_update.append(record['rowid'])
-            current_date_check += timedelta(days=1)
+        for hari in hari_rentang:
+            if not hari['hari_kerja']:
+                continue
+            if hari['id_absensi'] is None or hari['jam_masuk'] is not None or hari['jam_pulang'] is not None:
+                error_reason = "sudah terisi (Kehadiran Terpenuhi atau Perlu Klarifikasi)"
+                if hari['id_absensi'] is None:
+                    error_reason = "tidak ditemukan"
+
+                flash(f"GAGAL: Input cuti untuk tanggal {hari['tanggal']} tidak diizinkan karena data absensi {error_reason}.", "error")
+                return redirect(url_for('input_cuti'))
+
+            dates_to_update.append(hari['id_absensi'])
         
         # 3. Validasi sisa cuti jika jenisnya 'Cuti Tahunan'
         requested_workdays = len(dates_to_update)
         if jenis_cuti == 'Cuti Tahunan':
             user_data = conn.execute("SELECT jatah_cuti_tahunan FROM users WHERE nip = ?", (nip,)).fetchone()
             jatah_cuti_tahunan = user_data['jatah_cuti_tahunan']
-            current_year = str(datetime.now().year)
-            total_cuti_terpakai_data = conn.execute(
-                "SELECT COUNT(*) as total FROM attendance WHERE nip = ? AND status = 'Disetujui Kajur' AND keterangan LIKE '%Cuti Tahunan%' AND strftime('%Y', tanggal) = ?",
-                (nip, current_year)
-            ).fetchone()
-            total_cuti_terpakai = total_cuti_terpakai_data['total']
+            total_cuti_terpakai = kuota.cuti_terpakai(conn, nip, datetime.now().year)
             sisa_cuti = jatah_cuti_tahunan - total_cuti_terpakai
             if requested_workdays > sisa_cuti:
-                conn.close()
                 flash(f"GAGAL: Jatah cuti tidak cukup. Sisa {sisa_cuti}, diminta {requested_workdays}.", "error")
                 return redirect(url_for('input_cuti'))
 
@@ -492,9 +643,9 @@ def input_cuti():
         if 'file_surat_cuti' in request.files:
             file = request.files['file_surat_cuti']
             if file.filename != '':
-                filename = secure_filename(f"cuti-{nip}-{file.filename}")
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
+                file_path = unggahan.simpan(file, app.config['UPLOAD_FOLDER'])
+                # Thumbnail & preview dibuat di latar belakang
+                pratinjau.antrekan(unggahan.path_file(file_path, app.config['UPLOAD_FOLDER']))
         
         conn.execute("""
             INSERT INTO cuti_dosen (nip, nama_lengkap, tanggal_surat, tanggal_mulai, tanggal_selesai, 
@@ -505,21 +656,46 @@ def input_cuti():
         
         keterangan_lengkap = f"{jenis_cuti} - {alasan_cuti}" if alasan_cuti else jenis_cuti
         
-        for row_id in dates_to_update:
-            conn.execute("UPDATE attendance SET status = 'Disetujui Kajur', keterangan = ? WHERE rowid = ?", (keterangan_lengkap, row_id))
+        conn.executemany("UPDATE absensi SET status = 'Disetujui Kajur', keterangan = ? WHERE id = ?",
+                         [(keterangan_lengkap, row_id) for row_id in dates_to_update])
         
         conn.commit()
-        conn.close()
         flash(f"Cuti berhasil diperbarui untuk {requested_workdays} hari kerja.", "success")
         return redirect(url_for('input_cuti'))
 
-    # Bagian GET (menampilkan halaman)
+    # Bagian GET (menampilkan halaman). Pilihan dosen diambil saat mengetik lewat /api/cari/dosen
     conn = get_db_connection()
-    dosen_rows = conn.execute("SELECT nip, nama_lengkap FROM users WHERE role = 'Dosen' ORDER BY nama_lengkap").fetchall()
-    list_dosen = [dict(row) for row in dosen_rows]
-    history_cuti = conn.execute("SELECT * FROM cuti_dosen ORDER BY tanggal_input DESC").fetchall()
-    conn.close()
-    return render_template('input_cuti.html', list_dosen=list_dosen, histories=history_cuti)
+    history_cuti, next_cursor = halaman_cuti(conn)
+    return render_template('input_cuti.html', histories=history_cuti, next_cursor=next_cursor)
+
+# Kalender hari kerja: impor hari libur nasional / cuti bersama dari file CSV atau ICS
+@app.route('/kalender', methods=['GET', 'POST'])
+def kalender_libur():
+    if 'user_role' not in session or session['user_role'] != 'Admin':
+        return redirect(url_for('login'))
+
+    if request.method == 'POST':
+        file = request.files.get('file_libur')
+        if not file or file.filename == '':
+            flash("GAGAL: Pilih file CSV atau ICS terlebih dahulu.", "error")
+            return redirect(url_for('kalender_libur'))
+        try:
+            libur = kalender.baca_file(file.filename, file.read())
+        except kalender.FormatTidakValid as e:
+            flash(f"GAGAL: {e}", "error")
+            return redirect(url_for('kalender_libur'))
+        conn = get_db_connection()
+        jumlah = kalender.impor(conn, libur)
+        conn.commit()
+        tahun = min(d.year for d, _ in libur) if libur else datetime.now().year
+        flash(f"{jumlah} tanggal libur berhasil diimpor.", "success")
+        return redirect(url_for('kalender_libur', tahun=tahun))
+
+    tahun = request.args.get('tahun', type=int) or datetime.now().year
+    conn = get_db_connection(readonly=True)
+    jumlah_hari_kerja, _ = kalender.info_rentang(conn, *skema.rentang_tahun(tahun))
+    return render_template('kalender.html', tahun=tahun, libur=kalender.daftar_libur(conn, tahun),
+                           jumlah_hari_kerja=jumlah_hari_kerja)
 
 # TAMBAHKAN FUNGSI BARU INI UNTUK FITUR POP-UP
 @app.route('/get_absensi_summary/<nip>')
@@ -527,7 +703,13 @@ def get_absensi_summary(nip):
     if 'user_role' not in session or (session['user_role'] != 'Admin' and session['user_role'] != 'Kajur'):
         return {"error": "Unauthorized"}, 403
 
-    conn = get_db_connection()
+    conn, _, data_per = koneksi_laporan()
+    # Isi respons hanya bergantung pada data NIP ini (absensi, ledger cuti, users), tahun berjalan
+    # dan snapshot yang dibaca
+    bagian_etag = ('summary', nip, datetime.now().year, data_per) + versi.ambil(conn, f'nip:{nip}')
+    return versi.jawab_json(bagian_etag, lambda: dict(hitung_absensi_summary(conn, nip), data_per=data_per))
+
+def hitung_absensi_summary(conn, nip):
     dosen = conn.execute("SELECT nama_lengkap FROM users WHERE nip = ?", (nip,)).fetchone()
     nama_lengkap = dosen['nama_lengkap'] if dosen else 'Tidak Ditemukan'
 
@@ -536,66 +718,25 @@ def get_absensi_summary(nip):
     user_data = conn.execute("SELECT jatah_cuti_tahunan FROM users WHERE nip = ?", (nip,)).fetchone()
     jatah_cuti_tahunan = user_data['jatah_cuti_tahunan'] if user_data and user_data['jatah_cuti_tahunan'] is not None else 0
     
-    current_year = str(datetime.now().year)
-    total_cuti_terpakai_data = conn.execute(
-        """
-        SELECT COUNT(*) as total FROM attendance 
-        WHERE nip = ? 
-        AND status = 'Disetujui Kajur' 
-        AND keterangan LIKE '%Cuti%'
-        AND strftime('%Y', tanggal) = ?
-        """,
-        (nip, current_year)
-    ).fetchone()
-    total_cuti_terpakai = total_cuti_terpakai_data['total'] if total_cuti_terpakai_data else 0
+    total_cuti_terpakai = kuota.cuti_terpakai(conn, nip, datetime.now().year)
     sisa_cuti_tahunan = jatah_cuti_tahunan - total_cuti_terpakai
     # --- AKHIR BLOK BARU ---
 
     last_month_record = conn.execute(
-        "SELECT strftime('%Y-%m', tanggal) as last_month FROM attendance WHERE nip = ? ORDER BY tanggal DESC LIMIT 1",
+        f"SELECT {skema.SQL_TANGGAL.format('MAX(nomor_hari)')} FROM absensi WHERE nip = ?",
         (nip,)
     ).fetchone()
 
     processed_records = []
-    if last_month_record:
-        target_month = last_month_record['last_month']
+    if last_month_record[0]:
+        target_month = last_month_record[0][:7]
+        awal_bulan, akhir_bulan = skema.rentang_bulan_hari(target_month)
         records_raw = conn.execute(
-            "SELECT * FROM attendance WHERE nip = ? AND strftime('%Y-%m', tanggal) = ? ORDER BY tanggal DESC", 
-            (nip, target_month)
+            "SELECT * FROM absensi WHERE nip = ? AND nomor_hari >= ? AND nomor_hari < ? ORDER BY nomor_hari DESC",
+            (nip, awal_bulan, akhir_bulan)
         ).fetchall()
 
-        # ... (Sisa dari blok pemrosesan absensi Anda tidak berubah sama sekali) ...
-        time_fmt = '%H:%M:%S.%f'
-        for record in records_raw:
-            rec = dict(record)
-            rec['tanggal_formatted'] = datetime.strptime(rec['tanggal'], '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y')
-            jam_masuk, jam_pulang = rec.get('jam masuk'), rec.get('jam pulang')
-            status, keterangan = rec['status'], rec['keterangan']
-            rec['jam_masuk_formatted'] = datetime.strptime(jam_masuk, time_fmt).strftime('%H:%M') if jam_masuk else "-"
-            rec['jam_pulang_formatted'] = datetime.strptime(jam_pulang, time_fmt).strftime('%H:%M') if jam_pulang else "-"
-            if status == "Disetujui Kajur":
-                rec['status_text'] = keterangan if keterangan else "Disetujui Kajur"
-                rec['status_color'] = "status-green"
-            elif status == "Ditolak Kajur":
-                rec['status_text'] = f"Ditolak: {keterangan}"
-                rec['status_color'] = "status-red"
-            elif status == "Menunggu Persetujuan Kajur":
-                rec['status_text'] = "Menunggu Persetujuan"
-                rec['status_color'] = "status-yellow"
-            elif jam_masuk and jam_pulang:
-                dur = datetime.strptime(jam_pulang, time_fmt) - datetime.strptime(jam_masuk, time_fmt)
-                if dur.total_seconds() >= 4 * 3600:
-                    rec['status_text'] = "Kehadiran Terpenuhi"
-                    rec['status_color'] = "status-green"
-                else:
-                    rec['status_text'] = "Kurang Dari 4 Jam"
-                    rec['status_color'] = "status-red"
-            else:
-                rec['status_text'] = "Perlu Klarifikasi"
-                rec['status_color'] = "status-red"
-            processed_records.append(rec)
-
-    conn.close()
+        processed_records = klasifikasi.ke_records(klasifikasi.klasifikasi_absensi(records_raw, gaya='ringkas'))
 
     # --- PERBARUI DATA YANG DIKEMBALIKAN (RETURN) ---
     return {
@@ -611,157 +752,127 @@ def rekap_laporan_view():
     if 'user_role' not in session or session['user_role'] != 'Admin':
         return redirect(url_for('login'))
 
+    target_month = request.args.get('bulan')
     try:
-        conn = get_db_connection()
-
-        # --- Bagian Pengambilan Data (Lebih Efisien) ---
-        target_month = '2025-07' # Fokus ke bulan Juli
-        year, month = map(int, target_month.split('-'))
-
-        # Ambil semua dosen terlebih dahulu
-        all_dosen = conn.execute("SELECT nip, nama_lengkap, jurusan, \"detail jurusan\" FROM users WHERE role = 'Dosen' ORDER BY jurusan, nama_lengkap").fetchall()
-
-        # Ambil semua data absensi & klarifikasi untuk bulan target
-        attendance_data = conn.execute("SELECT * FROM attendance WHERE strftime('%Y-%m', tanggal) = ?", (target_month,)).fetchall()
-        approved_clarifications = conn.execute("SELECT nip, tanggal_klarifikasi, kategori_surat FROM clarifications WHERE strftime('%Y-%m', tanggal_klarifikasi) = ? AND status = 'Disetujui'", (target_month,)).fetchall()
-        
-        conn.close()
-
-        # --- Bagian Pemrosesan Data ---
-        num_days = calendar.monthrange(year, month)[1]
-        days_in_month = list(range(1, num_days + 1))
-        selected_bulan_formatted = datetime(year, month, 1).strftime("%B %Y")
-
-        # Siapkan struktur data untuk laporan
-        report_data = {} # Menggunakan dictionary agar lebih mudah diakses
-        for dosen in all_dosen:
-            jurusan = dosen['jurusan']
-            detail_jurusan = dosen['detail jurusan']
-            if jurusan not in report_data:
-                report_data[jurusan] = {
-                    'nama_jurusan': detail_jurusan,
-                    'dosen_data': {}
-                }
-            report_data[jurusan]['dosen_data'][dosen['nip']] = {
-                'nama': dosen['nama_lengkap'],
-                'absensi': {},
-                'summary_counts': {'KT': 0, 'PK': 0, 'NF': 0, 'FL': 0, 'CT': 0, 'IZ': 0}
-            }
-
-        # Buat dictionary untuk klarifikasi agar pencarian cepat
-        clarif_dict = {(item['nip'], item['tanggal_klarifikasi'].split(' ')[0]): item['kategori_surat'] for item in approved_clarifications}
-
-        # Proses data absensi (hanya satu kali perulangan)
-        # Proses data absensi (hanya satu kali perulangan)
-        for record in attendance_data:
-            # PERBAIKAN: Gunakan ['...'] bukan .get('...')
-            nip = record['nip']
-            
-            # Pengecekan NIP tetap sama
-            if not nip or not any(nip in data['dosen_data'] for data in report_data.values()):
-                continue # Lewati jika NIP tidak ada di daftar dosen
-
-            try:
-                tanggal_obj = datetime.strptime(record['tanggal'], '%Y-%m-%d %H:%M:%S')
-                day = tanggal_obj.day
-                tanggal_str = tanggal_obj.strftime('%Y-%m-%d')
-                
-                status = record['status']
-                jam_masuk = record['jam masuk']
-                jam_pulang = record['jam pulang']
-                keterangan = record['keterangan'] if 'keterangan' in record.keys() else ''
-
-                kode = 'PK' # Tetap sebagai default
-
-                # --- PERBAIKAN LOGIKA STATUS ---
-                if status == 'Disetujui Kajur':
-                    if 'Cuti' in keterangan:
-                        kode = 'CT'
-                    elif (nip, tanggal_str) in clarif_dict:
-                        kategori = clarif_dict.get((nip, tanggal_str))
-                        if kategori and 'Non Fleksibel' in kategori: kode = 'NF'
-                        elif kategori and 'Fleksibel' in kategori: kode = 'FL'
-                        else: kode = 'IZ'
-                    else:
-                        kode = 'IZ'
-                # Tambahkan kondisi untuk status 'Hadir'
-                elif status == 'Hadir' and jam_masuk and jam_pulang:
-                    # --- PERBAIKAN FORMAT WAKTU ---
-                    # Kembalikan format ke %H:%M:%S.%f sesuai data di database
-                    dur = datetime.strptime(jam_pulang, '%H:%M:%S.%f') - datetime.strptime(jam_masuk, '%H:%M:%S.%f')
-                    if dur.total_seconds() >= 4 * 3600: # 4 jam
-                        kode = 'KT'
-                
-                # Masukkan data ke struktur laporan
-                for jurusan_data in report_data.values():
-                    if nip in jurusan_data['dosen_data']:
-                        jurusan_data['dosen_data'][nip]['absensi'][day] = kode
-                        jurusan_data['dosen_data'][nip]['summary_counts'][kode] += 1
-                        break
-
-            except Exception as e:
-                # Blok ini akan menangkap jika ada error lain yang tak terduga
-                print(f"Melewatkan data error untuk NIP {nip} pada tanggal {record.get('tanggal')}: {e}")
-                continue
-
-        # Finalisasi data untuk dikirim ke template
-        report_data_per_jurusan = []
-        for jurusan_key, data in report_data.items():
-            dosen_list = []
-            for nip, dosen_data in data['dosen_data'].items():
-                summary_counts = dosen_data['summary_counts']
-                summary_str = ", ".join([f"{k}:{v}" for k, v in summary_counts.items() if v > 0])
-                dosen_data['summary'] = summary_str
-                dosen_list.append(dosen_data)
-            
-            report_data_per_jurusan.append({
-                'nama_jurusan': data['nama_jurusan'],
-                'dosen_data': dosen_list
-            })
-
-        session['report_for_download'] = report_data_per_jurusan
-        return render_template('rekap_laporan.html', report_data=report_data_per_jurusan, days_in_month=days_in_month, selected_bulan_formatted=selected_bulan_formatted)
-
-    except Exception as e:
-        # Tambahkan traceback untuk debugging yang lebih mudah di log server
-        import traceback
-        print(f"Terjadi Internal Server Error: {e}")
-        traceback.print_exc()
+        conn, conn_tulis, data_per = koneksi_laporan()
+
+        # Bulan laporan dari ?bulan=YYYY-MM, default bulan terakhir yang punya data absensi
+        target_month = target_month or rekap.bulan_terakhir(conn)
+        if not rekap.bulan_valid(target_month):
+            return "Format bulan tidak valid. Gunakan ?bulan=YYYY-MM.", 400
+        days_in_month, selected_bulan_formatted = rekap.info_bulan(target_month)
+        # Jumlah hari kerja & kolom libur/akhir pekan dari tabel kalender
+        jumlah_hari_kerja, hari_libur = rekap.info_hari_kerja(conn, target_month)
+
+        # Grid kode per dosen diambil dari rekap_cache; hanya (nip, bulan) yang
+        # belum ada / sudah di-invalidasi yang dihitung ulang (lihat rekap.py)
+        report_data_per_jurusan = rekap.susun_laporan(conn, conn_tulis, target_month)
+
+        return render_template('rekap_laporan.html', report_data=report_data_per_jurusan, days_in_month=days_in_month, selected_bulan_formatted=selected_bulan_formatted, bulan=target_month,
+                               jumlah_hari_kerja=jumlah_hari_kerja, hari_libur=hari_libur, data_per=data_per)
+
+    except Exception:
+        # Traceback lengkap masuk log server
+        app.logger.exception("rekap_laporan gagal untuk %s", target_month)
         return "Terjadi kesalahan saat memproses laporan. Silakan periksa format data Anda atau hubungi administrator.", 500
 
 # FUNGSI BARU UNTUK DOWNLOAD
+# Laporan dibuat ulang dari rekap_cache untuk bulan yang diminta (bukan dari session)
+# dan ditulis streaming: ?bulan=YYYY-MM&format=xlsx|csv&per_jurusan=1
 @app.route('/download_laporan')
 def download_laporan():
     if 'user_role' not in session or session['user_role'] != 'Admin':
         return redirect(url_for('login'))
 
-    report_data_per_jurusan = session.get('report_for_download')
-    if not report_data_per_jurusan:
-        return "Tidak ada data untuk di-download.", 404
-
-    # Gabungkan semua data menjadi satu list untuk Excel
-    final_data_for_excel = []
-    for jurusan_data in report_data_per_jurusan:
-        for dosen in jurusan_data['dosen_data']:
-            row_data = {
-                'Jurusan': jurusan_data['nama_jurusan'],
-                'Nama': dosen['nama'],
-            }
-            # Mengisi tanggal
-            for day in range(1, 32): # Asumsi maksimal 31 hari
-                row_data[day] = dosen['absensi'].get(day, '')
-            row_data['Jumlah'] = dosen['summary']
-            final_data_for_excel.append(row_data)
-
-    df = pd.DataFrame(final_data_for_excel)
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Rekap Absensi Juli')
-    writer.close()
-    output.seek(0)
-
-    return send_file(output, as_attachment=True, download_name='Rekap_Absensi_Juli.xlsx', 
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    conn, conn_tulis, data_per = koneksi_laporan()
+    bulan = request.args.get('bulan') or rekap.bulan_terakhir(conn)
+    if not rekap.bulan_valid(bulan):
+        return "Format bulan tidak valid. Gunakan ?bulan=YYYY-MM.", 400
+    format_file = request.args.get('format', 'xlsx')
+    per_jurusan = request.args.get('per_jurusan') == '1'
+
+    days_in_month, _ = rekap.info_bulan(bulan)
+    data_dosen = rekap.iter_dosen(conn, conn_tulis, bulan)
+    # Waktu snapshot yang dibaca (kosong kalau dari database utama)
+    header_data = {'X-Data-Per': data_per} if data_per else {}
+
+    if format_file == 'csv':
+        return Response(
+            stream_with_context(ekspor.iter_csv(data_dosen, days_in_month)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename=Rekap_Absensi_{bulan}.csv', **header_data}
+        )
+    if format_file != 'xlsx':
+        return "Format tidak dikenal. Gunakan format=xlsx atau format=csv.", 400
+
+    output = ekspor.tulis_xlsx(data_dosen, days_in_month, f"Rekap Absensi {bulan}", per_jurusan=per_jurusan)
+    response = send_file(output, as_attachment=True, download_name=f'Rekap_Absensi_{bulan}.xlsx',
+                         mimetype=ekspor.MIMETYPE_XLSX)
+    response.headers.update(header_data)
+    return response
+
+# --- Tugas latar belakang (rekap, ekspor, impor, snapshot), dikerjakan worker tugas.py ---
+# POST /tugas dengan jenis=rekap|ekspor (bulan, format, per_jurusan), jenis=impor (file_workbook)
+# atau jenis=snapshot (perbarui snapshot laporan),
+# lalu cek /tugas/<id> sampai status 'selesai' dan unduh dari /tugas/<id>/unduh.
+@app.route('/tugas', methods=['GET', 'POST'])
+def tugas_admin():
+    if 'user_role' not in session or session['user_role'] != 'Admin':
+        return {"error": "Unauthorized"}, 403
+
+    if request.method == 'GET':
+        return {"data": tugas.daftar(get_db_connection(readonly=True))}
+
+    data = request.get_json(silent=True) or request.form
+    jenis = data.get('jenis')
+    if jenis in ('rekap', 'ekspor'):
+        bulan = data.get('bulan') or rekap.bulan_terakhir(get_db_connection(readonly=True))
+        if not rekap.bulan_valid(bulan):
+            return {"error": "Format bulan tidak valid. Gunakan YYYY-MM."}, 400
+        parameter = {'bulan': bulan}
+        if jenis == 'ekspor':
+            parameter['format'] = data.get('format', 'xlsx')
+            parameter['per_jurusan'] = str(data.get('per_jurusan', '')) in ('1', 'true')
+            if parameter['format'] not in ('xlsx', 'csv'):
+                return {"error": "Format tidak dikenal. Gunakan xlsx atau csv."}, 400
+    elif jenis == 'impor':
+        file = request.files.get('file_workbook')
+        if not file or not file.filename.lower().endswith('.xlsx'):
+            return {"error": "Upload file workbook .xlsx"}, 400
+        folder_masuk = os.path.join(tugas.FOLDER, 'masuk')
+        os.makedirs(folder_masuk, exist_ok=True)
+        path = os.path.join(folder_masuk, f"{uuid.uuid4().hex}.xlsx")
+        file.save(path)
+        parameter = {'file': path, 'database': DATABASE, 'hapus_file': True, 'nama_file': file.filename}
+    elif jenis == 'snapshot' and snapshot.AKTIF:
+        parameter = {'database': DATABASE}
+    else:
+        return {"error": "jenis harus 'rekap', 'ekspor', 'impor' atau 'snapshot' (kalau LAPORAN_SNAPSHOT aktif)"}, 400
+
+    tugas_id = tugas.kirim(get_db_connection(), jenis, parameter, session.get('user_name'))
+    return {"id": tugas_id, "status_url": url_for('status_tugas', tugas_id=tugas_id)}, 202
+
+@app.route('/tugas/<int:tugas_id>')
+def status_tugas(tugas_id):
+    if 'user_role' not in session or session['user_role'] != 'Admin':
+        return {"error": "Unauthorized"}, 403
+    data = tugas.status(get_db_connection(readonly=True), tugas_id)
+    if data is None:
+        return {"error": "Tugas tidak ditemukan"}, 404
+    data['parameter'].pop('file', None)   # path server tidak perlu dikirim ke browser
+    data['parameter'].pop('database', None)
+    file_hasil = data.pop('file_hasil')
+    data['unduh_url'] = url_for('unduh_tugas', tugas_id=tugas_id) if data['status'] == 'selesai' and file_hasil else None
+    return data
+
+@app.route('/tugas/<int:tugas_id>/unduh')
+def unduh_tugas(tugas_id):
+    if 'user_role' not in session or session['user_role'] != 'Admin':
+        return redirect(url_for('login'))
+    data = tugas.status(get_db_connection(readonly=True), tugas_id)
+    if data is None or data['status'] != 'selesai' or not data['file_hasil'] or not os.path.exists(data['file_hasil']):
+        abort(404)
+    return send_file(data['file_hasil'], as_attachment=True, download_name=data['nama_unduhan'])
 
 @app.route('/riwayat_cuti')
 def riwayat_cuti():
@@ -772,15 +883,11 @@ def riwayat_cuti():
     nip = session['user_id']
     nama_dosen = session['user_name']
     
-    conn = get_db_connection()
-    # Ambil semua data dari tabel cuti_dosen untuk NIP yang sedang login
-    cuti_records = conn.execute(
-        "SELECT * FROM cuti_dosen WHERE nip = ? ORDER BY tanggal_mulai DESC", 
-        (nip,)
-    ).fetchall()
-    conn.close()
+    conn = get_db_connection(readonly=True)
+    # Halaman pertama riwayat cuti NIP yang sedang login (sisanya lewat /api/cuti)
+    cuti_records, next_cursor = halaman_cuti(conn, nip=nip)
 
-    return render_template('riwayat_cuti.html', riwayat=cuti_records, nama_dosen=nama_dosen)
+    return render_template('riwayat_cuti.html', riwayat=cuti_records, nama_dosen=nama_dosen, next_cursor=next_cursor)
 
 
                             
@@ -789,19 +896,154 @@ def riwayat_cuti():
 def history():
     if 'user_role' not in session:
         return redirect(url_for('login'))
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=True)
+    if session['user_role'] in ('Dosen', 'Kajur'):
+        history_records, next_cursor = halaman_klarifikasi(conn)
+    else:
+        history_records, next_cursor = [], None
+    return render_template('history.html', records=history_records, next_cursor=next_cursor)
+
+
+# --- API Paginasi (JSON) ---
+# Semua daftar memakai paginasi keyset (lihat halaman.py):
+#   GET /api/...?limit=50&cursor=<next_cursor dari halaman sebelumnya>
+#   -> {"data": [...], "next_cursor": "..." atau null kalau sudah halaman terakhir}
+# Halaman pertama dirender langsung di template, sisanya dimuat oleh JavaScript.
+def halaman_absensi(conn, nip, cursor=None, limit=halaman.PAGE_SIZE):
+    rows, next_cursor = halaman.ambil(
+        conn, "*", "FROM absensi WHERE nip = ?", (nip,),
+        ["nomor_hari", "id"], cursor, limit
+    )
+    return klasifikasi.ke_records(klasifikasi.klasifikasi_absensi(rows)), next_cursor
+
+def halaman_klarifikasi(conn, cursor=None, limit=halaman.PAGE_SIZE):
+    # Dosen: miliknya sendiri, Kajur: jurusannya, Admin: semua
     if session['user_role'] == 'Dosen':
-        history_records = conn.execute("SELECT * FROM clarifications WHERE nip = ? ORDER BY tanggal_pengajuan DESC", (session['user_id'],)).fetchall()
+        dari, params = "FROM clarifications WHERE nip = ?", (session['user_id'],)
     elif session['user_role'] == 'Kajur':
-        history_records = conn.execute("SELECT * FROM clarifications WHERE jurusan = ? ORDER BY tanggal_pengajuan DESC", (session['user_jurusan'],)).fetchall()
+        dari, params = "FROM clarifications WHERE jurusan = ?", (session['user_jurusan'],)
+    else:
+        dari, params = "FROM clarifications WHERE 1", ()
+    return halaman.ambil(conn, "*", dari, params, ["tanggal_pengajuan", "id"], cursor, limit)
+
+def halaman_pengguna(conn, cursor=None, limit=halaman.PAGE_SIZE):
+    return halaman.ambil(
+        conn, "nip, nama_lengkap, jurusan, \"detail jurusan\", role", "FROM users WHERE 1", (),
+        ["role", "nama_lengkap", "rowid"], cursor, limit, turun=False
+    )
+
+def halaman_cuti(conn, nip=None, cursor=None, limit=halaman.PAGE_SIZE):
+    if nip:
+        return halaman.ambil(conn, "*", "FROM cuti_dosen WHERE nip = ?", (nip,),
+                             ["tanggal_mulai", "id"], cursor, limit, tanpa_null={"tanggal_mulai"})
+    return halaman.ambil(conn, "*", "FROM cuti_dosen WHERE 1", (), ["tanggal_input", "id"], cursor, limit)
+
+def jawab_halaman(kunci_versi, fungsi, *args):
+    conn = get_db_connection(readonly=True)
+
+    def buat_respons():
+        try:
+            data, next_cursor = fungsi(conn, *args,
+                                       cursor=request.args.get('cursor'),
+                                       limit=halaman.ukuran(request.args.get('limit')))
+        except halaman.CursorTidakValid:
+            return {"error": "Cursor tidak valid"}, 400
+        return {"data": data, "next_cursor": next_cursor}
+
+    # Isi halaman bergantung pada user yang login, parameter request dan versi tabelnya
+    bagian_etag = (fungsi.__name__, session.get('user_id'), session.get('user_jurusan'),
+                   request.query_string.decode(), *args) + versi.ambil(conn, kunci_versi)
+    return versi.jawab_json(bagian_etag, buat_respons)
+
+@app.route('/api/absensi')
+def api_absensi():
+    role = session.get('user_role')
+    if role == 'Dosen':
+        nip = session['user_id']
+    elif role in ('Admin', 'Kajur'):
+        nip = request.args.get('nip')
+        if not nip:
+            return {"error": "Parameter nip wajib diisi"}, 400
     else:
-        history_records = []
-    conn.close()
-    return render_template('history.html', records=history_records)
+        return {"error": "Unauthorized"}, 403
+    return jawab_halaman(f'nip:{nip}', halaman_absensi, nip)
+
+@app.route('/api/klarifikasi')
+def api_klarifikasi():
+    if session.get('user_role') not in ('Dosen', 'Kajur', 'Admin'):
+        return {"error": "Unauthorized"}, 403
+    return jawab_halaman('clarifications', halaman_klarifikasi)
+
+@app.route('/api/pengguna')
+def api_pengguna():
+    if session.get('user_role') != 'Admin':
+        return {"error": "Unauthorized"}, 403
+    return jawab_halaman('users', halaman_pengguna)
+
+@app.route('/api/cuti')
+def api_cuti():
+    role = session.get('user_role')
+    if role == 'Dosen':
+        return jawab_halaman('cuti_dosen', halaman_cuti, session['user_id'])
+    if role == 'Admin':
+        return jawab_halaman('cuti_dosen', halaman_cuti, request.args.get('nip'))
+    return {"error": "Unauthorized"}, 403
+
+# Typeahead / pencarian awalan lewat indeks FTS5 (lihat cari.py)
+#   dosen       : Admin, untuk memilih dosen di form input cuti
+#   pengguna    : Admin, semua pengguna
+#   klarifikasi : Dosen miliknya sendiri, Kajur jurusannya, Admin semua
+@app.route('/api/cari/<jenis>')
+def api_cari(jenis):
+    role = session.get('user_role')
+    q = request.args.get('q', '')
+    limit = cari.batas(request.args.get('limit'))
+    conn = get_db_connection(readonly=True)
+
+    if jenis in ('dosen', 'pengguna'):
+        if role != 'Admin':
+            return {"error": "Unauthorized"}, 403
+        kunci_versi = 'users'
+        buat_data = lambda: cari.cari_pengguna(conn, q, limit, role='Dosen' if jenis == 'dosen' else None)
+    elif jenis == 'klarifikasi':
+        if role not in ('Dosen', 'Kajur', 'Admin'):
+            return {"error": "Unauthorized"}, 403
+        kunci_versi = 'clarifications'
+        buat_data = lambda: cari.cari_klarifikasi(
+            conn, q, limit,
+            nip=session['user_id'] if role == 'Dosen' else None,
+            jurusan=session['user_jurusan'] if role == 'Kajur' else None,
+        )
+    else:
+        abort(404)
+
+    bagian_etag = ('cari', jenis, session.get('user_id'), q, limit) + versi.ambil(conn, kunci_versi)
+    return versi.jawab_json(bagian_etag, lambda: {"data": buat_data()})
 
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Nama blob (sha256) dicari di folder blobs/, file lama langsung di uploads/
+    return send_from_directory(app.config['UPLOAD_FOLDER'], unggahan.lokasi_blob(filename))
+
+# Thumbnail/preview gambar bukti (lihat pratinjau.py), hanya untuk user yang login.
+# Varian yang belum ada dibuat saat diminta; file yang bukan gambar (PDF) dikirim
+# apa adanya. Kalau varian gagal dibuat, file asli dikirim tanpa cache supaya
+# browser meminta ulang varian itu nanti.
+@app.route('/pratinjau/<varian>/<path:filename>')
+def pratinjau_file(varian, filename):
+    if 'user_role' not in session:
+        return redirect(url_for('login'))
+    if varian not in pratinjau.VARIAN:
+        abort(404)
+    lokasi = unggahan.lokasi_blob(filename)
+    if pratinjau.bisa_dipratinjau(filename):
+        path = safe_join(app.config['UPLOAD_FOLDER'], lokasi)
+        if path and os.path.isfile(path):
+            path_varian = pratinjau.buat_varian(path, varian)
+            if path_varian:
+                return send_file(path_varian, mimetype='image/jpeg')
+            g.jangan_cache = True
+    return send_from_directory(app.config['UPLOAD_FOLDER'], lokasi)
 
 @app.route('/logout')
 def logout():
@@ -0,0 +1,198 @@
+# backfill.py
+# Impor banyak workbook bulanan sekaligus (riwayat absensi / pemulihan database).
+#
+#   python backfill.py data/                      -> semua *.xlsx di folder data/
+#   python backfill.py "arsip/db_*.xlsx" db_juli.xlsx
+#   python backfill.py data/ --workers 4 --force
+#
+# Setiap sheet diparse paralel di process pool (openpyxl read-only, baris
+# di-stream), lalu hasilnya disalurkan ke SATU penulis di proses utama,
+# per file sesuai urutan nama (data pertama untuk nip+tanggal yang dipakai).
+# Hash sha256 isi file dicatat di tabel impor_file, jadi file yang tidak
+# berubah dilewati saat dijalankan ulang (--force untuk tetap mengimpor).
+# Database kosong bisa dibangun ulang dari semua workbook dalam satu kali jalan.
+import os
+import glob
+import time
+import hashlib
+import sqlite3
+import argparse
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+import skema
+import migrasi_data
+from migrasi_data import ATTENDANCE_SHEETS, USERS_SHEET
+
+DATABASE = os.getenv("DATABASE", "database.db")
+KOLOM_USERS = ['nip', 'nama_lengkap', 'jurusan', 'detail jurusan', 'role']
+KOLOM_ABSENSI = ['nip', 'nama_lengkap', 'tanggal', 'jam masuk', 'jam pulang', 'status', 'keterangan']
+
+
+# --- Fungsi Bantuan ---
+def cari_file(sumber):
+    """Daftar workbook (urut nama) dari kombinasi folder, pola glob, atau nama file."""
+    hasil = set()
+    for pola in sumber:
+        if os.path.isdir(pola):
+            pola = os.path.join(pola, "*.xlsx")
+        for path in glob.glob(pola):
+            # Lewati file lock Excel (~$db_juli.xlsx)
+            if os.path.isfile(path) and not os.path.basename(path).startswith("~$"):
+                hasil.add(os.path.abspath(path))
+    return sorted(hasil)
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for blok in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(blok)
+    return h.hexdigest()
+
+
+def _nip(nilai):
+    # NIP bisa terbaca sebagai angka kalau sel Excel bertipe number,
+    # dan sebagai '#N/A' kalau rumus lookup di sel tersebut gagal
+    if nilai is None or nilai in ERROR_CODES:
+        return None
+    if isinstance(nilai, float):
+        nilai = int(nilai)
+    return str(nilai).strip() or None
+
+
+def _tanggal(nilai):
+    if isinstance(nilai, (datetime, date)):
+        return nilai.strftime('%Y-%m-%d')
+    if nilai is None:
+        return None
+    tgl = pd.to_datetime(str(nilai), errors='coerce')
+    return None if pd.isna(tgl) else tgl.strftime('%Y-%m-%d')
+
+
+def parse_sheet(path, sheet):
+    """Dijalankan di proses worker: baca satu sheet dan kembalikan baris yang sudah dinormalisasi.
+
+    Hasil: (sheet, list tuple) dengan urutan kolom KOLOM_USERS / KOLOM_ABSENSI,
+    atau (sheet, None) kalau sheet tidak ada di workbook.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet not in wb.sheetnames:
+            return sheet, None
+        rows = wb[sheet].iter_rows(values_only=True)
+        header = next(rows, ())
+        idx = {str(nama).strip(): i for i, nama in enumerate(header) if nama is not None}
+
+        def ambil(row, kolom):
+            i = idx.get(kolom)
+            return row[i] if i is not None and i < len(row) else None
+
+        hasil = []
+        for row in rows:
+            nip = _nip(ambil(row, 'nip'))
+            if not nip:
+                continue
+            if sheet == USERS_SHEET:
+                hasil.append((nip,) + tuple(ambil(row, k) for k in KOLOM_USERS[1:]))
+                continue
+            tgl = _tanggal(ambil(row, 'tanggal'))
+            if not tgl:
+                continue
+            hasil.append((
+                nip, ambil(row, 'nama_lengkap'), f"{tgl} 00:00:00",
+                migrasi_data.format_jam(ambil(row, 'jam masuk')),
+                migrasi_data.format_jam(ambil(row, 'jam pulang')),
+                'Hadir', '',
+            ))
+        return sheet, hasil
+    finally:
+        wb.close()
+
+
+def sudah_diimpor(conn, sha256):
+    return conn.execute("SELECT 1 FROM impor_file WHERE sha256 = ?", (sha256,)).fetchone() is not None
+
+
+def tulis_file(conn, path, sha256, hasil_sheet):
+    """Penulis tunggal: user baru, lalu absensi (urut ATTENDANCE_SHEETS), lalu catat hash file."""
+    users = hasil_sheet.get(USERS_SHEET) or []
+    user_baru = migrasi_data.tulis_users(conn, pd.DataFrame(users, columns=KOLOM_USERS)) if users else 0
+    conn.commit()
+
+    absensi = [row for sheet in ATTENDANCE_SHEETS for row in (hasil_sheet.get(sheet) or [])]
+    absensi_baru = migrasi_data.tulis_absensi(conn, pd.DataFrame(absensi, columns=KOLOM_ABSENSI)) if absensi else 0
+
+    conn.execute("""
+        INSERT OR REPLACE INTO impor_file (sha256, nama_file, baris_absensi, absensi_baru, user_baru)
+        VALUES (?, ?, ?, ?, ?)
+    """, (sha256, os.path.basename(path), len(absensi), absensi_baru, user_baru))
+    conn.commit()
+    return len(absensi), absensi_baru, user_baru
+
+
+def backfill(sumber, database=DATABASE, workers=None, force=False):
+    files = cari_file(sumber)
+    if not files:
+        raise SystemExit(f"Tidak ada workbook yang cocok: {' '.join(sumber)}")
+
+    mulai = time.perf_counter()
+    conn = sqlite3.connect(database, timeout=30)
+    try:
+        cursor = conn.cursor()
+        migrasi_data.pastikan_tabel_inti(cursor)
+        migrasi_data.pastikan_tabel_lain(cursor)
+        conn.commit()
+        skema.jalankan_migrasi(database)
+
+        antrian = []
+        for path in files:
+            sha256 = sha256_file(path)
+            if not force and sudah_diimpor(conn, sha256):
+                print(f"  = {os.path.basename(path)}: tidak berubah sejak impor terakhir, dilewati.")
+                continue
+            antrian.append((path, sha256))
+        if not antrian:
+            print("Semua workbook sudah diimpor, tidak ada yang perlu diproses.")
+            return
+
+        total_baris = total_baru = total_user = 0
+        sheets = [USERS_SHEET] + ATTENDANCE_SHEETS
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Semua sheet dari semua file langsung diantrikan supaya worker tidak menganggur;
+            # penulisan tetap berurutan per file.
+            tugas = [(path, sha256, [pool.submit(parse_sheet, path, sheet) for sheet in sheets])
+                     for path, sha256 in antrian]
+            for path, sha256, futures in tugas:
+                hasil_sheet = {}
+                for future in futures:
+                    sheet, rows = future.result()
+                    if rows is None:
+                        print(f"  ! {os.path.basename(path)}: sheet '{sheet}' tidak ditemukan.")
+                    hasil_sheet[sheet] = rows
+                baris, baru, user = tulis_file(conn, path, sha256, hasil_sheet)
+                total_baris += baris
+                total_baru += baru
+                total_user += user
+                print(f"  + {os.path.basename(path)}: {baris} baris absensi, {baru} baru, {user} user baru.")
+
+        detik = time.perf_counter() - mulai
+        print(f"\nBackfill selesai: {len(antrian)} file, {total_baris} baris absensi "
+              f"({total_baru} baru, {total_baris - total_baru} sudah ada), {total_user} user baru "
+              f"dalam {detik:.2f} detik ({total_baris / detik:,.0f} baris/detik).")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Impor banyak workbook absensi bulanan sekaligus.")
+    parser.add_argument("sumber", nargs="+", help="folder, pola glob, atau file .xlsx")
+    parser.add_argument("--workers", type=int, default=None, help="jumlah proses parser (default: jumlah CPU)")
+    parser.add_argument("--force", action="store_true", help="impor ulang walaupun hash file sudah tercatat")
+    parser.add_argument("--database", default=DATABASE)
+    args = parser.parse_args()
+    backfill(args.sumber, database=args.database, workers=args.workers, force=args.force)
@@ -0,0 +1,117 @@
+# cari.py
+# Pencarian awalan (typeahead) lewat indeks FTS5 users_fts & clarifications_fts
+# (skema.py migrasi v11, disinkronkan trigger). Dipakai /api/cari/<jenis>,
+# supaya halaman input cuti dan dashboard admin mengambil hasil yang cocok
+# saja, bukan mengirim seluruh tabel ke browser.
+#
+# Setiap kata yang diketik menjadi pencarian awalan dan semuanya harus cocok:
+# "agus sap" -> "agus"* AND "sap"*. Pengguna diurutkan dengan bm25, klarifikasi
+# dari yang terbaru (urutan rowid FTS5, tanpa menghitung skor ribuan hasil).
+#
+# Perintah manual:
+#   python cari.py pengguna "agus sap"     -> coba pencarian pengguna
+#   python cari.py klarifikasi "lupa"      -> coba pencarian klarifikasi
+#   python cari.py rebuild                 -> bangun ulang kedua indeks dari tabel asal
+import os
+import re
+import sys
+import sqlite3
+
+DATABASE = os.getenv("DATABASE", "database.db")
+
+BATAS_HASIL = 10
+MAKS_HASIL = 50
+MAKS_KATA = 8
+
+
+def batas(nilai):
+    """Nilai ?limit= dari request -> jumlah hasil yang dibatasi 1..MAKS_HASIL."""
+    try:
+        limit = int(nilai) if nilai else BATAS_HASIL
+    except (TypeError, ValueError):
+        limit = BATAS_HASIL
+    return max(1, min(limit, MAKS_HASIL))
+
+
+def ekspresi(q):
+    """Teks ketikan -> ekspresi MATCH FTS5, atau None kalau tidak ada kata yang bisa dicari.
+
+    Hanya huruf/angka yang dipakai dan setiap kata dikutip, jadi operator FTS5
+    (AND, OR, NEAR, tanda kutip, ...) dari input tidak pernah dieksekusi.
+    """
+    kata = re.findall(r"\w+", q or "")[:MAKS_KATA]
+    if not kata:
+        return None
+    return " ".join(f'"{k}"*' for k in kata)
+
+
+def cari_pengguna(conn, q, limit=BATAS_HASIL, role=None):
+    """Pengguna yang cocok dengan nip, nama, jurusan atau detail jurusan. role: batasi ke satu role."""
+    match = ekspresi(q)
+    if match is None:
+        return []
+    filter_role, params = ("AND role = ?", (match, role, limit)) if role else ("", (match, limit))
+    rows = conn.execute(f"""
+        SELECT nip, nama_lengkap, jurusan, detail_jurusan AS "detail jurusan", role
+        FROM users_fts WHERE users_fts MATCH ? {filter_role}
+        ORDER BY rank LIMIT ?
+    """, params).fetchall()
+    return [dict(row) for row in rows]
+
+
+def cari_klarifikasi(conn, q, limit=BATAS_HASIL, nip=None, jurusan=None):
+    """Klarifikasi yang cocok dengan nama dosen, jenis atau kategori surat.
+
+    nip / jurusan membatasi hasil untuk Dosen / Kajur (Admin: keduanya None).
+    """
+    match = ekspresi(q)
+    if match is None:
+        return []
+    filter_baris, params = "", [match]
+    if nip:
+        filter_baris += " AND c.nip = ?"
+        params.append(nip)
+    if jurusan:
+        filter_baris += " AND c.jurusan = ?"
+        params.append(jurusan)
+    params.append(limit)
+    rows = conn.execute(f"""
+        SELECT c.id, c.nip, c.nama_lengkap, c.jurusan, c.tanggal_klarifikasi, c.kategori_surat,
+               c.jenis_surat, c.status, c.tanggal_pengajuan
+        FROM clarifications_fts f JOIN clarifications c ON c.id = f.rowid
+        WHERE clarifications_fts MATCH ? {filter_baris}
+        ORDER BY f.rowid DESC LIMIT ?
+    """, params).fetchall()
+    return [dict(row) for row in rows]
+
+
+def rebuild(conn):
+    """Bangun ulang kedua indeks dari tabel asal (tanpa commit)."""
+    conn.execute("DELETE FROM users_fts")
+    conn.execute("""
+        INSERT INTO users_fts (nip, nama_lengkap, jurusan, detail_jurusan, role)
+        SELECT nip, nama_lengkap, jurusan, "detail jurusan", role FROM users
+    """)
+    conn.execute("INSERT INTO clarifications_fts (clarifications_fts) VALUES ('rebuild')")
+
+
+if __name__ == '__main__':
+    perintah = sys.argv[1] if len(sys.argv) > 1 else ""
+    conn = sqlite3.connect(DATABASE)
+    conn.row_factory = sqlite3.Row
+    try:
+        if perintah == "rebuild":
+            rebuild(conn)
+            conn.commit()
+            print("Indeks pencarian dibangun ulang.")
+        elif perintah == "pengguna" and len(sys.argv) > 2:
+            for row in cari_pengguna(conn, sys.argv[2], MAKS_HASIL):
+                print(f"  {row['nip']}  {row['nama_lengkap']}  ({row['jurusan']}, {row['role']})")
+        elif perintah == "klarifikasi" and len(sys.argv) > 2:
+            for row in cari_klarifikasi(conn, sys.argv[2], MAKS_HASIL):
+                print(f"  #{row['id']}  {row['nama_lengkap']}  {row['tanggal_klarifikasi'][:10]}  "
+                      f"{row['jenis_surat']}  {row['status']}")
+        else:
+            raise SystemExit('Gunakan: python cari.py pengguna "<teks>" | klarifikasi "<teks>" | rebuild')
+    finally:
+        conn.close()
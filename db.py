@@ -0,0 +1,234 @@
+# db.py
+# Lapisan koneksi SQLite: pool koneksi per worker, dipinjam sekali per
+# request (disimpan di flask.g) dan dikembalikan otomatis di teardown_appcontext.
+# Rute laporan bisa membaca snapshot terpisah (get_db_laporan, lihat snapshot.py).
+import os
+import time
+import threading
+import sqlite3
+import urllib.parse
+from contextlib import contextmanager
+from flask import g
+
+# --- Konfigurasi (bisa diatur lewat environment) ---
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))                   # koneksi idle maksimal per worker
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))    # tunggu lock sebelum "database is locked"
+CACHE_SIZE_KIB = int(os.getenv("DB_CACHE_SIZE_KIB", "16384"))     # page cache per koneksi (16 MB)
+MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))     # prepared statement yang di-cache per koneksi
+
+
+class KoneksiTerukur(sqlite3.Connection):
+    """Connection yang melaporkan waktu execute ke pengamat request (metrik.py), kalau ada."""
+    pengamat = None
+
+    def execute(self, *args):
+        if self.pengamat is None:
+            return super().execute(*args)
+        mulai = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            self.pengamat.waktu_sql(time.perf_counter() - mulai)
+
+    def executemany(self, *args):
+        if self.pengamat is None:
+            return super().executemany(*args)
+        mulai = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            self.pengamat.waktu_sql(time.perf_counter() - mulai)
+
+
+class ConnectionPool:
+    """Pool koneksi SQLite sederhana (LIFO) untuk satu proses worker."""
+
+    def __init__(self, database, readonly=False, size=POOL_SIZE):
+        self.database = database
+        self.readonly = readonly
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._stats = {
+            'dibuat': 0,          # koneksi baru yang dibuka
+            'dipinjam': 0,        # total peminjaman
+            'dipakai_ulang': 0,   # peminjaman yang dilayani dari koneksi idle
+            'dibuang': 0,         # koneksi ditutup karena pool penuh / rusak
+            'aktif': 0,           # sedang dipinjam saat ini
+            'puncak_aktif': 0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=STATEMENT_CACHE,
+            check_same_thread=False,
+            factory=KoneksiTerukur,
+        )
+        conn.row_factory = sqlite3.Row
+        if not self.readonly:
+            # WAL: pembaca tidak diblokir oleh penulis (dan sebaliknya).
+            # Mode ini tersimpan di file database, cukup diset dari koneksi tulis.
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if self.readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _cek_fork(self):
+        # Setelah gunicorn fork, koneksi milik proses induk tidak boleh dipakai.
+        if os.getpid() != self._pid:
+            self._idle = []
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def acquire(self):
+        self._cek_fork()
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self._stats['dipinjam'] += 1
+            if conn is not None:
+                self._stats['dipakai_ulang'] += 1
+            self._stats['aktif'] += 1
+            self._stats['puncak_aktif'] = max(self._stats['puncak_aktif'], self._stats['aktif'])
+        if conn is None:
+            conn = self._connect()
+            with self._lock:
+                self._stats['dibuat'] += 1
+        return conn
+
+    def release(self, conn):
+        self._cek_fork()
+        simpan = True
+        try:
+            # Transaksi yang tidak di-commit (misal karena error) dibatalkan
+            # supaya tidak terbawa ke request berikutnya.
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            simpan = False
+        with self._lock:
+            self._stats['aktif'] = max(0, self._stats['aktif'] - 1)
+            if simpan and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+            self._stats['dibuang'] += 1
+        conn.close()
+
+    def statistik(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['idle'] = len(self._idle)
+        data.update({'readonly': self.readonly, 'ukuran_pool': self.size, 'pid': self._pid})
+        return data
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+# File snapshot laporan (snapshot.py), None kalau rute laporan membaca database utama
+_snapshot = None
+# Fungsi tanpa argumen yang mengembalikan pengamat SQL untuk request aktif
+# (objek dengan method sql(statement) dan waktu_sql(detik)), diatur metrik.py
+_buat_pengamat = None
+
+
+def atur_pengamat(fungsi):
+    global _buat_pengamat
+    _buat_pengamat = fungsi
+
+
+def atur_snapshot(path):
+    global _snapshot
+    _snapshot = path
+
+
+def init_app(app, database):
+    _pools['rw'] = ConnectionPool(database)
+    _pools['ro'] = ConnectionPool(database, readonly=True)
+    app.teardown_appcontext(close_db)
+
+
+def get_db(readonly=False):
+    """Koneksi untuk request ini. readonly=True untuk rute laporan (tidak bisa menulis)."""
+    key = 'ro' if readonly else 'rw'
+    conn = g.get(f'_db_{key}')
+    if conn is None:
+        conn = _pools[key].acquire()
+        _pasang_pengamat(conn)
+        setattr(g, f'_db_{key}', conn)
+    return conn
+
+
+def _pasang_pengamat(conn):
+    pengamat = _buat_pengamat() if _buat_pengamat else None
+    if pengamat is not None:
+        # Setiap statement (termasuk statement di dalam trigger) dihitung lewat trace callback
+        conn.set_trace_callback(pengamat.sql)
+        conn.pengamat = pengamat
+
+
+def uri_immutable(path):
+    """URI SQLite read-only tanpa lock, untuk file yang tidak pernah ditulis lagi (snapshot)."""
+    return f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro&immutable=1"
+
+
+def get_db_laporan():
+    """Koneksi baca untuk rute laporan: snapshot kalau mode snapshot aktif dan filenya ada,
+    selain itu sama dengan get_db(readonly=True).
+
+    Snapshot diganti dengan rename saat diperbarui, jadi koneksinya tidak di-pool:
+    dibuka per request supaya request berikutnya langsung membaca file terbaru.
+    """
+    if not _snapshot or not os.path.exists(_snapshot):
+        return get_db(readonly=True)
+    conn = g.get('_db_laporan')
+    if conn is None:
+        conn = sqlite3.connect(uri_immutable(_snapshot), uri=True, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE, factory=KoneksiTerukur)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        _pasang_pengamat(conn)
+        g._db_laporan = conn
+    return conn
+
+
+@contextmanager
+def pinjam(readonly=False):
+    """Koneksi di luar request (misalnya thread latar belakang), dikembalikan ke pool setelah selesai."""
+    pool = _pools['ro' if readonly else 'rw']
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def close_db(exc=None):
+    for key, pool in _pools.items():
+        conn = g.pop(f'_db_{key}', None)
+        if conn is not None:
+            if conn.pengamat is not None:
+                conn.set_trace_callback(None)
+                conn.pengamat = None
+            pool.release(conn)
+    conn = g.pop('_db_laporan', None)
+    if conn is not None:
+        conn.close()
+
+
+def statistik_pool():
+    return {key: pool.statistik() for key, pool in _pools.items()}
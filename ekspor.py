@@ -0,0 +1,64 @@
+# ekspor.py
+# Ekspor rekap laporan ke Excel/CSV secara streaming.
+# Baris dosen diambil satu per satu dari rekap.iter_dosen() dan langsung
+# ditulis, jadi pemakaian memori tetap datar walaupun jumlah dosen bertambah.
+import io
+import csv
+import re
+import tempfile
+
+from openpyxl import Workbook
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def header(days_in_month):
+    return ['Jurusan', 'Nama'] + list(days_in_month) + ['Jumlah']
+
+
+def baris(dosen, days_in_month):
+    return [dosen['nama_jurusan'], dosen['nama']] + [dosen['absensi'].get(day, '') for day in days_in_month] + [dosen['summary']]
+
+
+def nama_sheet(nama):
+    # Excel: maksimal 31 karakter dan tanpa karakter []:*?/\
+    return re.sub(r'[\[\]:*?/\\]', '-', str(nama or '-'))[:31]
+
+
+def tulis_xlsx(data_dosen, days_in_month, judul_sheet, per_jurusan=False):
+    """Tulis workbook mode write_only (streaming) ke file sementara.
+
+    Mengembalikan file object yang sudah di-seek ke awal, siap dikirim send_file.
+    File sementara otomatis dihapus saat ditutup.
+    """
+    wb = Workbook(write_only=True)
+    ws = None
+    jurusan_aktif = object()
+    for dosen in data_dosen:
+        if ws is None or (per_jurusan and dosen['jurusan'] != jurusan_aktif):
+            jurusan_aktif = dosen['jurusan']
+            ws = wb.create_sheet(nama_sheet(jurusan_aktif if per_jurusan else judul_sheet))
+            ws.append(header(days_in_month))
+        ws.append(baris(dosen, days_in_month))
+    if ws is None:
+        wb.create_sheet(nama_sheet(judul_sheet)).append(header(days_in_month))
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def iter_csv(data_dosen, days_in_month):
+    """Generator potongan CSV (header lalu satu baris per dosen) untuk response streaming."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header(days_in_month))
+    for dosen in data_dosen:
+        writer.writerow(baris(dosen, days_in_month))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Header tetap dikirim walaupun tidak ada data dosen
+    if buffer.getvalue():
+        yield buffer.getvalue()
@@ -0,0 +1,75 @@
+# halaman.py
+# Paginasi keyset (cursor) untuk daftar yang terus bertambah: absensi,
+# klarifikasi, pengguna, riwayat cuti.
+# Halaman berikutnya diambil dengan "WHERE (kunci...) < (nilai terakhir)" pada
+# kolom yang diindeks, bukan OFFSET, jadi biaya query per halaman tetap sama
+# berapa pun banyaknya data yang sudah diimpor. Kunci urut selalu diakhiri
+# kolom unik (rowid/id) supaya urutannya stabil.
+# Perbandingan row value dengan NULL hasilnya NULL, jadi baris yang kuncinya
+# NULL akan hilang dari halaman kedua dan seterusnya. Karena itu kunci selain
+# kolom unik terakhir dibungkus COALESCE(kunci, '') (di ORDER BY maupun di
+# perbandingan cursor), kecuali yang disebut di tanpa_null. NULL lalu terurut
+# sebagai '' (sebelum teks lain, sesudah angka).
+import os
+import json
+import base64
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+
+class CursorTidakValid(ValueError):
+    pass
+
+
+def ukuran(nilai):
+    """Nilai ?limit= dari request -> ukuran halaman yang dibatasi 1..MAX_PAGE_SIZE."""
+    try:
+        limit = int(nilai) if nilai else PAGE_SIZE
+    except (TypeError, ValueError):
+        limit = PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(nilai_kunci):
+    return base64.urlsafe_b64encode(json.dumps(nilai_kunci).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, jumlah_kunci):
+    try:
+        nilai = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise CursorTidakValid(cursor)
+    if not isinstance(nilai, list) or len(nilai) != jumlah_kunci:
+        raise CursorTidakValid(cursor)
+    return nilai
+
+
+def ambil(conn, kolom, dari, params, kunci, cursor=None, limit=PAGE_SIZE, turun=True, tanpa_null=()):
+    """Ambil satu halaman. Mengembalikan (list dict, cursor halaman berikutnya atau None).
+
+    kolom      : daftar kolom SELECT, misalnya "*, rowid AS id"
+    dari       : "FROM tabel WHERE ..." (filter dasar, wajib memakai WHERE)
+    kunci      : ekspresi kunci urut, misalnya ["tanggal", "rowid"] (kolom terakhir harus unik dan NOT NULL)
+    tanpa_null : kunci yang dijamin NOT NULL; dipakai apa adanya supaya indeksnya bisa melayani ORDER BY
+    """
+    kunci = [k if i == len(kunci) - 1 or k in tanpa_null else f"COALESCE({k}, '')" for i, k in enumerate(kunci)]
+    arah = "DESC" if turun else "ASC"
+    alias = [f"_k{i}" for i in range(len(kunci))]
+    select_kunci = ", ".join(f"{k} AS {a}" for k, a in zip(kunci, alias))
+    sql = f"SELECT {kolom}, {select_kunci} {dari}"
+    params = list(params)
+    if cursor:
+        nilai = decode_cursor(cursor, len(kunci))
+        sql += f" AND ({', '.join(kunci)}) {'<' if turun else '>'} ({', '.join('?' * len(kunci))})"
+        params += nilai
+    sql += f" ORDER BY {', '.join(f'{k} {arah}' for k in kunci)} LIMIT ?"
+    params.append(limit + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    berikutnya = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        berikutnya = encode_cursor([rows[-1][a] for a in alias])
+    data = [{k: row[k] for k in row.keys() if k not in alias} for row in rows]
+    return data, berikutnya
@@ -0,0 +1,207 @@
+# kalender.py
+# Kalender hari kerja: satu baris per tanggal di tabel kalender
+# (tanggal, hari_kerja, keterangan), dibuat sekali oleh migrasi skema v8.
+# Sabtu/Minggu otomatis bukan hari kerja; libur nasional & cuti bersama
+# diimpor admin dari file CSV atau ICS (halaman /kalender atau CLI di bawah).
+# Validasi input cuti dan jumlah hari kerja di rekap cukup JOIN ke tabel ini,
+# tidak perlu lagi menelusuri tanggal satu per satu di Python.
+#
+# Perintah manual:
+#   python kalender.py impor libur.csv|libur.ics  -> impor hari libur (menggantikan libur di tahun yang sama)
+#   python kalender.py isi 2100 2120              -> tambah tanggal untuk tahun di luar rentang awal
+#   python kalender.py libur 2025                 -> daftar hari libur satu tahun
+import io
+import os
+import re
+import csv
+import sys
+import sqlite3
+from datetime import date, datetime, timedelta
+
+DATABASE = os.getenv("DATABASE", "database.db")
+
+# Rentang tanggal yang diisi saat migrasi (sekitar 36 ribu baris)
+TAHUN_AWAL = 2000
+TAHUN_AKHIR = 2099
+
+FORMAT_TANGGAL = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d')
+
+
+class FormatTidakValid(ValueError):
+    pass
+
+
+# --- Pengisian tanggal ---
+def isi_rentang(conn, awal, akhir):
+    """Tambahkan tanggal awal..akhir (inklusif, 'YYYY-MM-DD') yang belum ada. Sabtu/Minggu = bukan hari kerja."""
+    conn.execute("""
+        WITH RECURSIVE hari(t) AS (
+            SELECT date(?) UNION ALL SELECT date(t, '+1 day') FROM hari WHERE t < date(?)
+        )
+        INSERT OR IGNORE INTO kalender (tanggal, hari_kerja)
+        SELECT t, strftime('%w', t) NOT IN ('0', '6') FROM hari
+    """, (awal, akhir))
+
+
+def isi_tahun(conn, dari, sampai):
+    isi_rentang(conn, f"{int(dari):04d}-01-01", f"{int(sampai):04d}-12-31")
+
+
+# --- Pembacaan ---
+def hari_cuti(conn, nip, awal, akhir):
+    """Satu query untuk validasi input cuti: setiap tanggal awal..akhir beserta absensi nip di hari itu.
+
+    Baris: tanggal, hari_kerja, keterangan (libur), id absensi (None kalau tidak ada),
+    jam masuk & jam pulang (detik sejak tengah malam, None kalau kosong).
+    """
+    # Nomor hari ditulis langsung (skema.SQL_NOMOR_HARI), skema.py mengimpor modul ini
+    return conn.execute("""
+        SELECT k.tanggal, k.hari_kerja, k.keterangan, a.id AS id_absensi,
+               a.detik_masuk AS jam_masuk, a.detik_pulang AS jam_pulang
+        FROM kalender k
+        LEFT JOIN absensi a ON a.nip = ? AND a.nomor_hari = CAST(julianday(k.tanggal) - 2440587.5 AS INTEGER)
+        WHERE k.tanggal BETWEEN ? AND ?
+        ORDER BY k.tanggal
+    """, (nip, awal, akhir)).fetchall()
+
+
+def info_rentang(conn, awal, akhir):
+    """Rentang [awal, akhir) -> (jumlah hari kerja, {tanggal: keterangan} untuk hari yang bukan hari kerja)."""
+    rows = conn.execute(
+        "SELECT tanggal, hari_kerja, keterangan FROM kalender WHERE tanggal >= ? AND tanggal < ?",
+        (awal, akhir)
+    ).fetchall()
+    libur = {row[0]: row[2] or 'Akhir pekan' for row in rows if not row[1]}
+    return sum(row[1] for row in rows), libur
+
+
+def daftar_libur(conn, tahun):
+    """Hari libur hasil impor (yang punya keterangan) dalam satu tahun."""
+    return conn.execute(
+        "SELECT tanggal, keterangan FROM kalender WHERE tanggal >= ? AND tanggal < ? AND keterangan IS NOT NULL ORDER BY tanggal",
+        (f"{int(tahun):04d}-01-01", f"{int(tahun) + 1:04d}-01-01")
+    ).fetchall()
+
+
+# --- Impor hari libur ---
+def _tanggal(teks):
+    teks = teks.strip()
+    for fmt in FORMAT_TANGGAL:
+        try:
+            return datetime.strptime(teks, fmt).date()
+        except ValueError:
+            continue
+    raise FormatTidakValid(f"Tanggal tidak dikenali: '{teks}'")
+
+
+def baca_csv(teks):
+    """CSV 'tanggal,keterangan' (header opsional) -> [(date, keterangan)]."""
+    hasil = []
+    for nomor, kolom in enumerate(csv.reader(io.StringIO(teks)), start=1):
+        if not kolom or not kolom[0].strip():
+            continue
+        if nomor == 1 and kolom[0].strip().lower() in ('tanggal', 'date'):
+            continue
+        keterangan = kolom[1].strip() if len(kolom) > 1 and kolom[1].strip() else 'Hari libur'
+        try:
+            hasil.append((_tanggal(kolom[0]), keterangan))
+        except FormatTidakValid as e:
+            raise FormatTidakValid(f"Baris {nomor}: {e}")
+    return hasil
+
+
+def _unescape_ics(teks):
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), teks)
+
+
+def baca_ics(teks):
+    """iCalendar (VEVENT dengan DTSTART/DTEND/SUMMARY) -> [(date, keterangan)].
+
+    DTEND untuk acara sehari penuh bersifat eksklusif, jadi acara beberapa hari
+    (misalnya cuti bersama) dipecah menjadi satu entri per tanggal.
+    """
+    # Baris yang diawali spasi/tab adalah lanjutan baris sebelumnya (RFC 5545)
+    baris = re.sub(r"\r?\n[ \t]", "", teks).splitlines()
+    hasil, acara = [], None
+    for b in baris:
+        nama, _, nilai = b.partition(":")
+        nama = nama.split(";")[0].upper()
+        if nama == "BEGIN" and nilai.strip().upper() == "VEVENT":
+            acara = {}
+        elif nama == "END" and nilai.strip().upper() == "VEVENT" and acara is not None:
+            if "DTSTART" not in acara:
+                raise FormatTidakValid("VEVENT tanpa DTSTART")
+            mulai = _tanggal(acara["DTSTART"][:8])
+            selesai = _tanggal(acara["DTEND"][:8]) if "DTEND" in acara else mulai + timedelta(days=1)
+            keterangan = _unescape_ics(acara.get("SUMMARY", "")).strip() or 'Hari libur'
+            hari = mulai
+            while hari < max(selesai, mulai + timedelta(days=1)):
+                hasil.append((hari, keterangan))
+                hari += timedelta(days=1)
+            acara = None
+        elif acara is not None and nama in ("DTSTART", "DTEND", "SUMMARY"):
+            acara[nama] = nilai.strip()
+    return hasil
+
+
+def baca_file(nama_file, isi):
+    """Pilih parser dari ekstensi file. isi berupa bytes."""
+    teks = isi.decode("utf-8-sig", errors="replace")
+    ext = os.path.splitext(nama_file or "")[1].lower()
+    if ext == ".ics":
+        return baca_ics(teks)
+    if ext == ".csv":
+        return baca_csv(teks)
+    raise FormatTidakValid("Gunakan file .csv atau .ics")
+
+
+def impor(conn, libur):
+    """Terapkan daftar libur [(date, keterangan)] (tanpa commit).
+
+    Libur lama di tahun-tahun yang ada di file dikembalikan ke hari biasa dulu,
+    jadi file yang diimpor ulang setelah diperbaiki langsung menggantikan isinya.
+    Mengembalikan jumlah tanggal libur yang diterapkan.
+    """
+    if not libur:
+        return 0
+    tahun = sorted({d.year for d, _ in libur})
+    isi_tahun(conn, tahun[0], tahun[-1])
+    for t in tahun:
+        conn.execute("""
+            UPDATE kalender SET hari_kerja = strftime('%w', tanggal) NOT IN ('0', '6'), keterangan = NULL
+            WHERE tanggal >= ? AND tanggal < ? AND keterangan IS NOT NULL
+        """, (f"{t:04d}-01-01", f"{t + 1:04d}-01-01"))
+
+    # Tanggal yang sama muncul dua kali (misal libur nasional + cuti bersama): keterangannya digabung
+    per_tanggal = {}
+    for d, keterangan in libur:
+        if keterangan not in per_tanggal.setdefault(d.isoformat(), []):
+            per_tanggal[d.isoformat()].append(keterangan)
+    conn.executemany(
+        "UPDATE kalender SET hari_kerja = 0, keterangan = ? WHERE tanggal = ?",
+        [(" / ".join(ket), tgl) for tgl, ket in per_tanggal.items()]
+    )
+    return len(per_tanggal)
+
+
+if __name__ == '__main__':
+    perintah = sys.argv[1] if len(sys.argv) > 1 else "libur"
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if perintah == "impor" and len(sys.argv) > 2:
+            with open(sys.argv[2], "rb") as f:
+                jumlah = impor(conn, baca_file(sys.argv[2], f.read()))
+            conn.commit()
+            print(f"{jumlah} tanggal libur diimpor dari {sys.argv[2]}.")
+        elif perintah == "isi" and len(sys.argv) > 3:
+            isi_tahun(conn, sys.argv[2], sys.argv[3])
+            conn.commit()
+            print(f"Kalender {sys.argv[2]}-{sys.argv[3]} sudah terisi.")
+        elif perintah == "libur":
+            tahun = sys.argv[2] if len(sys.argv) > 2 else date.today().year
+            for tanggal, keterangan in daftar_libur(conn, tahun):
+                print(f"  {tanggal}  {keterangan}")
+        else:
+            raise SystemExit("Gunakan: python kalender.py impor <file.csv|file.ics> | isi <tahun_awal> <tahun_akhir> | libur [tahun]")
+    finally:
+        conn.close()
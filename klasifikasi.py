@@ -0,0 +1,118 @@
+# klasifikasi.py
+# Mesin klasifikasi status absensi yang dipakai bersama oleh dashboard_dosen,
+# get_absensi_summary dan rekap_laporan_view. Semua baris diproses sekaligus
+# (vektor pandas/NumPy). Input berupa kolom integer tabel absensi (skema.py
+# migrasi v12), jadi tidak ada teks tanggal/jam yang perlu di-parse.
+import numpy as np
+import pandas as pd
+
+BATAS_DURASI_DETIK = 4 * 3600   # aturan kehadiran minimal 4 jam
+
+STATUS_MENUNGGU = "Menunggu Persetujuan Kajur"
+STATUS_DISETUJUI = "Disetujui Kajur"
+STATUS_DITOLAK = "Ditolak Kajur"
+
+# Teks & warna per tampilan. 'dosen' untuk dashboard_dosen, 'ringkas' untuk
+# pop-up get_absensi_summary (class CSS langsung "status-...").
+GAYA = {
+    'dosen': {
+        'menunggu': "Menunggu Persetujuan Kajur",
+        'kurang': "Kehadiran Kurang Dari 4 Jam",
+        'prefix_warna': "",
+        'kosong': " - ",
+    },
+    'ringkas': {
+        'menunggu': "Menunggu Persetujuan",
+        'kurang': "Kurang Dari 4 Jam",
+        'prefix_warna': "status-",
+        'kosong': "-",
+    },
+}
+
+KODE_REKAP = ['KT', 'PK', 'NF', 'FL', 'CT', 'IZ']
+
+
+def _format_jam(detik, kosong):
+    # detik sejak tengah malam -> 'HH:MM'
+    ada = detik.notna()
+    total = detik.fillna(0).astype('int64')
+    jam = (total // 3600).astype(str).str.zfill(2)
+    menit = ((total % 3600) // 60).astype(str).str.zfill(2)
+    return (jam + ':' + menit).where(ada, kosong)
+
+
+def klasifikasi_absensi(rows, klarifikasi=None, gaya='dosen'):
+    """Klasifikasi sekumpulan baris absensi.
+
+    rows: hasil fetchall() (sqlite3.Row) atau list of dict dari tabel absensi,
+        minimal berisi nip, nomor_hari, detik_masuk, detik_pulang, durasi_detik,
+        status dan keterangan.
+    klarifikasi: (opsional) baris klarifikasi yang disetujui, berisi nip,
+        tanggal_klarifikasi dan kategori_surat, untuk membedakan kode NF/FL/IZ.
+    Mengembalikan DataFrame berisi kolom asli ditambah tanggal_formatted,
+    jam_masuk_formatted, jam_pulang_formatted, status_text, status_color,
+    checkbox_enabled, hari dan kode (KT/PK/NF/FL/CT/IZ).
+    """
+    label = GAYA[gaya]
+    df = pd.DataFrame([dict(r) for r in rows])
+    if df.empty:
+        return df
+
+    tanggal = pd.to_datetime(pd.to_numeric(df['nomor_hari']), unit='D')
+    df['tanggal_formatted'] = tanggal.dt.strftime('%d/%m/%Y')
+    df['hari'] = tanggal.dt.day
+    tgl = tanggal.dt.strftime('%Y-%m-%d')
+
+    masuk = pd.to_numeric(df['detik_masuk'])
+    pulang = pd.to_numeric(df['detik_pulang'])
+    df['jam_masuk_formatted'] = _format_jam(masuk, label['kosong'])
+    df['jam_pulang_formatted'] = _format_jam(pulang, label['kosong'])
+
+    status = df['status'].fillna('').astype(str).str.strip()
+    keterangan = df['keterangan'].fillna('').astype(str)
+    lengkap = masuk.notna() & pulang.notna()
+    terpenuhi = lengkap & (pd.to_numeric(df['durasi_detik']) >= BATAS_DURASI_DETIK)
+
+    menunggu = status == STATUS_MENUNGGU
+    disetujui = status == STATUS_DISETUJUI
+    ditolak = status == STATUS_DITOLAK
+
+    # --- Status untuk tampilan (urutan kondisi = prioritas) ---
+    kondisi = [menunggu, disetujui, ditolak, lengkap & terpenuhi, lengkap]
+    df['status_text'] = np.select(kondisi, [
+        label['menunggu'],
+        keterangan.where(keterangan != '', STATUS_DISETUJUI),
+        "Ditolak: " + keterangan,
+        "Kehadiran Terpenuhi",
+        label['kurang'],
+    ], default="Perlu Klarifikasi")
+    warna = np.select(kondisi, ['yellow', 'green', 'red', 'green', 'red'], default='red')
+    df['status_color'] = label['prefix_warna'] + pd.Series(warna, index=df.index)
+    # Checkbox klarifikasi hanya aktif untuk data yang ditolak / perlu klarifikasi
+    df['checkbox_enabled'] = ditolak | ~(menunggu | disetujui | ditolak | lengkap)
+
+    # --- Kode rekap ---
+    kategori = pd.Series('', index=df.index)
+    if klarifikasi:
+        df_klarif = pd.DataFrame([dict(k) for k in klarifikasi])
+        df_klarif['tgl'] = df_klarif['tanggal_klarifikasi'].astype(str).str.split(' ').str[0]
+        peta = df_klarif.drop_duplicates(['nip', 'tgl'], keep='last').set_index(['nip', 'tgl'])['kategori_surat']
+        kategori = pd.Series(
+            peta.reindex(pd.MultiIndex.from_arrays([df['nip'], tgl])).to_numpy(), index=df.index
+        ).fillna('').astype(str)
+
+    df['kode'] = np.select([
+        disetujui & keterangan.str.contains('Cuti', regex=False),
+        disetujui & kategori.str.contains('Non Fleksibel', regex=False),
+        disetujui & kategori.str.contains('Fleksibel', regex=False),
+        disetujui,
+        (status == 'Hadir') & terpenuhi,
+    ], ['CT', 'NF', 'FL', 'IZ', 'KT'], default='PK')
+    return df
+
+
+def ke_records(df):
+    """DataFrame hasil klasifikasi -> list of dict (NaN jadi None) untuk template/JSON."""
+    if df.empty:
+        return []
+    return df.astype(object).where(df.notna(), None).to_dict('records')
@@ -0,0 +1,75 @@
+# kompresi.py
+# Kompresi respons gzip/brotli di sisi aplikasi (after_request), untuk deploy
+# tanpa reverse proxy yang mengompres (misalnya Railway langsung ke gunicorn).
+# Hanya respons teks (HTML, JSON, CSV, JS, CSS, SVG) yang ukurannya minimal
+# KOMPRESI_MIN_BYTES yang dikompres; file unggahan, xlsx dan respons streaming
+# dilewati. Brotli dipakai kalau paket 'brotli' terpasang dan diterima
+# browser, selain itu gzip. Set KOMPRESI=0 kalau proxy di depan sudah mengompres.
+#
+# Ukuran sebelum/sesudah kompresi per endpoint tercatat di /metrics
+# (sid_response_bytes_total, lihat metrik.py).
+import os
+import gzip
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:   # opsional
+    brotli = None
+
+AKTIF = str(os.getenv("KOMPRESI", "1")).lower() in ("1", "true", "yes")
+MIN_BYTES = int(os.getenv("KOMPRESI_MIN_BYTES", "1024"))
+LEVEL_GZIP = 6
+KUALITAS_BROTLI = 4   # kualitas rendah-menengah: hampir sekecil gzip -9, jauh lebih cepat
+JENIS_TEKS = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+
+def pilih_encoding():
+    """Encoding terbaik yang diterima klien ('br', 'gzip') atau None."""
+    diterima = request.accept_encodings
+    if brotli is not None and diterima.quality('br') > 0:
+        return 'br'
+    if diterima.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def kompres(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=KUALITAS_BROTLI)
+    return gzip.compress(data, compresslevel=LEVEL_GZIP, mtime=0)
+
+
+def _perlu_dikompres(response):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers or request.method == 'HEAD':
+        return False
+    return (response.mimetype or '').startswith(JENIS_TEKS)
+
+
+def _kompres_respons(response):
+    if not _perlu_dikompres(response):
+        return response
+    # Jenis respons ini bisa dikompres, jadi cache perlu membedakan per Accept-Encoding
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    g.ukuran_asli = len(data)
+    encoding = pilih_encoding()
+    if encoding is None or len(data) < MIN_BYTES:
+        return response
+
+    hasil = kompres(data, encoding)
+    if len(hasil) >= len(data):
+        return response
+    response.set_data(hasil)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    if AKTIF:
+        app.after_request(_kompres_respons)
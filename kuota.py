@@ -0,0 +1,104 @@
+# kuota.py
+# Buku besar (ledger) kuota cuti & pengajuan klarifikasi.
+# Tabel kuota_cuti (nip, tahun) dan kuota_klarifikasi (nip, bulan, jenis_surat)
+# dijaga oleh trigger database (lihat skema.py, migrasi v2), jadi setiap
+# penulisan lewat proses_klarifikasi, input_cuti, submit_klarifikasi maupun
+# migrasi_data.py otomatis ikut tercatat. Pembacaan cukup satu lookup primary key.
+#
+# Perintah manual:
+#   python kuota.py verify    -> bandingkan ledger dengan hitungan ulang dari data asli
+#   python kuota.py rebuild   -> hitung ulang seluruh ledger dari data asli
+import os
+import sys
+import sqlite3
+
+DATABASE = os.getenv("DATABASE", "database.db")
+
+BATAS_LUPA_ABSEN = 2   # maksimal pengajuan 'Lupa Absen Masuk/Pulang' per bulan
+
+# Satu definisi "hari cuti" untuk semua tempat: absensi yang disetujui dengan
+# keterangan diawali jenis cuti (input_cuti menulis "<jenis_cuti> - <alasan>").
+# Hanya 'Cuti Tahunan' yang mengurangi jatah_cuti_tahunan.
+SQL_HITUNG_CUTI = """
+    SELECT nip, substr(tanggal, 1, 4) AS tahun,
+           SUM(keterangan LIKE 'Cuti Tahunan%') AS cuti_tahunan,
+           SUM(keterangan NOT LIKE 'Cuti Tahunan%') AS cuti_lain
+    FROM attendance
+    WHERE nip IS NOT NULL AND status = 'Disetujui Kajur' AND keterangan LIKE 'Cuti%'
+    GROUP BY nip, tahun
+"""
+
+SQL_HITUNG_KLARIFIKASI = """
+    SELECT nip, substr(tanggal_pengajuan, 1, 7) AS bulan, jenis_surat, COUNT(*) AS jumlah
+    FROM clarifications
+    WHERE nip IS NOT NULL
+    GROUP BY nip, bulan, jenis_surat
+"""
+
+
+# --- Pembacaan ---
+def cuti_terpakai(conn, nip, tahun):
+    """Jumlah hari 'Cuti Tahunan' yang sudah disetujui untuk nip di tahun tersebut."""
+    row = conn.execute(
+        "SELECT cuti_tahunan FROM kuota_cuti WHERE nip = ? AND tahun = ?",
+        (nip, str(tahun))
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def jumlah_klarifikasi(conn, nip, bulan):
+    """{jenis_surat: jumlah} pengajuan klarifikasi nip di bulan 'YYYY-MM'."""
+    rows = conn.execute(
+        "SELECT jenis_surat, jumlah FROM kuota_klarifikasi WHERE nip = ? AND bulan = ?",
+        (nip, bulan)
+    ).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+# --- Pemeliharaan ---
+def bangun_ulang(conn):
+    """Hitung ulang seluruh ledger dari tabel attendance & clarifications (tanpa commit)."""
+    conn.execute("DELETE FROM kuota_cuti")
+    conn.execute(f"INSERT INTO kuota_cuti (nip, tahun, cuti_tahunan, cuti_lain) {SQL_HITUNG_CUTI}")
+    conn.execute("DELETE FROM kuota_klarifikasi")
+    conn.execute(f"INSERT INTO kuota_klarifikasi (nip, bulan, jenis_surat, jumlah) {SQL_HITUNG_KLARIFIKASI}")
+
+
+def verifikasi(conn):
+    """Daftar selisih antara ledger dan hitungan ulang. List kosong berarti konsisten."""
+    selisih = []
+    # Baris bernilai 0 (misal setelah cuti dibatalkan) dianggap sama dengan tidak ada baris.
+    for nama, sql_ledger, sql_asli in [
+        ("kuota_cuti",
+         "SELECT nip, tahun, cuti_tahunan, cuti_lain FROM kuota_cuti WHERE cuti_tahunan != 0 OR cuti_lain != 0",
+         SQL_HITUNG_CUTI),
+        ("kuota_klarifikasi",
+         "SELECT nip, bulan, jenis_surat, jumlah FROM kuota_klarifikasi WHERE jumlah != 0",
+         SQL_HITUNG_KLARIFIKASI),
+    ]:
+        for row in conn.execute(f"{sql_ledger} EXCEPT {sql_asli}"):
+            selisih.append((nama, "ledger", tuple(row)))
+        for row in conn.execute(f"{sql_asli} EXCEPT {sql_ledger}"):
+            selisih.append((nama, "seharusnya", tuple(row)))
+    return selisih
+
+
+if __name__ == '__main__':
+    perintah = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if perintah == "rebuild":
+            bangun_ulang(conn)
+            conn.commit()
+            print("Ledger kuota selesai dihitung ulang.")
+        elif perintah == "verify":
+            selisih = verifikasi(conn)
+            for tabel, sumber, row in selisih:
+                print(f"  [{tabel}] {sumber}: {row}")
+            if selisih:
+                raise SystemExit(f"Ledger TIDAK konsisten ({len(selisih)} selisih). Jalankan: python kuota.py rebuild")
+            print("Ledger kuota konsisten dengan data absensi & klarifikasi.")
+        else:
+            raise SystemExit(f"Perintah tidak dikenal: {perintah} (gunakan 'verify' atau 'rebuild')")
+    finally:
+        conn.close()
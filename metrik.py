@@ -0,0 +1,211 @@
+# metrik.py
+# Instrumentasi request: latensi per endpoint & role, jumlah dan waktu
+# statement SQL per request, diekspor sebagai teks Prometheus di /metrics.
+# Statement SQL dihitung lewat sqlite3 set_trace_callback pada koneksi dari
+# get_db_connection (statement di dalam trigger ikut terhitung, tercatat dengan
+# teks statement pemicunya). Waktunya diukur di sekitar execute/executemany
+# (db.KoneksiTerukur), jadi baris yang di-fetch bertahap setelah execute
+# (misalnya respons streaming) tidak ikut terhitung.
+# Ukuran body respons yang dikirim (setelah kompresi, lihat kompresi.py) dan
+# sebelum kompresi dijumlahkan per endpoint untuk mengukur transfer halaman.
+# Request yang melewati METRIK_BATAS_QUERY statement atau METRIK_BATAS_DETIK
+# detik dicatat ke log beserta statement yang paling sering diulang.
+#
+# Metrik disimpan di memori per proses. Dengan beberapa worker gunicorn,
+# setiap scrape hanya melihat worker yang melayaninya (label pid).
+import os
+import re
+import hmac
+import time
+import threading
+from collections import Counter, defaultdict
+
+from flask import g, request, session, has_request_context
+
+import db
+
+BUCKET_DETIK = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKET_QUERY = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+BATAS_QUERY = int(os.getenv("METRIK_BATAS_QUERY", "50"))
+BATAS_DETIK = float(os.getenv("METRIK_BATAS_DETIK", "1.0"))
+# Trace callback memberi SQL dengan nilai parameter; literal diganti '?' supaya
+# statement yang sama (pola N+1) terkumpul jadi satu
+POLA_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# Token untuk scraper Prometheus (header "Authorization: Bearer <token>"); admin yang login selalu boleh
+TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+class Histogram:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.jumlah_bucket = [0] * len(bucket)
+        self.total = 0.0
+        self.jumlah = 0
+
+    def amati(self, nilai):
+        for i, batas in enumerate(self.bucket):
+            if nilai <= batas:
+                self.jumlah_bucket[i] += 1
+        self.total += nilai
+        self.jumlah += 1
+
+
+class PengamatSQL:
+    """Penampung statistik SQL untuk satu request."""
+
+    def __init__(self):
+        self.statement = Counter()
+        self.detik = 0.0
+
+    def sql(self, statement):
+        self.statement[POLA_LITERAL.sub("?", " ".join(statement.split()))[:200]] += 1
+
+    def waktu_sql(self, detik):
+        self.detik += detik
+
+    @property
+    def jumlah(self):
+        return sum(self.statement.values())
+
+
+_lock = threading.Lock()
+_durasi = defaultdict(lambda: Histogram(BUCKET_DETIK))      # (endpoint, role)
+_query = defaultdict(lambda: Histogram(BUCKET_QUERY))       # (endpoint,)
+_detik_sql = defaultdict(float)                             # (endpoint,)
+_request = defaultdict(int)                                 # (endpoint, role, status)
+_lambat = defaultdict(int)                                  # (endpoint,)
+_bytes = defaultdict(int)                                   # (endpoint, encoding)
+_bytes_asli = defaultdict(int)                              # (endpoint,)
+
+
+def _pengamat_request():
+    if not has_request_context():
+        return None
+    if 'pengamat_sql' not in g:
+        g.pengamat_sql = PengamatSQL()
+    return g.pengamat_sql
+
+
+def _mulai():
+    g.metrik_mulai = time.perf_counter()
+
+
+def _selesai(response, logger):
+    mulai = g.pop('metrik_mulai', None)
+    if mulai is None:
+        return response
+    detik = time.perf_counter() - mulai
+    # Endpoint yang tidak dikenal (404) digabung supaya jumlah label tidak meledak
+    endpoint = request.endpoint or 'tidak_dikenal'
+    role = session.get('user_role') or 'anonim'
+    pengamat = g.get('pengamat_sql') or PengamatSQL()
+    jumlah_sql = pengamat.jumlah
+    # Respons streaming tidak punya panjang yang diketahui di sini. calculate_content_length
+    # pada respons streaming akan membaca seluruh generator ke memori, jadi dilewati.
+    ukuran = response.content_length or (None if response.is_streamed else response.calculate_content_length()) or 0
+    ukuran_asli = g.pop('ukuran_asli', ukuran)
+    encoding = response.headers.get('Content-Encoding', 'identity')
+
+    with _lock:
+        _durasi[(endpoint, role)].amati(detik)
+        _query[(endpoint,)].amati(jumlah_sql)
+        _detik_sql[(endpoint,)] += pengamat.detik
+        _request[(endpoint, role, str(response.status_code))] += 1
+        _bytes[(endpoint, encoding)] += ukuran
+        _bytes_asli[(endpoint,)] += ukuran_asli
+        if jumlah_sql > BATAS_QUERY or detik > BATAS_DETIK:
+            _lambat[(endpoint,)] += 1
+
+    if jumlah_sql > BATAS_QUERY or detik > BATAS_DETIK:
+        terbanyak = "; ".join(f"{n}x {sql}" for sql, n in pengamat.statement.most_common(3))
+        logger.warning(
+            f"Request lambat: {request.method} {request.path} (endpoint={endpoint}, role={role}) "
+            f"{detik * 1000:.0f} ms, {jumlah_sql} statement SQL ({pengamat.detik * 1000:.0f} ms). "
+            f"Terbanyak: {terbanyak or '-'}"
+        )
+    return response
+
+
+def init_app(app):
+    db.atur_pengamat(_pengamat_request)
+    app.before_request(_mulai)
+    app.after_request(lambda response: _selesai(response, app.logger))
+
+
+def boleh_akses():
+    """Admin yang login, atau scraper dengan token METRICS_TOKEN."""
+    if session.get('user_role') == 'Admin':
+        return True
+    header = request.headers.get('Authorization', '')
+    return bool(TOKEN) and header.startswith('Bearer ') and hmac.compare_digest(header[7:], TOKEN)
+
+
+# --- Format teks Prometheus ---
+def _label(nama_label, nilai):
+    isi = ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in zip(nama_label, nilai)
+    )
+    return f"{{{isi}}}" if isi else ""
+
+
+def _tulis_histogram(baris, nama, bantuan, nama_label, data):
+    baris += [f"# HELP {nama} {bantuan}", f"# TYPE {nama} histogram"]
+    for nilai_label, h in sorted(data.items()):
+        for batas, jumlah in zip(h.bucket, h.jumlah_bucket):
+            baris.append(f"{nama}_bucket{_label(nama_label + ('le',), nilai_label + (batas,))} {jumlah}")
+        baris.append(f"{nama}_bucket{_label(nama_label + ('le',), nilai_label + ('+Inf',))} {h.jumlah}")
+        baris.append(f"{nama}_sum{_label(nama_label, nilai_label)} {h.total:.6f}")
+        baris.append(f"{nama}_count{_label(nama_label, nilai_label)} {h.jumlah}")
+
+
+def _tulis_counter(baris, nama, bantuan, nama_label, data, jenis="counter"):
+    baris += [f"# HELP {nama} {bantuan}", f"# TYPE {nama} {jenis}"]
+    for nilai_label, nilai in sorted(data.items()):
+        baris.append(f"{nama}{_label(nama_label, nilai_label)} {nilai}")
+
+
+def teks_prometheus(statistik_sesi=None, statistik_stream=None):
+    """statistik_sesi: hasil sesi.statistik_aktif(app), atau None kalau session tidak lewat sesi.py.
+    statistik_stream: hasil notifikasi.statistik() (stream SSE dashboard Kajur)."""
+    baris = []
+    with _lock:
+        _tulis_histogram(baris, "sid_request_duration_seconds", "Durasi request per endpoint dan role.",
+                         ('endpoint', 'role'), _durasi)
+        _tulis_histogram(baris, "sid_request_sql_statements", "Jumlah statement SQL per request.",
+                         ('endpoint',), _query)
+        _tulis_counter(baris, "sid_sql_seconds_total", "Total waktu execute SQL per endpoint.",
+                       ('endpoint',), {k: f"{v:.6f}" for k, v in _detik_sql.items()})
+        _tulis_counter(baris, "sid_requests_total", "Jumlah request per endpoint, role dan status HTTP.",
+                       ('endpoint', 'role', 'status'), _request)
+        _tulis_counter(baris, "sid_response_bytes_total", "Byte body respons yang dikirim per endpoint dan encoding.",
+                       ('endpoint', 'encoding'), _bytes)
+        _tulis_counter(baris, "sid_response_uncompressed_bytes_total", "Byte body respons sebelum kompresi per endpoint.",
+                       ('endpoint',), _bytes_asli)
+        _tulis_counter(baris, "sid_slow_requests_total",
+                       f"Request di atas {BATAS_QUERY} statement SQL atau {BATAS_DETIK} detik.",
+                       ('endpoint',), _lambat)
+
+    # Statistik pool koneksi (db.py) sebagai gauge
+    pool = {}
+    for jenis_pool, data in db.statistik_pool().items():
+        for kunci in ('aktif', 'idle', 'puncak_aktif', 'dibuat', 'dipinjam'):
+            pool[(jenis_pool, kunci)] = data[kunci]
+    _tulis_counter(baris, "sid_db_pool", "Statistik pool koneksi SQLite.", ('pool', 'statistik'), pool, jenis="gauge")
+    if statistik_sesi is not None:
+        _tulis_counter(baris, "sid_sessions", "Jumlah session tersimpan (termasuk yang menunggu disapu).", (),
+                       {(): statistik_sesi['jumlah']}, jenis="gauge")
+        _tulis_counter(baris, "sid_session_bytes", "Total ukuran isi session tersimpan.", (),
+                       {(): statistik_sesi['bytes']}, jenis="gauge")
+        _tulis_counter(baris, "sid_sessions_expired", "Session kedaluwarsa yang belum disapu.", (),
+                       {(): statistik_sesi['kedaluwarsa']}, jenis="gauge")
+    if statistik_stream is not None:
+        _tulis_counter(baris, "sid_sse_streams", "Stream SSE dashboard Kajur yang sedang tersambung.", (),
+                       {(): statistik_stream['aktif']}, jenis="gauge")
+        _tulis_counter(baris, "sid_sse_events_total", "Event yang dikirim ke stream SSE.", (),
+                       {(): statistik_stream['event']})
+        _tulis_counter(baris, "sid_sse_rejected_total", "Stream SSE ditolak karena batas per proses penuh.", (),
+                       {(): statistik_stream['ditolak']})
+    _tulis_counter(baris, "sid_process_info", "Proses worker yang menjawab scrape ini.", ('pid',),
+                   {(str(os.getpid()),): 1}, jenis="gauge")
+    return "\n".join(baris) + "\n"
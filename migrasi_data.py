@@ -1,114 +1,264 @@
-import pandas as pd
+import os
+import sys
+import time
+import logging
 import sqlite3
-from werkzeug.security import generate_password_hash
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import sandi
+import skema
+
+logger = logging.getLogger(__name__)
 
 # --- KONFIGURASI ---
 # Ubah nama file ini setiap kali Anda ingin migrasi data dari bulan baru
-EXCEL_FILE = "db_agustus.xlsx" 
-DB_FILE = "database.db"
+# (atau berikan sebagai argumen: python migrasi_data.py db_september.xlsx)
+EXCEL_FILE = "db_agustus.xlsx"
+DB_FILE = os.getenv("DATABASE", "database.db")
 ATTENDANCE_SHEETS = ['BP', 'BT', 'PKH', 'RPK', 'THP']
 USERS_SHEET = 'data_akses'
 
-def run_migration():
+# Jumlah baris per transaksi saat menulis absensi. Transaksi besar jauh lebih
+# cepat daripada commit per baris, tapi tetap dipotong supaya lock tulis
+# tidak menahan aplikasi terlalu lama.
+CHUNK_SIZE = int(os.getenv("MIGRASI_CHUNK_SIZE", "10000"))
+# Jumlah proses untuk hashing password user baru (None = jumlah CPU)
+HASH_WORKERS = int(os.getenv("MIGRASI_HASH_WORKERS", "0")) or None
+
+# Kolom workbook yang ditulis ke tabel absensi (jurusan diambil dari users)
+KOLOM_ABSENSI = ['nip', 'nama_lengkap', 'tanggal', 'jam masuk', 'jam pulang', 'status', 'keterangan']
+KOLOM_USERS = ['nip', 'password', 'nama_lengkap', 'jurusan', 'detail jurusan', 'role', 'jatah_cuti_tahunan']
+
+
+# --- Fungsi Bantuan ---
+def kolom_tabel(conn, tabel):
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({tabel})") if row[6] == 0}
+
+
+def baca_workbook(excel_file):
+    """Baca sheet user dan semua sheet absensi sekaligus (file dibuka sekali)."""
+    sheets = pd.read_excel(excel_file, sheet_name=[USERS_SHEET] + ATTENDANCE_SHEETS, dtype={'nip': str})
+    df_absensi = pd.concat([sheets[sheet] for sheet in ATTENDANCE_SHEETS], ignore_index=True)
+    return sheets[USERS_SHEET], df_absensi
+
+
+def format_jam(nilai):
+    # Jam dari Excel bisa berupa datetime.time atau teks. Disimpan sebagai teks
+    # 'HH:MM:SS.ffffff', sama dengan data yang sudah ada di database.
+    if nilai is None or (not isinstance(nilai, str) and pd.isna(nilai)):
+        return None
+    if hasattr(nilai, 'strftime'):
+        return nilai.strftime('%H:%M:%S.%f')
+    return str(nilai).strip() or None
+
+
+def siapkan_absensi(df):
+    """Normalisasi tanggal ke 'YYYY-MM-DD 00:00:00' dan buang baris ganda di dalam file."""
+    df = df.copy()
+    df['nip'] = df['nip'].str.strip()
+    tgl = pd.to_datetime(df['tanggal'], errors='coerce')
+    invalid = tgl.isna() | df['nip'].isna()
+    if invalid.any():
+        print(f"  -> {int(invalid.sum())} baris absensi dilewati (nip/tanggal kosong atau tidak valid).")
+    df = df[~invalid]
+    df['tgl'] = tgl[~invalid].dt.strftime('%Y-%m-%d')
+    df['tanggal'] = df['tgl'] + ' 00:00:00'
+    for kolom in ('jam masuk', 'jam pulang'):
+        df[kolom] = df[kolom].map(format_jam)
+    df['status'] = 'Hadir'
+    df['keterangan'] = ''
+    # Sama seperti sebelumnya: data pertama untuk (nip, tanggal) yang dipakai
+    return df.drop_duplicates(subset=['nip', 'tgl'], keep='first')
+
+
+def anti_join_absensi(conn, df):
+    """Buang baris yang (nip, tgl)-nya sudah ada di database (satu query berindeks untuk rentang file)."""
+    if df.empty:
+        return df
+    awal, akhir = skema.nomor_hari(df['tgl'].min()), skema.nomor_hari(df['tgl'].max())
+    existing = pd.DataFrame(
+        conn.execute(
+            f"SELECT nip, {skema.SQL_TANGGAL.format('nomor_hari')} FROM absensi WHERE nomor_hari BETWEEN ? AND ?",
+            (awal, akhir)
+        ).fetchall(),
+        columns=['nip', 'tgl']
+    )
+    if existing.empty:
+        return df
+    merged = df.merge(existing.assign(_ada=True), on=['nip', 'tgl'], how='left')
+    return df[merged['_ada'].isna().to_numpy()]
+
+
+def hash_passwords(nips, workers=HASH_WORKERS):
+    """sandi.buat_hash (PASSWORD_HASH_METHOD) untuk banyak nip sekaligus, dibagi ke beberapa proses."""
+    if len(nips) < 8:
+        return [sandi.buat_hash(nip) for nip in nips]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(sandi.buat_hash, nips, chunksize=4))
+
+
+def tulis_users(conn, df_users):
+    """Tambah user baru saja; user lama tidak diubah (password, jatah_cuti, dll tetap)."""
+    df = df_users.dropna(subset=['nip']).copy()
+    df['nip'] = df['nip'].str.strip()
+    df = df.drop_duplicates(subset=['nip'], keep='first')
+    existing = {row[0] for row in conn.execute("SELECT nip FROM users")}
+    baru = df[~df['nip'].isin(existing)]
+    if baru.empty:
+        return 0
+
+    for nama in baru['nama_lengkap']:
+        print(f"  -> Menambahkan user baru: {nama}")
+    baru = baru.assign(
+        # Password default sama dengan NIP saat user baru dibuat
+        password=hash_passwords(baru['nip'].tolist()),
+        jatah_cuti_tahunan=12,
+    )
+    kolom = [k for k in KOLOM_USERS if k in kolom_tabel(conn, 'users')]
+    daftar = ", ".join(f'"{k}"' for k in kolom)
+    conn.executemany(
+        f"INSERT INTO users ({daftar}) VALUES ({', '.join('?' * len(kolom))})",
+        baru[kolom].astype(object).where(baru[kolom].notna(), None).itertuples(index=False, name=None)
+    )
+    return len(baru)
+
+
+def tulis_absensi(conn, df, chunk_size=CHUNK_SIZE):
+    """INSERT ... ON CONFLICT DO NOTHING per potongan chunk_size baris, satu transaksi per potongan.
+
+    df berkolom teks seperti workbook (tanggal, jam masuk, jam pulang); diubah ke
+    nomor hari & detik tabel absensi oleh SQLite, sama seperti migrasi skema v12.
+    Mengembalikan jumlah baris yang benar-benar ditambahkan. Kalau gagal di tengah,
+    potongan sebelumnya sudah tersimpan; menjalankan ulang melanjutkan dari sana.
+    """
+    sql = f"""
+        INSERT INTO absensi (nip, nama_lengkap, nomor_hari, detik_masuk, detik_pulang, status, keterangan)
+        VALUES (?, ?, {skema.SQL_NOMOR_HARI.format('?')}, {skema.SQL_DETIK.format('?')}, {skema.SQL_DETIK.format('?')}, ?, ?)
+        ON CONFLICT DO NOTHING
+    """
+
+    nilai = df[KOLOM_ABSENSI].astype(object).where(df[KOLOM_ABSENSI].notna(), None)
+    ditambahkan = 0
+    for mulai in range(0, len(nilai), chunk_size):
+        potongan = nilai.iloc[mulai:mulai + chunk_size]
+        # rowcount tidak ikut menghitung baris yang ditulis trigger (kuota, versi_data, rekap_cache)
+        ditambahkan += conn.executemany(sql, potongan.itertuples(index=False, name=None)).rowcount
+        conn.commit()
+    return ditambahkan
+
+
+def pastikan_tabel_inti(cursor):
+    # Tabel users & attendance (struktur awal database yang sudah berjalan),
+    # supaya database baru bisa dibangun ulang langsung dari workbook. Migrasi
+    # skema v12 lalu memindahkan attendance ke tabel absensi; setelah itu
+    # attendance adalah view dan CREATE ... IF NOT EXISTS di bawah tidak berbuat apa-apa.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        nip TEXT, password INTEGER, nama_lengkap TEXT, jurusan TEXT, "detail jurusan" TEXT,
+        role TEXT, jatah_cuti_tahunan INTEGER DEFAULT 12
+    );
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS attendance (
+        nip TEXT, nama_lengkap TEXT, tanggal TIMESTAMP, "jam masuk" TIME, "jam pulang" TIME,
+        status TEXT, keterangan TEXT
+    );
+    """)
+
+
+def pastikan_tabel_lain(cursor):
+    # Menggunakan "CREATE TABLE IF NOT EXISTS" agar tidak menghapus tabel yang sudah ada
+    print("\nMemeriksa tabel 'clarifications'...")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS clarifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, nip TEXT NOT NULL, nama_lengkap TEXT NOT NULL,
+        jurusan TEXT NOT NULL, tanggal_klarifikasi TEXT NOT NULL, kategori_surat TEXT NOT NULL,
+        jenis_surat TEXT NOT NULL, file_bukti TEXT, status TEXT DEFAULT 'Menunggu Kajur',
+        alasan_penolakan TEXT, tanggal_pengajuan TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        tanggal_proses TIMESTAMP
+    );
+    """)
+    print("-> Tabel 'clarifications' sudah siap.")
+
+    print("\nMemeriksa tabel 'cuti_dosen'...")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS cuti_dosen (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, nip TEXT NOT NULL, nama_lengkap TEXT NOT NULL,
+        tanggal_surat TEXT NOT NULL, tanggal_mulai TEXT NOT NULL, tanggal_selesai TEXT NOT NULL,
+        jenis_cuti TEXT NOT NULL, alasan_cuti TEXT, file_surat_cuti TEXT, diinput_oleh TEXT,
+        tanggal_input TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    print("-> Tabel 'cuti_dosen' sudah siap.")
+
+
+def run_migration(excel_file=EXCEL_FILE, db_file=DB_FILE):
+    """Migrasi satu workbook bulanan.
+
+    Mengembalikan statistik {'users', 'absensi', 'dilewati', 'detik', 'detik_absensi'}.
+    Kesalahan apa pun dicatat lalu dilempar lagi ke pemanggil. User baru dan
+    potongan absensi yang sudah di-commit (lihat tulis_absensi) tetap tersimpan;
+    impor ulang workbook yang sama aman karena baris yang sudah ada dilewati.
+    """
     conn = None
+    hasil = {}
     try:
-        conn = sqlite3.connect(DB_FILE)
+        mulai = time.perf_counter()
+        conn = sqlite3.connect(db_file, timeout=30)
         cursor = conn.cursor()
-        print(f"Berhasil terhubung ke database {DB_FILE}")
+        print(f"Berhasil terhubung ke database {db_file}")
 
-        # --- 1. Migrasi Tabel Users (Mode Cerdas: Tambah/Update) ---
-        print("\nMemulai migrasi data user...")
-        df_users = pd.read_excel(EXCEL_FILE, sheet_name=USERS_SHEET, dtype={'nip': str})
-        
-        for index, row in df_users.iterrows():
-            nip = row['nip']
-            cursor.execute("SELECT nip FROM users WHERE nip = ?", (nip,))
-            data_exists = cursor.fetchone()
-
-            if not data_exists:
-                # Jika user belum ada, tambahkan user baru
-                print(f"  -> Menambahkan user baru: {row['nama_lengkap']}")
-                # Password default sama dengan NIP saat user baru dibuat
-                hashed_password = generate_password_hash(nip) 
-                # Menambahkan 'jatah_cuti_tahunan' dengan nilai default 12
-                cursor.execute("""
-                    INSERT INTO users (nip, password, nama_lengkap, jurusan, "detail jurusan", role, jatah_cuti_tahunan)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (nip, hashed_password, row['nama_lengkap'], row['jurusan'], row['detail jurusan'], row['role'], 12))
-            # Jika user sudah ada, kita tidak melakukan apa-apa untuk menjaga data yang ada (password, jatah_cuti, dll)
-
-        print("-> Migrasi data user selesai.")
+        # Tabel-tabel lain dan migrasi skema (UNIQUE (nip, nomor_hari) tabel absensi dipakai oleh ON CONFLICT)
+        pastikan_tabel_inti(cursor)
+        pastikan_tabel_lain(cursor)
+        conn.commit()
+        skema.jalankan_migrasi(db_file)
+
+        print(f"\nMembaca {excel_file}...")
+        df_users, df_absensi = baca_workbook(excel_file)
+        waktu_baca = time.perf_counter() - mulai
 
+        # --- 1. Migrasi Tabel Users (Mode Cerdas: Tambah, user lama tidak diubah) ---
+        print("\nMemulai migrasi data user...")
+        mulai_users = time.perf_counter()
+        hasil['users'] = tulis_users(conn, df_users)
+        conn.commit()
+        waktu_users = time.perf_counter() - mulai_users
+        print(f"-> Migrasi data user selesai. User baru: {hasil['users']} ({waktu_users:.2f} detik, termasuk hashing password).")
 
         # --- 2. Migrasi Tabel Attendance (Mode Aditif: Hanya Menambah Data Baru) ---
         print("\nMemulai migrasi data absensi...")
-        all_dfs = [pd.read_excel(EXCEL_FILE, sheet_name=sheet, dtype={'nip': str}) for sheet in ATTENDANCE_SHEETS]
-        df_combined = pd.concat(all_dfs, ignore_index=True)
-        
-        added_count = 0
-        skipped_count = 0
-        for index, row in df_combined.iterrows():
-            nip_absen = row['nip']
-            # Konversi tanggal dari Excel ke format yang konsisten (YYYY-MM-DD)
-            tanggal_absen_obj = pd.to_datetime(row['tanggal']).date()
-            tanggal_absen_str = tanggal_absen_obj.strftime('%Y-%m-%d')
-
-            # Cek apakah data absensi untuk NIP dan tanggal tersebut sudah ada
-            cursor.execute("SELECT rowid FROM attendance WHERE nip = ? AND date(tanggal) = ?", (nip_absen, tanggal_absen_str))
-            record_exists = cursor.fetchone()
-
-            if not record_exists:
-                # Jika belum ada, masukkan sebagai data baru
-                full_tanggal_str = f"{tanggal_absen_str} 00:00:00" # Tambahkan jam default
-                cursor.execute("""
-                    INSERT INTO attendance (nip, nama_lengkap, jurusan, "detail jurusan", tanggal, "jam masuk", "jam pulang", status, keterangan)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, 'Hadir', '')
-                """, (nip_absen, row['nama_lengkap'], row['jurusan'], row['detail jurusan'], full_tanggal_str, row['jam masuk'], row['jam pulang']))
-                added_count += 1
-            else:
-                skipped_count += 1
-        
-        print(f"-> Migrasi absensi selesai. Data baru ditambahkan: {added_count}, Data duplikat dilewati: {skipped_count}.")
-
-
-        # --- 3. Pembuatan Tabel Lainnya (Mode Aman: Hanya Jika Belum Ada) ---
-        # Menggunakan "CREATE TABLE IF NOT EXISTS" agar tidak menghapus tabel yang sudah ada
-        
-        print("\nMemeriksa tabel 'clarifications'...")
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS clarifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, nip TEXT NOT NULL, nama_lengkap TEXT NOT NULL,
-            jurusan TEXT NOT NULL, tanggal_klarifikasi TEXT NOT NULL, kategori_surat TEXT NOT NULL,
-            jenis_surat TEXT NOT NULL, file_bukti TEXT, status TEXT DEFAULT 'Menunggu Persetujuan Kajur',
-            alasan_penolakan TEXT, tanggal_pengajuan TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            tanggal_proses TIMESTAMP
-        );
-        """)
-        print("-> Tabel 'clarifications' sudah siap.")
-
-        print("\nMemeriksa tabel 'cuti_dosen'...")
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS cuti_dosen (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, nip TEXT NOT NULL, nama_lengkap TEXT NOT NULL,
-            tanggal_surat TEXT NOT NULL, tanggal_mulai TEXT NOT NULL, tanggal_selesai TEXT NOT NULL,
-            jenis_cuti TEXT NOT NULL, alasan_cuti TEXT, file_surat_cuti TEXT, diinput_oleh TEXT,
-            tanggal_input TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """)
-        print("-> Tabel 'cuti_dosen' sudah siap.")
-        
-        # Simpan semua perubahan ke database
-        conn.commit()
-        print("\nProses migrasi selesai! Database telah diperbarui dengan aman.")
+        mulai_absensi = time.perf_counter()
+        total = len(df_absensi)
+        df_baru = anti_join_absensi(conn, siapkan_absensi(df_absensi))
+        hasil['absensi'] = tulis_absensi(conn, df_baru)
+        hasil['dilewati'] = total - hasil['absensi']
+        waktu_absensi = time.perf_counter() - mulai_absensi
+        hasil['detik'] = time.perf_counter() - mulai
+        hasil['detik_absensi'] = waktu_absensi
+        print(f"-> Migrasi absensi selesai. Data baru ditambahkan: {hasil['absensi']}, Data duplikat dilewati: {hasil['dilewati']}.")
+        if waktu_absensi:
+            print(f"   Penulisan absensi: {waktu_absensi:.2f} detik ({total / waktu_absensi:,.0f} baris/detik).")
 
-    except Exception as e:
-        print(f"\n[ERROR] Terjadi kesalahan: {e}")
+        print(f"\nProses migrasi selesai! {total} baris diproses dalam {hasil['detik']:.2f} detik "
+              f"(baca Excel {waktu_baca:.2f} detik, user {waktu_users:.2f} detik, absensi {waktu_absensi:.2f} detik).")
+
+    except Exception:
+        logger.exception("Migrasi %s gagal (tersimpan sebelum gagal: %s)", excel_file, hasil)
         if conn:
-            conn.rollback() # Batalkan semua perubahan jika terjadi error
+            conn.rollback() # Hanya potongan yang sedang ditulis; potongan sebelumnya sudah di-commit
+        raise
 
     finally:
         if conn:
             conn.close() # Pastikan koneksi selalu ditutup
+    return hasil
 
 if __name__ == '__main__':
-    run_migration()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    try:
+        run_migration(sys.argv[1] if len(sys.argv) > 1 else EXCEL_FILE)
+    except Exception:
+        sys.exit(1)
@@ -0,0 +1,237 @@
+# notifikasi.py
+# Server-Sent Events untuk dashboard Kajur. Klarifikasi baru (submit_klarifikasi)
+# dan klarifikasi yang selesai diproses (proses_klarifikasi / _massal) dikirim
+# ke Kajur jurusan yang sama setelah commit. Dashboard menambah/menghapus baris
+# antrean tanpa reload halaman.
+#
+# Event disebarkan lewat Redis pub/sub (NOTIFIKASI_REDIS, atau SESSION_REDIS
+# kalau SESSION_TYPE=redis), jadi stream di worker gunicorn mana pun menerima
+# event dari worker lain. Tanpa Redis dipakai broker di memori proses. Itu hanya
+# benar untuk satu proses web (boleh banyak thread), seperti Procfile default.
+#
+# Event di stream /stream/klarifikasi (semuanya membawa 'menunggu', jumlah
+# klarifikasi jurusan itu yang masih menunggu):
+#   sinkron   saat tersambung: id antrean terkini + baris yang belum dimiliki
+#             halaman (id > ?setelah= atau Last-Event-ID saat menyambung ulang)
+#   baru      klarifikasi baru diajukan
+#   diproses  klarifikasi disetujui/ditolak: ids + status
+#
+# Satu stream memakai satu thread worker selama tersambung, jadi:
+# - stream ditutup setelah SSE_MAKS_DETIK, lalu EventSource menyambung ulang sendiri;
+# - jumlah stream per proses dibatasi SSE_MAKS_STREAM (di atasnya 503, halaman
+#   mencoba lagi nanti);
+# - gunicorn perlu dijalankan dengan --threads (lihat Procfile).
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import Response
+
+import db
+import pratinjau
+
+logger = logging.getLogger(__name__)
+
+MAKS_STREAM = int(os.getenv("SSE_MAKS_STREAM", "8"))         # stream aktif maksimal per proses
+MAKS_DETIK = int(os.getenv("SSE_MAKS_DETIK", "300"))         # stream ditutup, klien menyambung ulang
+DETAK_DETIK = int(os.getenv("SSE_DETAK_DETIK", "15"))        # komentar kosong supaya proxy tidak memutus
+RETRY_MS = 3000
+MAKS_ANTREAN = 100                                          # event tertunda per stream (broker lokal)
+KANAL_REDIS = "klarifikasi:"
+
+
+# --- Broker ---
+class _Langganan:
+    def __init__(self):
+        self.antrean = queue.Queue(maxsize=MAKS_ANTREAN)
+        self.tertinggal = False   # antrean pernah penuh: ada event yang hilang
+
+    def ambil(self, timeout):
+        try:
+            return self.antrean.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class BrokerLokal:
+    """Penyebaran event di dalam satu proses (antar thread)."""
+
+    def __init__(self):
+        self._pelanggan = defaultdict(set)   # jurusan -> {_Langganan}
+        self._lock = threading.Lock()
+
+    def terbitkan(self, jurusan, pesan):
+        with self._lock:
+            pelanggan = list(self._pelanggan.get(jurusan, ()))
+        for langganan in pelanggan:
+            try:
+                langganan.antrean.put_nowait(pesan)
+            except queue.Full:
+                langganan.tertinggal = True
+
+    @contextmanager
+    def langganan(self, jurusan):
+        langganan = _Langganan()
+        with self._lock:
+            self._pelanggan[jurusan].add(langganan)
+        try:
+            yield langganan
+        finally:
+            with self._lock:
+                self._pelanggan[jurusan].discard(langganan)
+                if not self._pelanggan[jurusan]:
+                    del self._pelanggan[jurusan]
+
+
+class _LanggananRedis:
+    tertinggal = False   # Redis tidak mengantre untuk pelanggan lambat, koneksi putus kalau buffer penuh
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    def ambil(self, timeout):
+        pesan = self.pubsub.get_message(timeout=timeout)
+        if pesan is None or pesan['type'] != 'message':
+            return None
+        data = pesan['data']
+        return data.decode() if isinstance(data, bytes) else data
+
+
+class BrokerRedis:
+    """Penyebaran event antar proses lewat Redis pub/sub, satu kanal per jurusan."""
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def terbitkan(self, jurusan, pesan):
+        self.redis.publish(KANAL_REDIS + jurusan, pesan)
+
+    @contextmanager
+    def langganan(self, jurusan):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(KANAL_REDIS + jurusan)
+        try:
+            yield _LanggananRedis(pubsub)
+        finally:
+            pubsub.close()
+
+
+_broker = None
+_lock = threading.Lock()
+_statistik = {'aktif': 0, 'event': 0, 'ditolak': 0}
+
+
+def init_app(redis=None):
+    """Pilih broker: redis = klien Redis, atau None untuk broker di memori proses."""
+    global _broker
+    _broker = BrokerRedis(redis) if redis is not None else BrokerLokal()
+
+
+# --- Data antrean Kajur ---
+def klarifikasi_menunggu(conn, jurusan, setelah=0):
+    """Klarifikasi jurusan yang menunggu persetujuan Kajur, urut id (yang lama dulu)."""
+    return conn.execute(
+        "SELECT * FROM clarifications WHERE status = 'Menunggu Kajur' AND jurusan = ? AND id > ? ORDER BY id",
+        (jurusan, setelah)
+    ).fetchall()
+
+
+def jumlah_menunggu(conn, jurusan):
+    return conn.execute(
+        "SELECT COUNT(*) FROM clarifications WHERE status = 'Menunggu Kajur' AND jurusan = ?", (jurusan,)
+    ).fetchone()[0]
+
+
+def data_klarifikasi(row):
+    """Baris clarifications -> dict untuk baris tabel dashboard Kajur (lihat barisKlarifikasi di template)."""
+    nama_bukti = row['file_bukti'].split('\\')[-1] if row['file_bukti'] else None
+    return {
+        'id': row['id'],
+        'tanggal_pengajuan': str(row['tanggal_pengajuan']).split(' ')[0],
+        'nama_lengkap': row['nama_lengkap'],
+        'tanggal_klarifikasi': row['tanggal_klarifikasi'].split(' ')[0],
+        'jenis_surat': row['jenis_surat'],
+        'file_bukti': nama_bukti,
+        'pratinjau': bool(nama_bukti) and pratinjau.bisa_dipratinjau(nama_bukti),
+    }
+
+
+# --- Penerbit (dipanggil rute setelah commit) ---
+def terbitkan(conn, jurusan, jenis, **isi):
+    """Kirim event ke stream Kajur jurusan. Gagal kirim hanya dicatat: datanya sudah ter-commit."""
+    if _broker is None:
+        return
+    try:
+        isi['menunggu'] = jumlah_menunggu(conn, jurusan)
+        _broker.terbitkan(jurusan, json.dumps({'jenis': jenis, **isi}))
+    except Exception as e:
+        logger.warning("Gagal mengirim notifikasi klarifikasi (%s, %s): %s", jenis, jurusan, e)
+
+
+# --- Stream ---
+def _event(jenis, data, id_event=None):
+    baris = f"id: {id_event}\n" if id_event is not None else ""
+    return f"{baris}event: {jenis}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _dari_broker(pesan):
+    data = json.loads(pesan)
+    jenis = data.pop('jenis')
+    # id event = id klarifikasi terbesar yang sudah dikirim, dipakai Last-Event-ID saat menyambung ulang
+    id_event = max(k['id'] for k in data['klarifikasi']) if jenis == 'baru' and data.get('klarifikasi') else None
+    return _event(jenis, data, id_event)
+
+
+def _sinkron(jurusan, setelah):
+    with db.pinjam(readonly=True) as conn:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM clarifications WHERE status = 'Menunggu Kajur' AND jurusan = ? ORDER BY id", (jurusan,))]
+        baru = [data_klarifikasi(row) for row in klarifikasi_menunggu(conn, jurusan, setelah)]
+    return _event('sinkron', {'menunggu': len(ids), 'ids': ids, 'klarifikasi': baru},
+                  max([setelah] + ids))
+
+
+def stream(jurusan, setelah=0):
+    """Response text/event-stream untuk Kajur jurusan, atau None kalau batas stream proses ini penuh."""
+    with _lock:
+        if _broker is None or _statistik['aktif'] >= MAKS_STREAM:
+            _statistik['ditolak'] += 1
+            return None
+        _statistik['aktif'] += 1
+
+    def hasilkan():
+        mulai = terakhir = time.monotonic()
+        with _broker.langganan(jurusan) as langganan:
+            # Berlangganan dulu baru membaca antrean, jadi event di antaranya tidak hilang
+            yield f"retry: {RETRY_MS}\n\n"
+            yield _sinkron(jurusan, setelah)
+            while time.monotonic() - mulai < MAKS_DETIK and not langganan.tertinggal:
+                pesan = langganan.ambil(timeout=max(0.1, DETAK_DETIK - (time.monotonic() - terakhir)))
+                if pesan is not None:
+                    with _lock:
+                        _statistik['event'] += 1
+                    yield _dari_broker(pesan)
+                    terakhir = time.monotonic()
+                elif time.monotonic() - terakhir >= DETAK_DETIK:
+                    yield ": detak\n\n"
+                    terakhir = time.monotonic()
+
+    def selesai():
+        with _lock:
+            _statistik['aktif'] -= 1
+
+    respons = Response(hasilkan(), mimetype='text/event-stream',
+                       headers={'X-Accel-Buffering': 'no'})   # nginx: jangan menahan event di buffer
+    # Dipanggil server saat stream ditutup, juga kalau klien putus sebelum generator berjalan
+    respons.call_on_close(selesai)
+    return respons
+
+
+def statistik():
+    with _lock:
+        return dict(_statistik)
@@ -0,0 +1,93 @@
+# pratinjau.py
+# Thumbnail & preview terkompresi untuk gambar bukti upload.
+# Varian dibuat di thread pool latar belakang segera setelah upload, dan
+# disimpan di sebelah file aslinya:
+#   <sha256>.jpg  ->  <sha256>.thumb.jpg, <sha256>.preview.jpg
+# Varian yang belum ada (upload lama, atau worker belum selesai) dibuat saat
+# pertama kali diminta. Pillow opsional: tanpa Pillow, pratinjau selalu
+# memakai file asli.
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow belum terpasang
+    Image = None
+
+# nama varian -> (ukuran maksimal sisi, kualitas JPEG)
+VARIAN = {
+    'thumb': (int(os.getenv("THUMB_SIZE", "240")), 70),
+    'preview': (int(os.getenv("PREVIEW_SIZE", "1280")), 80),
+}
+EKSTENSI_GAMBAR = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp'}
+WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# Satu lock per file tujuan supaya varian yang sama tidak dibuat dua kali bersamaan
+_lock_varian = {}
+
+
+def bisa_dipratinjau(nama):
+    return Image is not None and bool(nama) and os.path.splitext(nama)[1].lower() in EKSTENSI_GAMBAR
+
+
+def path_varian(path_asli, varian):
+    return f"{os.path.splitext(path_asli)[0]}.{varian}.jpg"
+
+
+def buat_varian(path_asli, varian):
+    """Buat satu varian (kalau belum ada) dan kembalikan path-nya; None kalau gagal."""
+    tujuan = path_varian(path_asli, varian)
+    if os.path.exists(tujuan):
+        return tujuan
+    with _pool_lock:
+        lock = _lock_varian.setdefault(tujuan, threading.Lock())
+    with lock:
+        if os.path.exists(tujuan):
+            return tujuan
+        ukuran, kualitas = VARIAN[varian]
+        tmp = f"{tujuan}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with Image.open(path_asli) as img:
+                img.draft('RGB', (ukuran, ukuran))    # decode JPEG besar langsung di resolusi kecil
+                img = ImageOps.exif_transpose(img)    # foto HP: ikuti orientasi EXIF
+                img.thumbnail((ukuran, ukuran))
+                img.convert('RGB').save(tmp, 'JPEG', quality=kualitas, optimize=True, progressive=True)
+            os.replace(tmp, tujuan)
+        except Exception as e:
+            logger.warning("Gagal membuat %s untuk %s: %s", varian, os.path.basename(path_asli), e)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+        finally:
+            with _pool_lock:
+                _lock_varian.pop(tujuan, None)
+    return tujuan
+
+
+def _buat_semua(path_asli):
+    for varian in VARIAN:
+        buat_varian(path_asli, varian)
+
+
+def antrekan(path_asli):
+    """Jadwalkan pembuatan semua varian di latar belakang (dipanggil setelah upload)."""
+    global _pool
+    if not bisa_dipratinjau(path_asli):
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="pratinjau")
+    _pool.submit(_buat_semua, path_asli)
+
+
+def hapus_varian(path_asli):
+    for varian in VARIAN:
+        tujuan = path_varian(path_asli, varian)
+        if os.path.exists(tujuan):
+            os.remove(tujuan)
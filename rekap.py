@@ -0,0 +1,170 @@
+# rekap.py
+# Rekap laporan absensi bulanan (kode KT/PK/NF/FL/CT/IZ per dosen per hari)
+# dengan cache persisten per (bulan, nip) di tabel rekap_cache.
+# Cache dihapus oleh trigger database (skema.py, migrasi v3) hanya untuk
+# (nip, bulan) yang datanya berubah, jadi bulan yang sudah "tutup" cukup
+# dibaca ulang dari cache dengan satu query berindeks.
+import re
+import json
+import sqlite3
+import logging
+import calendar
+from collections import Counter
+from datetime import datetime
+
+import kalender
+import klasifikasi
+import skema
+import versi
+
+logger = logging.getLogger(__name__)
+
+POLA_BULAN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+def bulan_valid(bulan):
+    return bool(bulan) and bool(POLA_BULAN.match(bulan))
+
+
+def bulan_terakhir(conn):
+    """Bulan 'YYYY-MM' terbaru yang punya data absensi (default untuk rekap)."""
+    row = conn.execute(f"SELECT {skema.SQL_TANGGAL.format('MAX(nomor_hari)')} FROM absensi").fetchone()
+    return row[0][:7] if row and row[0] else datetime.now().strftime('%Y-%m')
+
+
+def info_bulan(bulan):
+    """(days_in_month, selected_bulan_formatted) untuk header laporan."""
+    year, month = map(int, bulan.split('-'))
+    num_days = calendar.monthrange(year, month)[1]
+    return list(range(1, num_days + 1)), datetime(year, month, 1).strftime("%B %Y")
+
+
+def info_hari_kerja(conn, bulan):
+    """(jumlah hari kerja, {hari: keterangan}) untuk hari libur & akhir pekan di bulan tersebut."""
+    jumlah, libur = kalender.info_rentang(conn, *skema.rentang_bulan(bulan))
+    return jumlah, {int(tanggal[8:]): keterangan for tanggal, keterangan in libur.items()}
+
+
+def ringkasan(absensi):
+    """{hari: kode} -> (summary_counts, 'KT:20, PK:2')."""
+    hitung = Counter(absensi.values())
+    summary_counts = {k: hitung.get(k, 0) for k in klasifikasi.KODE_REKAP}
+    return summary_counts, ", ".join(f"{k}:{v}" for k, v in summary_counts.items() if v > 0)
+
+
+def hitung_kode(conn, bulan, nips):
+    """Hitung grid {nip: {hari: kode}} untuk nip-nip tertentu di bulan tersebut."""
+    awal_bulan, akhir_bulan = skema.rentang_bulan(bulan)
+    attendance_data = conn.execute(
+        "SELECT nip, nomor_hari, detik_masuk, detik_pulang, durasi_detik, status, keterangan FROM absensi "
+        "WHERE nomor_hari >= ? AND nomor_hari < ?",
+        skema.rentang_bulan_hari(bulan)
+    ).fetchall()
+    approved_clarifications = conn.execute(
+        "SELECT nip, tanggal_klarifikasi, kategori_surat FROM clarifications WHERE status = 'Disetujui' AND tanggal_klarifikasi >= ? AND tanggal_klarifikasi < ?",
+        (awal_bulan, akhir_bulan)
+    ).fetchall()
+
+    grid = {nip: {} for nip in nips}
+    df = klasifikasi.klasifikasi_absensi(attendance_data, klarifikasi=approved_clarifications)
+    if df.empty:
+        return grid
+
+    df = df[df['nip'].isin(grid.keys())]
+    for nip, day, kode in zip(df['nip'], df['hari'], df['kode']):
+        grid[nip][int(day)] = kode
+    return grid
+
+
+def lengkapi_cache(conn, bulan, nips):
+    """Hitung grid untuk nip yang belum ada di cache lalu simpan ke rekap_cache.
+
+    Grid dihitung di transaksi baca biasa, lalu disimpan dengan BEGIN IMMEDIATE
+    (menunggu giliran lewat busy_timeout, tidak gagal "database is locked" karena
+    snapshot basi seperti upgrade baca->tulis). Kalau versi data absensi atau
+    klarifikasi (versi_data) berubah di antaranya, grid dihitung ulang sekali di
+    dalam transaksi tulis supaya cache tidak menyimpan hasil yang sudah usang.
+
+    conn tidak boleh sedang di tengah transaksi: perubahan pemanggil yang belum
+    di-commit bukan urusan cache untuk di-commit atau dibatalkan.
+    """
+    kunci_versi = ('attendance', 'clarifications')
+    if conn.in_transaction:
+        raise RuntimeError("lengkapi_cache dipanggil saat koneksi masih di tengah transaksi")
+    conn.execute("BEGIN")
+    try:
+        versi_awal = versi.ambil(conn, *kunci_versi)
+        grid = hitung_kode(conn, bulan, nips)
+    finally:
+        conn.rollback()
+
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if versi.ambil(conn, *kunci_versi) != versi_awal:
+            grid = hitung_kode(conn, bulan, nips)
+        conn.executemany(
+            "INSERT OR REPLACE INTO rekap_cache (bulan, nip, absensi) VALUES (?, ?, ?)",
+            [(bulan, nip, json.dumps(absensi)) for nip, absensi in grid.items()]
+        )
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        logger.warning("Cache rekap %s tidak disimpan: %s", bulan, e)
+    return grid
+
+
+def iter_dosen(conn, conn_tulis, bulan):
+    """Generator baris laporan per dosen, urut jurusan lalu nama.
+
+    conn dipakai untuk membaca (boleh read-only), conn_tulis untuk mengisi cache.
+    conn_tulis None: grid yang belum ada di cache dihitung tanpa disimpan (conn
+    berupa snapshot laporan, hasilnya tidak boleh masuk cache database utama).
+    Baris dibaca langsung dari cursor (users LEFT JOIN rekap_cache), jadi
+    pemakaian memori tidak bertambah dengan jumlah dosen.
+    Setiap item: {'jurusan', 'nama_jurusan', 'nip', 'nama', 'absensi', 'summary_counts', 'summary'}.
+    """
+    belum = [row['nip'] for row in conn.execute("""
+        SELECT nip FROM users u
+        WHERE role = 'Dosen'
+          AND NOT EXISTS (SELECT 1 FROM rekap_cache c WHERE c.bulan = ? AND c.nip = u.nip)
+    """, (bulan,))]
+    # Grid yang baru dihitung tetap dipakai walaupun gagal disimpan ke cache
+    if not belum:
+        tambahan = {}
+    elif conn_tulis is None:
+        tambahan = hitung_kode(conn, bulan, belum)
+    else:
+        tambahan = lengkapi_cache(conn_tulis, bulan, belum)
+
+    cursor = conn.execute("""
+        SELECT u.nip, u.nama_lengkap, u.jurusan, u."detail jurusan", c.absensi
+        FROM users u
+        LEFT JOIN rekap_cache c ON c.bulan = ? AND c.nip = u.nip
+        WHERE u.role = 'Dosen'
+        ORDER BY u.jurusan, u.nama_lengkap
+    """, (bulan,))
+    for dosen in cursor:
+        if dosen['absensi'] is not None:
+            absensi = {int(day): kode for day, kode in json.loads(dosen['absensi']).items()}
+        else:
+            absensi = tambahan.get(dosen['nip'], {})
+        summary_counts, summary = ringkasan(absensi)
+        yield {
+            'jurusan': dosen['jurusan'],
+            'nama_jurusan': dosen['detail jurusan'],
+            'nip': dosen['nip'],
+            'nama': dosen['nama_lengkap'],
+            'absensi': absensi,
+            'summary_counts': summary_counts,
+            'summary': summary,
+        }
+
+
+def susun_laporan(conn, conn_tulis, bulan):
+    """Laporan dikelompokkan per jurusan: [{'nama_jurusan', 'dosen_data': [...]}, ...]."""
+    report_data = {}
+    for dosen in iter_dosen(conn, conn_tulis, bulan):
+        if dosen['jurusan'] not in report_data:
+            report_data[dosen['jurusan']] = {'nama_jurusan': dosen['nama_jurusan'], 'dosen_data': []}
+        report_data[dosen['jurusan']]['dosen_data'].append(dosen)
+    return list(report_data.values())
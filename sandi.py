@@ -0,0 +1,96 @@
+# sandi.py
+# Verifikasi & hashing password user.
+# Password di tabel users bisa berupa hash werkzeug (tambah_pengguna,
+# scripts/hash_existing_passwords.py) atau masih plaintext dari sheet data_akses
+# (kadang tersimpan sebagai angka di kolom INTEGER). Setelah login berhasil,
+# password plaintext atau hash dengan method/cost lama di-hash ulang di thread
+# latar belakang, jadi response login tidak ikut menunggu.
+#
+# Konfigurasi (environment):
+#   PASSWORD_HASH_METHOD      method werkzeug untuk hash baru, misalnya "scrypt"
+#                             atau "pbkdf2:sha256:150000". Cost method ini yang
+#                             menentukan lama verifikasi setiap login.
+#   LOGIN_VERIFY_CONCURRENCY  maksimal verifikasi hash bersamaan per worker
+#   LOGIN_VERIFY_TIMEOUT      detik menunggu giliran sebelum login ditolak "sibuk"
+import os
+import hmac
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+import db
+
+logger = logging.getLogger(__name__)
+
+HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+VERIFY_CONCURRENCY = int(os.getenv("LOGIN_VERIFY_CONCURRENCY", "2"))
+VERIFY_TIMEOUT = float(os.getenv("LOGIN_VERIFY_TIMEOUT", "5"))
+
+# Prefix hash untuk method aktif, misalnya "scrypt:32768:8:1" atau "pbkdf2:sha256:600000"
+PREFIX_METHOD = generate_password_hash("", method=HASH_METHOD).split("$", 1)[0]
+
+_slot_verifikasi = threading.BoundedSemaphore(VERIFY_CONCURRENCY)
+_rehasher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rehash")
+
+
+class ServerSibuk(Exception):
+    """Terlalu banyak verifikasi password bersamaan di worker ini."""
+
+
+def buat_hash(password):
+    return generate_password_hash(password, method=HASH_METHOD)
+
+
+def is_hashed(tersimpan):
+    return isinstance(tersimpan, str) and (tersimpan.startswith("pbkdf2:") or tersimpan.startswith("scrypt:"))
+
+
+def _plaintext(tersimpan):
+    if isinstance(tersimpan, float) and tersimpan.is_integer():
+        tersimpan = int(tersimpan)
+    return str(tersimpan)
+
+
+def perlu_rehash(tersimpan):
+    return not is_hashed(tersimpan) or tersimpan.split("$", 1)[0] != PREFIX_METHOD
+
+
+def cocok(tersimpan, password):
+    """True kalau password cocok dengan nilai di kolom users.password.
+
+    Verifikasi hash dibatasi VERIFY_CONCURRENCY per worker; kalau giliran tidak
+    didapat dalam VERIFY_TIMEOUT detik, ServerSibuk dilempar.
+    """
+    if tersimpan is None or not password:
+        return False
+    if not is_hashed(tersimpan):
+        # Data lama (plaintext): bandingkan dengan waktu konstan
+        return hmac.compare_digest(_plaintext(tersimpan).encode(), password.encode())
+    if not _slot_verifikasi.acquire(timeout=VERIFY_TIMEOUT):
+        raise ServerSibuk()
+    try:
+        return check_password_hash(tersimpan, password)
+    finally:
+        _slot_verifikasi.release()
+
+
+def _rehash(nip, tersimpan, password):
+    try:
+        hashed = buat_hash(password)
+        with db.pinjam() as conn:
+            # Hanya kalau password belum diganti sejak login ini diverifikasi
+            conn.execute(
+                "UPDATE users SET password = ? WHERE nip = ? AND password = ?",
+                (hashed, nip, tersimpan)
+            )
+            conn.commit()
+    except Exception as e:
+        logger.warning("Gagal rehash password untuk NIP %s: %s", nip, e)
+
+
+def jadwalkan_rehash(nip, tersimpan, password):
+    """Upgrade password plaintext / hash lama ke HASH_METHOD di latar belakang."""
+    if perlu_rehash(tersimpan):
+        _rehasher.submit(_rehash, nip, tersimpan, password)
@@ -0,0 +1,91 @@
+# scripts/bench_migrasi.py
+# Benchmark migrasi_data.run_migration dengan workbook sintetis.
+#
+#   python scripts/bench_migrasi.py [jumlah_baris]    (default 50000)
+#
+# Database asli (DATABASE, default database.db) disalin ke folder sementara,
+# jadi data produksi tidak berubah. Migrasi dijalankan dua kali:
+#   1. semua baris baru  -> mengukur jalur INSERT
+#   2. file yang sama    -> mengukur jalur anti-join (semua baris dilewati)
+import os
+import sys
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import migrasi_data  # noqa: E402
+
+DB_PATH = os.getenv("DATABASE", "database.db")
+HARI_PER_DOSEN = 250
+
+
+def buat_workbook(path, jumlah_baris):
+    """Workbook dengan sheet data_akses + 5 sheet absensi, total jumlah_baris baris absensi."""
+    jumlah_dosen = max(1, -(-jumlah_baris // HARI_PER_DOSEN))
+    sheets = migrasi_data.ATTENDANCE_SHEETS
+    wb = Workbook(write_only=True)
+
+    ws_users = wb.create_sheet(migrasi_data.USERS_SHEET)
+    ws_users.append(['nip', 'nama_lengkap', 'jurusan', 'detail jurusan', 'role'])
+    dosen = []
+    for i in range(jumlah_dosen):
+        # NIP sintetis diawali 99 supaya tidak bentrok dengan data asli
+        nip = f"99{i:016d}"
+        jurusan = sheets[i % len(sheets)]
+        dosen.append((nip, f"Dosen Sintetis {i}", jurusan))
+        ws_users.append([nip, f"Dosen Sintetis {i}", jurusan, f"Jurusan {jurusan}", 'Dosen'])
+
+    per_sheet = {sheet: wb.create_sheet(sheet) for sheet in sheets}
+    for ws in per_sheet.values():
+        ws.append(['nip', 'nama_lengkap', 'jurusan', 'detail jurusan', 'tanggal', 'jam masuk', 'jam pulang'])
+
+    awal = date(2030, 1, 1)
+    baris = 0
+    for nip, nama, jurusan in dosen:
+        for hari in range(HARI_PER_DOSEN):
+            if baris >= jumlah_baris:
+                break
+            masuk = f"07:{hari % 60:02d}:00" if hari % 7 else None
+            pulang = f"16:{hari % 60:02d}:00" if hari % 5 else None
+            per_sheet[jurusan].append([nip, nama, jurusan, f"Jurusan {jurusan}",
+                                       awal + timedelta(days=hari), masuk, pulang])
+            baris += 1
+    wb.save(path)
+    return jumlah_dosen
+
+
+def main():
+    jumlah_baris = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    if not os.path.exists(DB_PATH):
+        raise SystemExit(f"❌ Database file not found: {DB_PATH}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "bench.db")
+        excel_file = os.path.join(tmp, "bench.xlsx")
+        shutil.copy(DB_PATH, db_file)
+
+        mulai = time.perf_counter()
+        jumlah_dosen = buat_workbook(excel_file, jumlah_baris)
+        print(f"Workbook sintetis: {jumlah_baris} baris, {jumlah_dosen} dosen "
+              f"({time.perf_counter() - mulai:.2f} detik)")
+
+        hasil = []
+        for percobaan in ("baru", "ulang"):
+            print(f"\n===== Migrasi ({percobaan}) =====")
+            hasil.append((percobaan, migrasi_data.run_migration(excel_file, db_file)))
+
+        print("\n===== Ringkasan =====")
+        for percobaan, h in hasil:
+            if not h.get('detik'):
+                print(f"{percobaan:6s}: gagal, lihat log di atas")
+                continue
+            print(f"{percobaan:6s}: total {h['detik']:7.2f} detik | absensi {h['detik_absensi']:6.2f} detik, "
+                  f"{jumlah_baris / h['detik_absensi']:>9,.0f} baris/detik | user baru {h['users']}, absensi baru {h['absensi']}, dilewati {h['dilewati']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+# scripts/bench_rute.py
+# Benchmark rute-rute utama: login, dashboard_dosen, dashboard_kajur,
+# get_absensi_summary, rekap_laporan_view dan download_laporan.
+# Melaporkan p50/p95/p99, throughput dan ukuran transfer (body yang dikirim,
+# setelah kompresi gzip/brotli) per rute. --tanpa-kompresi mengirim request
+# tanpa Accept-Encoding untuk membandingkan ukuran aslinya.
+#
+#   # in-process dengan Flask test client (satu thread)
+#   python scripts/bench_rute.py --database bench.db [--iterasi 30]
+#
+#   # beban HTTP multi-thread ke gunicorn yang dijalankan script ini sendiri
+#   python scripts/bench_rute.py --database bench.db --mode http --workers 2 --threads 8 --durasi 30
+#
+#   # beban HTTP ke server yang sudah berjalan (database milik server itu)
+#   python scripts/bench_rute.py --mode http --url http://127.0.0.1:8000 --akun bench.db.akun.json
+#
+# Akun diambil dari <database>.akun.json (dibuat scripts/buat_data_sintetis.py)
+# atau dari --password/--dosen/--kajur/--admin. Database selalu disalin ke
+# folder sementara dulu, jadi file aslinya tidak berubah.
+#
+# Deteksi regresi sebelum deploy:
+#   python scripts/bench_rute.py --database bench.db --simpan baseline.json
+#   python scripts/bench_rute.py --database bench.db --banding baseline.json --toleransi 20
+# (exit code 1 kalau p95 salah satu rute lebih lambat dari baseline melebihi toleransi)
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+import http.cookiejar
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def daftar_rute(akun):
+    """(nama, role yang login, path). role None = rute login itu sendiri."""
+    bulan = akun.get('bulan', '')
+    return [
+        ('login', None, '/login'),
+        ('dashboard_dosen', 'dosen', '/dashboard_dosen'),
+        ('dashboard_kajur', 'kajur', '/dashboard_kajur'),
+        ('get_absensi_summary', 'kajur', f"/get_absensi_summary/{akun['dosen']}"),
+        ('rekap_laporan_view', 'admin', f"/rekap_laporan_view?bulan={bulan}"),
+        ('download_laporan', 'admin', f"/download_laporan?bulan={bulan}&format=xlsx"),
+    ]
+
+
+def baca_akun(args):
+    akun = {}
+    path = args.akun or (f"{args.database}.akun.json" if args.database else None)
+    if path and os.path.exists(path):
+        with open(path) as f:
+            akun = json.load(f)
+    for kunci in ('password', 'dosen', 'kajur', 'admin', 'bulan'):
+        if getattr(args, kunci):
+            akun[kunci] = getattr(args, kunci)
+    kurang = [k for k in ('password', 'dosen', 'kajur', 'admin') if not akun.get(k)]
+    if kurang:
+        raise SystemExit(f"❌ Akun belum lengkap ({', '.join(kurang)}). Pakai --akun atau --{kurang[0]}.")
+    return akun
+
+
+def ringkas(durasi, detik_total, ukuran):
+    """Daftar durasi (detik) dan ukuran body (byte) -> statistik dalam milidetik dan KiB."""
+    urut = sorted(durasi)
+    if len(urut) > 1:
+        q = statistics.quantiles(urut, n=100, method='inclusive')
+        p50, p95, p99 = q[49], q[94], q[98]
+    else:
+        p50 = p95 = p99 = urut[0]
+    return {
+        'n': len(urut),
+        'p50': p50 * 1000, 'p95': p95 * 1000, 'p99': p99 * 1000, 'max': urut[-1] * 1000,
+        'rps': len(urut) / detik_total if detik_total else 0.0,
+        'kib': statistics.mean(ukuran) / 1024 if ukuran else 0.0,
+    }
+
+
+def cetak(hasil, judul):
+    print(f"\n===== {judul} =====")
+    print(f"{'rute':22s} {'n':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s} {'req/s':>8s} {'KiB':>8s}  status")
+    for nama, s in hasil.items():
+        print(f"{nama:22s} {s['n']:6d} {s['p50']:9.1f} {s['p95']:9.1f} {s['p99']:9.1f} {s['max']:9.1f} {s['rps']:8.1f} {s.get('kib', 0.0):8.1f}  "
+              f"{', '.join(f'{k}x{v}' for k, v in sorted(s['status'].items()))}")
+
+
+# --- Mode 1: Flask test client, in-process ---
+def bench_client(db_file, akun, iterasi, encoding):
+    os.environ['DATABASE'] = db_file
+    sys.path.insert(0, ROOT)
+    import app as aplikasi   # dimuat setelah DATABASE diatur
+
+    app = aplikasi.app
+    klien = {}
+    for role in ('dosen', 'kajur', 'admin'):
+        klien[role] = app.test_client()
+        r = klien[role].post('/login', data={'nip': akun[role], 'password': akun['password']})
+        if r.status_code != 302 or 'login' in (r.location or ''):
+            raise SystemExit(f"❌ Login {role} ({akun[role]}) gagal, periksa akun.")
+
+    header = {'Accept-Encoding': encoding} if encoding else {}
+    hasil = {}
+    for nama, role, path in daftar_rute(akun):
+        durasi, ukuran, status = [], [], defaultdict(int)
+        mulai_rute = time.perf_counter()
+        for _ in range(iterasi):
+            mulai = time.perf_counter()
+            if role is None:
+                r = app.test_client().post(path, data={'nip': akun['dosen'], 'password': akun['password']},
+                                           headers=header)
+            else:
+                r = klien[role].get(path, headers=header)
+            body = r.get_data()   # respons streaming ikut dihitung sampai selesai
+            durasi.append(time.perf_counter() - mulai)
+            ukuran.append(len(body))
+            status[r.status_code] += 1
+        hasil[nama] = ringkas(durasi, time.perf_counter() - mulai_rute, ukuran)
+        hasil[nama]['pertama'] = durasi[0] * 1000   # cache dingin (rekap_cache, page cache)
+        hasil[nama]['status'] = dict(status)
+    return hasil
+
+
+# --- Mode 2: beban HTTP multi-thread ---
+class _TanpaRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _opener():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _TanpaRedirect())
+
+
+def _minta(opener, url, data=None, encoding=None):
+    """Kirim request dan baca seluruh body. Mengembalikan (status HTTP, byte body yang diterima)."""
+    body = urllib.parse.urlencode(data).encode() if data else None
+    req = urllib.request.Request(url, data=body, headers={'Accept-Encoding': encoding} if encoding else {})
+    try:
+        with opener.open(req, timeout=120) as r:
+            return r.status, len(r.read())   # urllib tidak men-dekompresi, jadi ini ukuran transfer
+    except urllib.error.HTTPError as e:
+        return e.code, len(e.read())
+
+
+def _login(url, akun, role):
+    opener = _opener()
+    status, _ = _minta(opener, f"{url}/login", {'nip': akun[role], 'password': akun['password']})
+    if status != 302:
+        raise SystemExit(f"❌ Login {role} ({akun[role]}) gagal (HTTP {status}).")
+    return opener
+
+
+def bench_http(url, akun, threads, durasi_detik, encoding):
+    rute = daftar_rute(akun)
+    catatan = defaultdict(list)
+    ukuran = defaultdict(list)
+    status = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    batas = time.perf_counter() + durasi_detik
+
+    def pekerja(nomor):
+        opener = {role: _login(url, akun, role) for role in ('dosen', 'kajur', 'admin')}
+        i = nomor   # setiap thread mulai dari rute berbeda supaya beban tercampur
+        while time.perf_counter() < batas:
+            nama, role, path = rute[i % len(rute)]
+            i += 1
+            mulai = time.perf_counter()
+            if role is None:
+                kode, n_byte = _minta(_opener(), f"{url}{path}", {'nip': akun['dosen'], 'password': akun['password']},
+                                      encoding)
+            else:
+                kode, n_byte = _minta(opener[role], f"{url}{path}", encoding=encoding)
+            lama = time.perf_counter() - mulai
+            with lock:
+                catatan[nama].append(lama)
+                ukuran[nama].append(n_byte)
+                status[nama][kode] += 1
+
+    mulai = time.perf_counter()
+    daftar_thread = [threading.Thread(target=pekerja, args=(n,)) for n in range(threads)]
+    for t in daftar_thread:
+        t.start()
+    for t in daftar_thread:
+        t.join()
+    total_detik = time.perf_counter() - mulai
+
+    hasil = {}
+    for nama, _, _ in rute:
+        if catatan[nama]:
+            hasil[nama] = ringkas(catatan[nama], total_detik, ukuran[nama])
+            hasil[nama]['status'] = dict(status[nama])
+    jumlah = sum(len(v) for v in catatan.values())
+    print(f"\nTotal {jumlah} request dalam {total_detik:.1f} detik ({jumlah / total_detik:.1f} req/s, {threads} thread)")
+    return hasil
+
+
+def jalankan_gunicorn(db_file, folder, workers):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, DATABASE=db_file, AUTO_MIGRATE="1")
+    proses = subprocess.Popen(
+        ["gunicorn", "-b", f"127.0.0.1:{port}", "-w", str(workers), "--pythonpath", ROOT,
+         "--timeout", "120", "--log-level", "warning", "app:app"],
+        cwd=folder, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(120):
+        if proses.poll() is not None:
+            raise SystemExit("❌ gunicorn berhenti saat start.")
+        try:
+            urllib.request.urlopen(f"{url}/login", timeout=5).read()
+            return proses, url
+        except OSError:   # URLError, koneksi ditolak, timeout: worker belum siap
+            time.sleep(0.25)
+    proses.terminate()
+    raise SystemExit("❌ gunicorn tidak siap dalam 30 detik.")
+
+
+def banding(hasil, path_baseline, toleransi):
+    """Bandingkan p95 dengan baseline. Mengembalikan jumlah rute yang melambat."""
+    with open(path_baseline) as f:
+        baseline = json.load(f)
+    print(f"\n===== Dibanding {path_baseline} (toleransi p95 {toleransi}%) =====")
+    lambat = 0
+    for nama, s in hasil.items():
+        if nama not in baseline:
+            continue
+        lama, baru = baseline[nama]['p95'], s['p95']
+        selisih = (baru - lama) / lama * 100 if lama else 0.0
+        tanda = "REGRESI" if selisih > toleransi else "ok"
+        lambat += tanda == "REGRESI"
+        print(f"{nama:22s} p95 {lama:9.1f} -> {baru:9.1f} ms ({selisih:+6.1f}%)  {tanda}")
+    return lambat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rute utama (p50/p95/p99, throughput).")
+    parser.add_argument("--database", default=os.getenv("DATABASE", "database.db"))
+    parser.add_argument("--akun", help="file JSON akun (default <database>.akun.json)")
+    parser.add_argument("--password")
+    parser.add_argument("--dosen", help="NIP dosen")
+    parser.add_argument("--kajur", help="NIP kajur (jurusan yang sama dengan dosen)")
+    parser.add_argument("--admin", help="NIP admin")
+    parser.add_argument("--bulan", help="bulan rekap YYYY-MM (default dari file akun / bulan data terakhir)")
+    parser.add_argument("--mode", choices=("client", "http"), default="client")
+    parser.add_argument("--iterasi", type=int, default=30, help="mode client: request per rute")
+    parser.add_argument("--url", help="mode http: server yang sudah berjalan")
+    parser.add_argument("--workers", type=int, default=2, help="mode http: worker gunicorn yang dijalankan")
+    parser.add_argument("--threads", type=int, default=8, help="mode http: jumlah thread klien")
+    parser.add_argument("--durasi", type=float, default=30, help="mode http: lama beban (detik)")
+    parser.add_argument("--tanpa-kompresi", action="store_true", help="kirim request tanpa Accept-Encoding")
+    parser.add_argument("--simpan", help="simpan hasil ke file JSON (baseline)")
+    parser.add_argument("--banding", help="bandingkan dengan baseline JSON")
+    parser.add_argument("--toleransi", type=float, default=20.0, help="batas kenaikan p95 dalam persen")
+    args = parser.parse_args()
+    for nama in ('database', 'akun', 'simpan', 'banding'):
+        if getattr(args, nama):
+            setattr(args, nama, os.path.abspath(getattr(args, nama)))
+    akun = baca_akun(args)
+    encoding = None if args.tanpa_kompresi else "br, gzip"
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proses = None
+        if args.url:
+            url = args.url.rstrip('/')
+        else:
+            if not os.path.exists(args.database):
+                raise SystemExit(f"❌ Database file not found: {args.database}")
+            db_file = os.path.join(tmp, "bench.db")
+            shutil.copy(args.database, db_file)
+            if not akun.get('bulan'):
+                import sqlite3
+                conn = sqlite3.connect(db_file)
+                akun['bulan'] = (conn.execute("SELECT MAX(tanggal) FROM attendance").fetchone()[0] or '')[:7]
+                conn.close()
+
+        os.chdir(tmp)   # flask_session/, uploads/ dll. dibuat di folder sementara
+        try:
+            if args.mode == "client":
+                if args.url:
+                    raise SystemExit("❌ --url hanya untuk --mode http.")
+                hasil = bench_client(db_file, akun, args.iterasi, encoding)
+                cetak(hasil, f"Flask test client, {args.iterasi} iterasi per rute")
+                print(f"\nRequest pertama (cache dingin): " +
+                      ", ".join(f"{nama} {s['pertama']:.0f} ms" for nama, s in hasil.items()))
+            else:
+                if not args.url:
+                    proses, url = jalankan_gunicorn(db_file, tmp, args.workers)
+                hasil = bench_http(url, akun, args.threads, args.durasi, encoding)
+                cetak(hasil, f"HTTP {url}, {args.threads} thread, {args.durasi:.0f} detik"
+                             + ("" if args.url else f", gunicorn {args.workers} worker"))
+        finally:
+            os.chdir(cwd)
+            if proses is not None:
+                proses.terminate()
+                proses.wait(timeout=30)
+
+    if args.simpan:
+        with open(args.simpan, "w") as f:
+            json.dump(hasil, f, indent=2)
+        print(f"\nHasil disimpan ke {args.simpan}")
+    if args.banding and banding(hasil, args.banding, args.toleransi):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# scripts/buat_data_sintetis.py
+# Bangun database sintetis berskala produksi untuk benchmark lokal.
+#
+#   python scripts/buat_data_sintetis.py bench.db [--dosen 1000] [--bulan 12] [--sampai 2025-07] [--seed 1]
+#
+# Isi: N dosen tersebar di jurusan yang ada (BP, BT, PKH, RPK, THP) + satu
+# Kajur per jurusan + satu Admin, absensi setiap hari kerja selama M bulan,
+# klarifikasi (disetujui/ditolak/menunggu) untuk hari yang jam absennya
+# kosong, dan cuti tahunan. Semua akun memakai password yang sama
+# (--password); daftar akun contoh ditulis ke <database>.akun.json dan dipakai
+# scripts/bench_rute.py. Tabel turunan (ledger kuota, indeks, kalender, ...)
+# dibangun oleh migrasi skema setelah data dimasukkan.
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import migrasi_data  # noqa: E402
+import sandi  # noqa: E402
+import skema  # noqa: E402
+
+JURUSAN = {
+    'BP': 'Jurusan Bisnis Pertanian',
+    'BT': 'Jurusan Budidaya Tanaman',
+    'PKH': 'Jurusan Peternakan dan Kesehatan Hewan',
+    'RPK': 'Jurusan Rekayasa Pertanian dan Komputer',
+    'THP': 'Jurusan Teknologi Hasil Pertanian',
+}
+NAMA_DEPAN = ['Agus', 'Budi', 'Citra', 'Dewi', 'Eko', 'Fitri', 'Gita', 'Hendra', 'Indah', 'Joko',
+              'Kurnia', 'Lestari', 'Made', 'Nur', 'Putri', 'Rahmat', 'Sri', 'Taufik', 'Wahyu', 'Yuni']
+NAMA_BELAKANG = ['Saputra', 'Wijaya', 'Lubis', 'Siregar', 'Nasution', 'Hidayat', 'Kusuma', 'Pratama',
+                 'Harahap', 'Santoso', 'Rahayu', 'Sembiring', 'Purba', 'Setiawan', 'Utami']
+GELAR = ['S.P., M.Si.', 'S.Pt., M.P.', 'S.T., M.Kom.', 'S.TP., M.Sc.', 'Ir., M.Si.', 'Dr., M.P.']
+KLARIFIKASI = [('Non Fleksibel', 'Lupa Absen Masuk'), ('Non Fleksibel', 'Lupa Absen Pulang'),
+               ('Fleksibel', 'Tugas Penelitian'), ('Fleksibel', 'Tugas Lainnya')]
+
+# Peluang per hari kerja
+P_TANPA_MASUK = 0.04
+P_TANPA_PULANG = 0.04
+P_TIDAK_HADIR = 0.04
+P_DIKLARIFIKASI = 0.5        # hari bermasalah yang diajukan klarifikasinya
+P_CUTI = 0.3                 # hari tidak hadir yang ternyata cuti tahunan
+
+
+def nip_sintetis(nomor, tahun_lahir):
+    # NIP sintetis diawali 98 supaya tidak bentrok dengan data asli maupun bench_migrasi.py (99)
+    return f"98{tahun_lahir % 100:02d}{nomor:014d}"
+
+
+def daftar_hari_kerja(sampai, jumlah_bulan):
+    """Hari Senin-Jumat selama jumlah_bulan bulan yang berakhir di bulan 'sampai' (YYYY-MM)."""
+    tahun, bulan = map(int, sampai.split('-'))
+    akhir = date(tahun + 1, 1, 1) if bulan == 12 else date(tahun, bulan + 1, 1)
+    for _ in range(jumlah_bulan - 1):
+        tahun, bulan = (tahun - 1, 12) if bulan == 1 else (tahun, bulan - 1)
+    hari = date(tahun, bulan, 1)
+    while hari < akhir:
+        if hari.weekday() < 5:
+            yield hari
+        hari += timedelta(days=1)
+
+
+def jam(rng, menit_dasar, sebar_menit):
+    menit = menit_dasar + rng.randint(-sebar_menit, sebar_menit)
+    return f"{menit // 60:02d}:{menit % 60:02d}:00.000000"
+
+
+def buat_users(rng, jumlah_dosen, password_hash):
+    users = [('980000000000000001', password_hash, 'Admin Sintetis', '-', '-', 'Admin', 12)]
+    kode = list(JURUSAN)
+    for i, jur in enumerate(kode):
+        users.append((nip_sintetis(900000 + i, 1975), password_hash, f"Kajur {jur} Sintetis", jur, JURUSAN[jur], 'Kajur', 12))
+    for i in range(jumlah_dosen):
+        jur = kode[i % len(kode)]
+        nama = f"{rng.choice(NAMA_DEPAN)} {rng.choice(NAMA_BELAKANG)}, {rng.choice(GELAR)}"
+        users.append((nip_sintetis(i, rng.randint(1960, 1995)), password_hash, nama, jur, JURUSAN[jur], 'Dosen', 12))
+    return users
+
+
+def bangun(db_file, jumlah_dosen, jumlah_bulan, sampai, password, seed):
+    rng = random.Random(seed)
+    if os.path.exists(db_file):
+        raise SystemExit(f"❌ {db_file} sudah ada, pilih nama lain atau hapus dulu.")
+
+    mulai = time.perf_counter()
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode = WAL")
+    cursor = conn.cursor()
+    migrasi_data.pastikan_tabel_inti(cursor)
+    migrasi_data.pastikan_tabel_lain(cursor)
+
+    # Satu hash untuk semua akun: hashing ribuan password akan memakan waktu lama
+    users = buat_users(rng, jumlah_dosen, sandi.buat_hash(password))
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?)", users)
+    dosen = [u for u in users if u[5] == 'Dosen']
+
+    hari_kerja = list(daftar_hari_kerja(sampai, jumlah_bulan))
+    absensi, klarifikasi, cuti = [], [], []
+    for nip, _, nama, jur, _, _, _ in dosen:
+        sisa_cuti = 12
+        for hari in hari_kerja:
+            tanggal = f"{hari} 00:00:00"
+            r = rng.random()
+            masuk, pulang = jam(rng, 7 * 60 + 30, 25), jam(rng, 16 * 60 + 15, 25)
+            if r < P_TIDAK_HADIR:
+                masuk = pulang = None
+            elif r < P_TIDAK_HADIR + P_TANPA_MASUK:
+                masuk = None
+            elif r < P_TIDAK_HADIR + P_TANPA_MASUK + P_TANPA_PULANG:
+                pulang = None
+            status, keterangan = 'Hadir', ''
+
+            if masuk is None and pulang is None and sisa_cuti > 0 and rng.random() < P_CUTI:
+                sisa_cuti -= 1
+                status, keterangan = 'Disetujui Kajur', 'Cuti Tahunan - Urusan Keluarga'
+                cuti.append((nip, nama, str(hari - timedelta(days=7)), str(hari), str(hari), 'Cuti Tahunan',
+                             'Urusan Keluarga', None, 'Admin Sintetis', f"{hari - timedelta(days=5)} 09:00:00"))
+            elif (masuk is None or pulang is None) and rng.random() < P_DIKLARIFIKASI:
+                kategori, jenis = (KLARIFIKASI[0] if masuk is None and pulang is not None else
+                                   KLARIFIKASI[1] if pulang is None and masuk is not None else
+                                   rng.choice(KLARIFIKASI[2:]))
+                diajukan = datetime.combine(hari + timedelta(days=rng.randint(0, 3)), datetime.min.time()) + timedelta(hours=8)
+                hasil = rng.random()
+                if hasil < 0.7:
+                    status_k, status, alasan = 'Disetujui', 'Disetujui Kajur', None
+                elif hasil < 0.85:
+                    status_k, status, alasan = 'Ditolak', 'Ditolak Kajur', 'Bukti tidak sesuai'
+                    keterangan = alasan
+                else:
+                    status_k, status, alasan = 'Menunggu Kajur', 'Menunggu Persetujuan Kajur', None
+                diproses = None if status_k == 'Menunggu Kajur' else str(diajukan + timedelta(days=1))
+                klarifikasi.append((nip, nama, jur, tanggal, kategori, jenis, None, status_k, alasan,
+                                    str(diajukan), diproses))
+            absensi.append((nip, nama, tanggal, masuk, pulang, status, keterangan))
+
+    conn.executemany("INSERT INTO attendance VALUES (?, ?, ?, ?, ?, ?, ?)", absensi)
+    conn.executemany("""
+        INSERT INTO clarifications (nip, nama_lengkap, jurusan, tanggal_klarifikasi, kategori_surat, jenis_surat,
+                                    file_bukti, status, alasan_penolakan, tanggal_pengajuan, tanggal_proses)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, klarifikasi)
+    conn.executemany("""
+        INSERT INTO cuti_dosen (nip, nama_lengkap, tanggal_surat, tanggal_mulai, tanggal_selesai, jenis_cuti,
+                                alasan_cuti, file_surat_cuti, diinput_oleh, tanggal_input)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, cuti)
+    conn.commit()
+    conn.close()
+    waktu_data = time.perf_counter() - mulai
+
+    # Indeks, trigger, ledger kuota, kalender, ... dibangun dari data yang sudah ada
+    skema.jalankan_migrasi(db_file)
+
+    # Contoh akun untuk benchmark: dosen dengan data paling banyak, Kajur jurusan yang sama, Admin
+    contoh_dosen = dosen[0]
+    akun = {
+        'password': password,
+        'admin': users[0][0],
+        'kajur': next(u[0] for u in users if u[5] == 'Kajur' and u[3] == contoh_dosen[3]),
+        'dosen': contoh_dosen[0],
+        'bulan': sampai,
+    }
+    with open(f"{db_file}.akun.json", "w") as f:
+        json.dump(akun, f, indent=2)
+
+    print(f"Database sintetis {db_file}: {len(users)} user, {len(absensi):,} absensi, "
+          f"{len(klarifikasi):,} klarifikasi, {len(cuti):,} cuti "
+          f"(data {waktu_data:.1f} detik, total {time.perf_counter() - mulai:.1f} detik, "
+          f"{os.path.getsize(db_file) / 1024 / 1024:.1f} MiB)")
+    print(f"Akun contoh ditulis ke {db_file}.akun.json")
+
+
+def main():
+    bulan_lalu = (date.today().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+    parser = argparse.ArgumentParser(description="Bangun database sintetis untuk benchmark.")
+    parser.add_argument("database", help="file database baru yang akan dibuat")
+    parser.add_argument("--dosen", type=int, default=1000, help="jumlah dosen (default 1000)")
+    parser.add_argument("--bulan", type=int, default=12, help="jumlah bulan absensi (default 12)")
+    parser.add_argument("--sampai", default=bulan_lalu, help=f"bulan terakhir YYYY-MM (default {bulan_lalu})")
+    parser.add_argument("--password", default="sintetis123", help="password semua akun")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    bangun(args.database, args.dosen, args.bulan, args.sampai, args.password, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,22 @@
 # scripts/hash_existing_passwords.py
+#
+#   python scripts/hash_existing_passwords.py [--workers N] [--batch N] [--method METHOD]
+#
+# Hashing runs in a process pool and every batch is committed on its own, so an
+# interrupted run keeps its progress: already-hashed rows are skipped on rerun,
+# which resumes with the remaining plaintext rows (in rowid order).
+# METHOD is any werkzeug method string, e.g. "scrypt", "scrypt:32768:8:1" or
+# "pbkdf2:sha256:600000" (default: $PASSWORD_HASH_METHOD or "scrypt").
 import os
+import time
 import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from werkzeug.security import generate_password_hash
 
 DB_PATH = os.getenv("DATABASE", "database.db")
+HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+BATCH_SIZE = 200
 
 def is_hashed(pw: str) -> bool:
     """Cek apakah string sudah berupa hash werkzeug."""
@@ -12,40 +25,77 @@ def is_hashed(pw: str) -> bool:
     # Werkzeug default: "pbkdf2:sha256:..." atau "scrypt:..."
     return pw.startswith("pbkdf2:") or pw.startswith("scrypt:")
 
+def plaintext(pw) -> str:
+    """Password lama dari sheet data_akses bisa tersimpan sebagai int/float (kolom INTEGER)."""
+    if isinstance(pw, float) and pw.is_integer():
+        pw = int(pw)
+    return str(pw)
+
+def hash_one(args):
+    pw, method = args
+    return generate_password_hash(pw, method=method)
+
 def main():
+    parser = argparse.ArgumentParser(description="Hash plaintext passwords in the users table.")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: CPU count, 1 = no pool)")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="rows per commit (checkpoint)")
+    parser.add_argument("--method", default=HASH_METHOD, help="werkzeug hash method, e.g. scrypt or pbkdf2:sha256:600000")
+    args = parser.parse_args()
+
     if not os.path.exists(DB_PATH):
         raise SystemExit(f"❌ Database file not found: {DB_PATH}")
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
     conn.row_factory = sqlite3.Row
     cur = conn.cursor()
 
-    cur.execute("SELECT rowid, nip, password FROM users")
+    cur.execute("SELECT rowid, nip, password FROM users WHERE password IS NOT NULL ORDER BY rowid")
     rows = cur.fetchall()
 
-    to_update = []
-    for r in rows:
-        pw = r["password"]
-
-        # SQLite bisa simpan angka sebagai int, ubah ke str dulu
-        if isinstance(pw, (int, float)):
-            pw = str(pw)
+    # (rowid, nip, nilai asli di database, plaintext)
+    to_update = [(r["rowid"], r["nip"], r["password"], plaintext(r["password"]))
+                 for r in rows if not is_hashed(r["password"])]
 
-        if not is_hashed(pw):
-            to_update.append((r["rowid"], r["nip"], pw))
+    print(f"🔍 Found {len(to_update)} plaintext password(s) ({len(rows) - len(to_update)} already hashed).")
+    if not to_update:
+        conn.close()
+        return
 
-    print(f"🔍 Found {len(to_update)} plaintext password(s).")
+    # Validasi method lebih awal daripada gagal di dalam worker
+    generate_password_hash("cek", method=args.method)
 
     updated = 0
-    for rowid, nip, pw in to_update:
-        hashed = generate_password_hash(str(pw))
-        cur.execute("UPDATE users SET password = ? WHERE rowid = ?", (hashed, rowid))
-        print(f"✅ Updated NIP {nip}")
-        updated += 1
-
-    conn.commit()
-    conn.close()
-    print(f"🎉 Done! Updated {updated} password(s) to hashed form.")
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers != 1 else None
+    try:
+        for i in range(0, len(to_update), args.batch):
+            batch = to_update[i:i + args.batch]
+            jobs = [(pw, args.method) for _, _, _, pw in batch]
+            hashes = pool.map(hash_one, jobs, chunksize=max(1, len(jobs) // 32)) if pool else map(hash_one, jobs)
+
+            # WHERE password = nilai lama: jangan menimpa password yang diganti selama script berjalan
+            cur.executemany(
+                "UPDATE users SET password = ? WHERE rowid = ? AND password = ?",
+                [(hashed, rowid, asli) for (rowid, _, asli, _), hashed in zip(batch, hashes)]
+            )
+            updated += cur.rowcount
+            conn.commit()  # checkpoint
+
+            elapsed = time.perf_counter() - start
+            done = i + len(batch)
+            print(f"✅ {done}/{len(to_update)} hashed ({done / elapsed:,.1f} hash/s)")
+    except KeyboardInterrupt:
+        conn.rollback()
+        print(f"⏸️  Interrupted. {updated} password(s) saved; rerun to continue.")
+        raise SystemExit(1)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"🎉 Done! Updated {updated} password(s) to hashed form with '{args.method}' "
+          f"in {elapsed:.2f}s ({updated / elapsed:,.1f} hash/s).")
 
 if __name__ == "__main__":
     main()
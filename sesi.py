@@ -0,0 +1,268 @@
+# sesi.py
+# Penyimpanan session di sisi server pengganti session filesystem Flask-Session.
+# Cookie hanya berisi id acak; isi session disimpan sebagai JSON ringkas
+# (serializer session bawaan Flask) di tabel sesi (skema.py migrasi v10,
+# SESSION_TYPE=sqlite, default) atau di Redis (SESSION_TYPE=redis, memakai
+# klien SESSION_REDIS yang sama).
+#
+# - Session hanya ditulis kalau isinya berubah. Request lain cukup
+#   memperpanjang masa berlaku, itu pun hanya setelah seperempat TTL lewat.
+# - Session kosong (misalnya setelah logout) dihapus, bukan disimpan.
+# - Isi di atas SESI_MAKS_BYTES tidak disimpan: request itu gagal dengan
+#   SesiTerlaluBesar (500, atau exception langsung saat debug/testing), jadi
+#   data besar (laporan, daftar) tidak bisa menumpang di session dan login/flash
+#   tidak hilang diam-diam.
+# - Session kedaluwarsa di SQLite disapu berkala oleh worker web
+#   (SESI_SAPU_DETIK). Redis menghapusnya sendiri lewat TTL.
+#
+# Jumlah dan total ukuran session tercatat di /metrics (sid_sessions, sid_session_bytes);
+# untuk Redis angkanya dihitung paling sering sekali per SESI_SAPU_DETIK.
+#
+# Perintah manual:
+#   python sesi.py statistik   -> jumlah session, total ukuran, yang sudah kedaluwarsa
+#   python sesi.py sapu        -> hapus session kedaluwarsa sekarang
+import os
+import re
+import sys
+import time
+import sqlite3
+import secrets
+import logging
+import threading
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+import db
+
+logger = logging.getLogger(__name__)
+
+DATABASE = os.getenv("DATABASE", "database.db")
+TTL_DETIK = int(float(os.getenv("SESI_TTL_JAM", "12")) * 3600)   # session tidak dipakai selama ini dianggap habis
+MAKS_BYTES = int(os.getenv("SESI_MAKS_BYTES", "8192"))
+SAPU_DETIK = int(os.getenv("SESI_SAPU_DETIK", "300"))
+PREFIX_REDIS = "sesi:"
+POLA_ID = re.compile(r"^[A-Za-z0-9_-]{43}$")   # secrets.token_urlsafe(32)
+
+
+class SesiTerlaluBesar(RuntimeError):
+    """Isi session melewati MAKS_BYTES sehingga tidak bisa disimpan."""
+
+
+class SesiServer(CallbackDict, SessionMixin):
+    def __init__(self, data=None, sid=None, kedaluwarsa=0):
+        def saat_berubah(self):
+            self.modified = True
+        super().__init__(data, saat_berubah)
+        self.sid = sid
+        self.kedaluwarsa = kedaluwarsa
+        self.modified = False
+        self.ditolak = False   # sudah gagal disimpan (terlalu besar) di request ini
+
+
+# --- Backend penyimpanan ---
+class PenyimpananSQLite:
+    """Session di tabel sesi database utama, lewat pool koneksi db.py."""
+
+    def __init__(self):
+        self._terakhir_sapu = time.time()
+        self._lock = threading.Lock()
+
+    def ambil(self, sid, sekarang):
+        with db.pinjam(readonly=True) as conn:
+            row = conn.execute("SELECT data, kedaluwarsa FROM sesi WHERE id = ? AND kedaluwarsa > ?",
+                               (sid, sekarang)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def simpan(self, sid, data, kedaluwarsa):
+        with db.pinjam() as conn:
+            conn.execute("INSERT OR REPLACE INTO sesi (id, data, kedaluwarsa) VALUES (?, ?, ?)",
+                         (sid, data, kedaluwarsa))
+            conn.commit()
+        self.sapu_berkala()
+
+    def perpanjang(self, sid, kedaluwarsa):
+        with db.pinjam() as conn:
+            conn.execute("UPDATE sesi SET kedaluwarsa = ? WHERE id = ?", (kedaluwarsa, sid))
+            conn.commit()
+        self.sapu_berkala()
+
+    def hapus(self, sid):
+        with db.pinjam() as conn:
+            conn.execute("DELETE FROM sesi WHERE id = ?", (sid,))
+            conn.commit()
+
+    def sapu_berkala(self):
+        # Paling sering sekali per SAPU_DETIK per worker, menumpang request yang memang menulis session
+        with self._lock:
+            if time.time() - self._terakhir_sapu < SAPU_DETIK:
+                return
+            self._terakhir_sapu = time.time()
+        try:
+            with db.pinjam() as conn:
+                sapu(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Gagal menyapu session kedaluwarsa: %s", e)
+
+    def statistik(self):
+        with db.pinjam(readonly=True) as conn:
+            return statistik(conn)
+
+
+class PenyimpananRedis:
+    """Session di Redis (SETEX), kedaluwarsa ditangani TTL Redis."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self._statistik = (0, None)   # (waktu hitung, hasil)
+        self._lock = threading.Lock()
+
+    def ambil(self, sid, sekarang):
+        pipa = self.redis.pipeline()
+        pipa.get(PREFIX_REDIS + sid)
+        pipa.ttl(PREFIX_REDIS + sid)
+        data, ttl = pipa.execute()
+        return (data, sekarang + max(ttl, 0)) if data is not None else None
+
+    def simpan(self, sid, data, kedaluwarsa):
+        self.redis.setex(PREFIX_REDIS + sid, max(1, kedaluwarsa - int(time.time())), data)
+
+    def perpanjang(self, sid, kedaluwarsa):
+        self.redis.expire(PREFIX_REDIS + sid, max(1, kedaluwarsa - int(time.time())))
+
+    def hapus(self, sid):
+        self.redis.delete(PREFIX_REDIS + sid)
+
+    def statistik(self):
+        # SCAN + STRLEN sebanding jumlah session, jadi hasilnya dipakai ulang
+        # selama SAPU_DETIK alih-alih dihitung di setiap scrape /metrics
+        with self._lock:
+            waktu, hasil = self._statistik
+            if hasil is not None and time.time() - waktu < SAPU_DETIK:
+                return hasil
+            kunci = list(self.redis.scan_iter(match=PREFIX_REDIS + "*", count=1000))
+            pipa = self.redis.pipeline()
+            for k in kunci:
+                pipa.strlen(k)
+            ukuran = pipa.execute() if kunci else []
+            hasil = {'jumlah': len(kunci), 'bytes': sum(ukuran), 'kedaluwarsa': 0}
+            self._statistik = (time.time(), hasil)
+            return hasil
+
+
+# --- Fungsi tabel sesi (dipakai PenyimpananSQLite dan CLI) ---
+def sapu(conn):
+    """Hapus session yang sudah kedaluwarsa (tanpa commit). Mengembalikan jumlah yang dihapus."""
+    return conn.execute("DELETE FROM sesi WHERE kedaluwarsa <= ?", (int(time.time()),)).rowcount
+
+
+def statistik(conn):
+    row = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(length(data)), 0), COALESCE(SUM(kedaluwarsa <= ?), 0) FROM sesi
+    """, (int(time.time()),)).fetchone()
+    return {'jumlah': row[0], 'bytes': row[1], 'kedaluwarsa': row[2]}
+
+
+# --- Session interface Flask ---
+class SesiInterface(SessionInterface):
+    serializer = session_json_serializer
+
+    def __init__(self, penyimpanan, logger):
+        self.penyimpanan = penyimpanan
+        self.logger = logger
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app), "")
+        sekarang = int(time.time())
+        if POLA_ID.match(sid):
+            try:
+                hasil = self.penyimpanan.ambil(sid, sekarang)
+            except Exception as e:
+                logger.warning("Gagal membaca session: %s", e)
+                hasil = None
+            if hasil is not None:
+                data, kedaluwarsa = hasil
+                try:
+                    return SesiServer(self.serializer.loads(data), sid=sid, kedaluwarsa=kedaluwarsa)
+                except ValueError:
+                    pass   # isi rusak: mulai session baru
+        return SesiServer()
+
+    def save_session(self, app, session, response):
+        nama_cookie = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            # Session dikosongkan (logout) atau memang tidak pernah diisi
+            if session.sid is not None:
+                response.delete_cookie(nama_cookie, domain=domain, path=path)
+                try:
+                    self.penyimpanan.hapus(session.sid)
+                except Exception as e:
+                    # Cookie sudah dihapus; barisnya ikut tersapu saat kedaluwarsa
+                    logger.warning("Gagal menghapus session: %s", e)
+            return
+
+        if session.ditolak:
+            return   # respons error untuk session yang sama, jangan gagal dua kali
+
+        sekarang = int(time.time())
+        if session.modified or session.sid is None:
+            data = self.serializer.dumps(dict(session)).encode()
+            if len(data) > MAKS_BYTES:
+                session.ditolak = True
+                self.logger.error(
+                    "Session %s byte melewati batas %s byte, perubahan tidak disimpan. Ukuran per kunci: %s",
+                    len(data), MAKS_BYTES,
+                    ", ".join(f"{k}={len(self.serializer.dumps({k: v}))}" for k, v in session.items())
+                )
+                # Flask mengubahnya menjadi 500 (atau meneruskannya saat debug/testing)
+                raise SesiTerlaluBesar(f"Session {len(data)} byte melewati batas {MAKS_BYTES} byte")
+            sid = session.sid or secrets.token_urlsafe(32)
+            self.penyimpanan.simpan(sid, data, sekarang + TTL_DETIK)
+            response.set_cookie(
+                nama_cookie, sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+        elif session.kedaluwarsa - sekarang < TTL_DETIK * 3 // 4:
+            try:
+                self.penyimpanan.perpanjang(session.sid, sekarang + TTL_DETIK)
+            except Exception as e:
+                logger.warning("Gagal memperpanjang session: %s", e)   # dicoba lagi di request berikutnya
+
+
+def init_app(app, redis=None):
+    """Pasang session server-side. redis: klien Redis, atau None untuk tabel sesi di SQLite."""
+    penyimpanan = PenyimpananRedis(redis) if redis is not None else PenyimpananSQLite()
+    app.session_interface = SesiInterface(penyimpanan, app.logger)
+
+
+def statistik_aktif(app):
+    """Statistik dari backend yang dipakai app, atau None kalau app tidak memakai sesi.py."""
+    antarmuka = app.session_interface
+    if not isinstance(antarmuka, SesiInterface):
+        return None
+    return antarmuka.penyimpanan.statistik()
+
+
+if __name__ == '__main__':
+    perintah = sys.argv[1] if len(sys.argv) > 1 else "statistik"
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if perintah == "sapu":
+            jumlah = sapu(conn)
+            conn.commit()
+            print(f"{jumlah} session kedaluwarsa dihapus.")
+        elif perintah == "statistik":
+            s = statistik(conn)
+            print(f"{s['jumlah']} session, {s['bytes'] / 1024:.1f} KiB, {s['kedaluwarsa']} sudah kedaluwarsa")
+        else:
+            raise SystemExit("Gunakan: python sesi.py statistik | sapu")
+    finally:
+        conn.close()
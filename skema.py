@@ -0,0 +1,611 @@
+# skema.py
+# Migrasi skema database yang berversi.
+# Versi skema disimpan di PRAGMA user_version, jadi setiap migrasi hanya
+# dijalankan sekali. Dipanggil otomatis saat app start, atau manual:
+#   python skema.py           -> jalankan migrasi yang belum diterapkan
+#   python skema.py status    -> tampilkan versi skema saat ini
+import os
+import sys
+import sqlite3
+import logging
+from datetime import date
+
+import kuota
+import kalender
+
+DATABASE = os.getenv("DATABASE", "database.db")
+
+logger = logging.getLogger(__name__)
+
+
+# --- Fungsi Bantuan Rentang Tanggal ---
+# Kolom tanggal clarifications dan cuti_dosen disimpan sebagai teks
+# 'YYYY-MM-DD HH:MM:SS', jadi filter per bulan/tahun cukup memakai perbandingan
+# rentang (tanggal >= awal AND tanggal < akhir) yang bisa memakai indeks, bukan
+# strftime()/date() per baris. Absensi sejak v12 disimpan sebagai bilangan bulat
+# (absensi.nomor_hari, detik_masuk/detik_pulang, lihat di bawah) dan difilter
+# dengan rentang_bulan_hari; teks tanggal/jam absensi hanya ada di view
+# attendance (baca saja) untuk kode lama.
+def rentang_tahun(tahun):
+    tahun = int(tahun)
+    return f"{tahun:04d}-01-01", f"{tahun + 1:04d}-01-01"
+
+
+def rentang_bulan(bulan):
+    """bulan dalam format 'YYYY-MM' -> (awal, akhir) untuk filter rentang."""
+    tahun, bln = map(int, bulan.split('-'))
+    awal = date(tahun, bln, 1)
+    akhir = date(tahun + 1, 1, 1) if bln == 12 else date(tahun, bln + 1, 1)
+    return awal.isoformat(), akhir.isoformat()
+
+
+# --- Absensi ringkas (migrasi v12) ---
+# Tabel absensi menyimpan tanggal sebagai nomor hari sejak 1970-01-01 dan jam
+# masuk/pulang sebagai detik sejak tengah malam. Ekspresi SQL di bawah dipakai
+# view attendance (bentuk teks lama) dan trigger.
+EPOCH = date(1970, 1, 1)
+SQL_TANGGAL = "date({} * 86400, 'unixepoch')"                    # nomor_hari -> 'YYYY-MM-DD'
+SQL_NOMOR_HARI = "CAST(julianday(date({})) - 2440587.5 AS INTEGER)"  # teks tanggal -> nomor_hari
+SQL_DETIK = "CAST(strftime('%s', '1970-01-01 ' || time({})) AS INTEGER)"   # 'HH:MM:SS.ffffff' -> detik
+
+
+def nomor_hari(tanggal):
+    """date atau teks 'YYYY-MM-DD[ HH:MM:SS]' -> nomor hari (kolom absensi.nomor_hari)."""
+    if isinstance(tanggal, str):
+        tanggal = date.fromisoformat(tanggal[:10])
+    return (tanggal - EPOCH).days
+
+
+def rentang_bulan_hari(bulan):
+    """Seperti rentang_bulan, dalam nomor hari untuk filter absensi.nomor_hari."""
+    awal, akhir = rentang_bulan(bulan)
+    return nomor_hari(awal), nomor_hari(akhir)
+
+
+class MigrasiGagal(RuntimeError):
+    """Migrasi tidak bisa dilanjutkan tanpa keputusan admin (pesan berisi rinciannya)."""
+
+
+# --- Daftar Migrasi ---
+# Baris absensi "berisi": sudah diproses/cuti (status selain Hadir) atau jamnya terisi.
+# isi = NULL untuk baris kosong bawaan import, selain itu gabungan semua kolom isinya.
+_STATUS_DIPROSES = "(IFNULL(status, 'Hadir') NOT IN ('Hadir', '') OR IFNULL(keterangan, '') != '')"
+_ISI_ABSENSI = f"""
+    CASE WHEN {_STATUS_DIPROSES} OR NULLIF("jam masuk", '') IS NOT NULL OR NULLIF("jam pulang", '') IS NOT NULL
+         THEN quote(status) || '|' || quote(keterangan) || '|' || quote("jam masuk") || '|' || quote("jam pulang")
+    END"""
+def _v1_indeks_tanggal(conn):
+    # Kolom tanggal ternormalisasi (tanpa jam) sebagai generated column,
+    # supaya bisa diindeks dan dipakai untuk constraint UNIQUE (nip, tgl).
+    conn.execute("""
+        ALTER TABLE attendance
+        ADD COLUMN tgl TEXT GENERATED ALWAYS AS (date(tanggal)) VIRTUAL
+    """)
+    conn.execute("""
+        ALTER TABLE clarifications
+        ADD COLUMN tgl_klarifikasi TEXT GENERATED ALWAYS AS (date(tanggal_klarifikasi)) VIRTUAL
+    """)
+
+    # Data absensi ganda (nip + tanggal sama) harus dibersihkan dulu sebelum
+    # UNIQUE index dibuat. Yang disimpan baris yang paling "berisi" (status
+    # hasil proses/cuti, lalu jam terisi), baru kemudian yang pertama masuk.
+    # Kalau satu (nip, tanggal) punya lebih dari satu versi isi yang berbeda,
+    # migrasi dibatalkan supaya admin memilih sendiri; data tidak dihapus diam-diam.
+    conn.execute(f"""
+        CREATE TEMP TABLE absensi_ganda AS
+        SELECT rowid AS id, nip, tgl, {_ISI_ABSENSI} AS isi,
+               ROW_NUMBER() OVER (
+                   PARTITION BY nip, tgl
+                   ORDER BY {_STATUS_DIPROSES} DESC,
+                            (NULLIF("jam masuk", '') IS NOT NULL) + (NULLIF("jam pulang", '') IS NOT NULL) DESC,
+                            rowid
+               ) AS urutan
+        FROM attendance
+        WHERE tgl IS NOT NULL AND (nip, tgl) IN (
+            SELECT nip, tgl FROM attendance WHERE tgl IS NOT NULL GROUP BY nip, tgl HAVING COUNT(*) > 1
+        )
+    """)
+    konflik = conn.execute("""
+        SELECT nip, tgl, group_concat(id, ', ') FROM absensi_ganda
+        WHERE isi IS NOT NULL
+        GROUP BY nip, tgl HAVING COUNT(DISTINCT isi) > 1
+        ORDER BY nip, tgl
+    """).fetchall()
+    if konflik:
+        daftar = "\n".join(f"  nip {nip}, tanggal {tgl}: rowid {ids}" for nip, tgl, ids in konflik[:50])
+        lainnya = f"\n  ... dan {len(konflik) - 50} lainnya" if len(konflik) > 50 else ""
+        raise MigrasiGagal(
+            f"Migrasi v1: {len(konflik)} (nip, tanggal) absensi punya beberapa baris dengan isi berbeda. "
+            f"Hapus baris yang salah di tabel attendance, lalu jalankan ulang 'python skema.py':\n{daftar}{lainnya}"
+        )
+    duplikat = conn.execute(
+        "DELETE FROM attendance WHERE rowid IN (SELECT id FROM absensi_ganda WHERE urutan > 1)"
+    ).rowcount
+    conn.execute("DROP TABLE absensi_ganda")
+    if duplikat:
+        logger.warning("Migrasi v1: %s baris absensi ganda (kosong atau salinan yang sama) dihapus.", duplikat)
+
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_nip_tgl ON attendance (nip, tgl)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_nip_tanggal ON attendance (nip, tanggal)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_tanggal ON attendance (tanggal)")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clarifications_jurusan_status ON clarifications (jurusan, status)")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_clarifications_nip_jenis_pengajuan
+        ON clarifications (nip, jenis_surat, tanggal_pengajuan)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clarifications_nip_pengajuan ON clarifications (nip, tanggal_pengajuan)")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_clarifications_status_tanggal
+        ON clarifications (status, tanggal_klarifikasi)
+    """)
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_nip ON users (nip)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_jurusan_role ON users (jurusan, role, nama_lengkap)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cuti_dosen_nip ON cuti_dosen (nip, tanggal_mulai)")
+
+
+def _v2_ledger_kuota(conn):
+    # Ledger kuota cuti per (nip, tahun) dan pengajuan klarifikasi per
+    # (nip, bulan, jenis_surat). Dijaga trigger, dibaca lewat kuota.py.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kuota_cuti (
+            nip TEXT NOT NULL, tahun TEXT NOT NULL,
+            cuti_tahunan INTEGER NOT NULL DEFAULT 0, cuti_lain INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (nip, tahun)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kuota_klarifikasi (
+            nip TEXT NOT NULL, bulan TEXT NOT NULL, jenis_surat TEXT NOT NULL,
+            jumlah INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (nip, bulan, jenis_surat)
+        ) WITHOUT ROWID
+    """)
+
+    # Kontribusi satu baris attendance ke ledger cuti (dipakai di beberapa trigger)
+    tambah_cuti = """
+        INSERT INTO kuota_cuti (nip, tahun, cuti_tahunan, cuti_lain)
+        SELECT NEW.nip, substr(NEW.tanggal, 1, 4),
+               NEW.keterangan LIKE 'Cuti Tahunan%', NEW.keterangan NOT LIKE 'Cuti Tahunan%'
+        WHERE NEW.nip IS NOT NULL AND NEW.status = 'Disetujui Kajur' AND NEW.keterangan LIKE 'Cuti%'
+        ON CONFLICT (nip, tahun) DO UPDATE SET
+            cuti_tahunan = cuti_tahunan + excluded.cuti_tahunan,
+            cuti_lain = cuti_lain + excluded.cuti_lain;
+    """
+    kurangi_cuti = """
+        UPDATE kuota_cuti SET
+            cuti_tahunan = cuti_tahunan - (OLD.keterangan LIKE 'Cuti Tahunan%'),
+            cuti_lain = cuti_lain - (OLD.keterangan NOT LIKE 'Cuti Tahunan%')
+        WHERE nip = OLD.nip AND tahun = substr(OLD.tanggal, 1, 4)
+          AND OLD.status = 'Disetujui Kajur' AND OLD.keterangan LIKE 'Cuti%';
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_kuota_cuti_insert AFTER INSERT ON attendance
+        BEGIN {tambah_cuti} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_kuota_cuti_delete AFTER DELETE ON attendance
+        BEGIN {kurangi_cuti} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_kuota_cuti_update
+        AFTER UPDATE OF nip, tanggal, status, keterangan ON attendance
+        BEGIN {kurangi_cuti} {tambah_cuti} END
+    """)
+
+    tambah_klarifikasi = """
+        INSERT INTO kuota_klarifikasi (nip, bulan, jenis_surat, jumlah)
+        SELECT NEW.nip, substr(NEW.tanggal_pengajuan, 1, 7), NEW.jenis_surat, 1
+        WHERE NEW.nip IS NOT NULL
+        ON CONFLICT (nip, bulan, jenis_surat) DO UPDATE SET jumlah = jumlah + 1;
+    """
+    kurangi_klarifikasi = """
+        UPDATE kuota_klarifikasi SET jumlah = jumlah - 1
+        WHERE nip = OLD.nip AND bulan = substr(OLD.tanggal_pengajuan, 1, 7) AND jenis_surat = OLD.jenis_surat;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_kuota_klarifikasi_insert AFTER INSERT ON clarifications
+        BEGIN {tambah_klarifikasi} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_kuota_klarifikasi_delete AFTER DELETE ON clarifications
+        BEGIN {kurangi_klarifikasi} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_kuota_klarifikasi_update
+        AFTER UPDATE OF nip, jenis_surat, tanggal_pengajuan ON clarifications
+        BEGIN {kurangi_klarifikasi} {tambah_klarifikasi} END
+    """)
+
+    kuota.bangun_ulang(conn)
+
+
+def _v3_cache_rekap(conn):
+    # Grid kode rekap per (bulan, nip) dalam bentuk JSON {hari: kode}, diisi oleh rekap.py.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rekap_cache (
+            bulan TEXT NOT NULL, nip TEXT NOT NULL, absensi TEXT NOT NULL,
+            PRIMARY KEY (bulan, nip)
+        ) WITHOUT ROWID
+    """)
+
+    # Invalidasi hanya untuk (nip, bulan) yang barisnya berubah
+    hapus_absensi = "DELETE FROM rekap_cache WHERE bulan = substr({0}.tanggal, 1, 7) AND nip = {0}.nip;"
+    hapus_klarifikasi = "DELETE FROM rekap_cache WHERE bulan = substr({0}.tanggal_klarifikasi, 1, 7) AND nip = {0}.nip;"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rekap_cache_absensi_insert AFTER INSERT ON attendance
+        BEGIN {hapus_absensi.format('NEW')} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rekap_cache_absensi_delete AFTER DELETE ON attendance
+        BEGIN {hapus_absensi.format('OLD')} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rekap_cache_absensi_update
+        AFTER UPDATE OF nip, tanggal, "jam masuk", "jam pulang", status, keterangan ON attendance
+        BEGIN {hapus_absensi.format('OLD')} {hapus_absensi.format('NEW')} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rekap_cache_klarifikasi_insert AFTER INSERT ON clarifications
+        BEGIN {hapus_klarifikasi.format('NEW')} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rekap_cache_klarifikasi_delete AFTER DELETE ON clarifications
+        BEGIN {hapus_klarifikasi.format('OLD')} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_rekap_cache_klarifikasi_update
+        AFTER UPDATE OF nip, tanggal_klarifikasi, kategori_surat, status ON clarifications
+        BEGIN {hapus_klarifikasi.format('OLD')} {hapus_klarifikasi.format('NEW')} END
+    """)
+
+
+def _v4_riwayat_impor(conn):
+    # Workbook yang sudah diimpor backfill.py, dikunci dengan hash isi file:
+    # file yang tidak berubah dilewati saat backfill dijalankan ulang.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS impor_file (
+            sha256 TEXT PRIMARY KEY,
+            nama_file TEXT NOT NULL,
+            baris_absensi INTEGER NOT NULL DEFAULT 0,
+            absensi_baru INTEGER NOT NULL DEFAULT 0,
+            user_baru INTEGER NOT NULL DEFAULT 0,
+            tanggal_impor TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _v5_indeks_paginasi(conn):
+    # Indeks untuk kunci urut paginasi keyset (halaman.py). rowid/id sudah
+    # otomatis ikut di setiap indeks sebagai pemecah seri.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_clarifications_jurusan_pengajuan
+        ON clarifications (jurusan, tanggal_pengajuan)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clarifications_pengajuan ON clarifications (tanggal_pengajuan)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_role_nama ON users (role, nama_lengkap)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cuti_dosen_input ON cuti_dosen (tanggal_input)")
+
+
+def _v6_versi_data(conn):
+    # Nomor versi per tabel ('attendance', ...) dan per dosen ('nip:<nip>'),
+    # dinaikkan setiap kali baris terkait berubah. Dipakai versi.py untuk ETag
+    # respons JSON, jadi cek "apakah berubah" cukup satu lookup primary key.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS versi_data (
+            kunci TEXT PRIMARY KEY, versi INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    naik = "INSERT INTO versi_data (kunci, versi) VALUES ({}, 1) ON CONFLICT(kunci) DO UPDATE SET versi = versi + 1;"
+    for tabel in ("attendance", "clarifications", "users", "cuti_dosen"):
+        for aksi, baris in [("insert", ["NEW"]), ("delete", ["OLD"]), ("update", ["OLD", "NEW"])]:
+            isi = naik.format(f"'{tabel}'") + " ".join(
+                naik.format(f"'nip:' || IFNULL({b}.nip, '')") for b in baris
+            )
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_versi_{tabel}_{aksi} AFTER {aksi.upper()} ON {tabel}
+                BEGIN {isi} END
+            """)
+
+
+def _v7_referensi_unggahan(conn):
+    # Baris mana yang memakai file upload mana (lihat unggahan.py). Dijaga
+    # trigger supaya perintah gc tidak pernah menghapus file yang masih dipakai.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS unggahan_ref (
+            tabel TEXT NOT NULL, baris INTEGER NOT NULL, blob TEXT NOT NULL,
+            PRIMARY KEY (tabel, baris, blob)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_unggahan_ref_blob ON unggahan_ref (blob)")
+
+    for tabel, kolom in (("clarifications", "file_bukti"), ("cuti_dosen", "file_surat_cuti")):
+        tambah = (f"INSERT OR IGNORE INTO unggahan_ref (tabel, baris, blob) "
+                  f"SELECT '{tabel}', NEW.id, NEW.{kolom} WHERE NEW.{kolom} IS NOT NULL;")
+        hapus = f"DELETE FROM unggahan_ref WHERE tabel = '{tabel}' AND baris = OLD.id;"
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_unggahan_{tabel}_insert AFTER INSERT ON {tabel}
+            BEGIN {tambah} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_unggahan_{tabel}_delete AFTER DELETE ON {tabel}
+            BEGIN {hapus} END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_unggahan_{tabel}_update AFTER UPDATE OF id, {kolom} ON {tabel}
+            BEGIN {hapus} {tambah} END
+        """)
+        conn.execute(f"""
+            INSERT OR IGNORE INTO unggahan_ref (tabel, baris, blob)
+            SELECT '{tabel}', id, {kolom} FROM {tabel} WHERE {kolom} IS NOT NULL
+        """)
+
+
+def _v8_kalender(conn):
+    # Satu baris per tanggal; hari libur diimpor lewat kalender.py / halaman /kalender.
+    # Dipakai validasi input cuti (JOIN ke attendance) dan jumlah hari kerja di rekap.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS kalender (
+            tanggal TEXT PRIMARY KEY,
+            hari_kerja INTEGER NOT NULL,
+            keterangan TEXT
+        ) WITHOUT ROWID
+    """)
+    kalender.isi_tahun(conn, kalender.TAHUN_AWAL, kalender.TAHUN_AKHIR)
+
+
+def _v9_antrean_tugas(conn):
+    # Tugas latar belakang (rekap, ekspor, impor) yang dikerjakan worker tugas.py.
+    # status: antre -> berjalan -> selesai | gagal
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tugas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jenis TEXT NOT NULL,
+            parameter TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'antre',
+            progres INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            pesan TEXT,
+            hasil TEXT,
+            file_hasil TEXT,
+            nama_unduhan TEXT,
+            worker TEXT,
+            dibuat_oleh TEXT,
+            dibuat TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            mulai TIMESTAMP,
+            selesai TIMESTAMP,
+            diperbarui TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tugas_status ON tugas (status, id)")
+
+
+def _v10_sesi(conn):
+    # Session server-side (sesi.py): cookie hanya membawa id, isi session berupa JSON.
+    # kedaluwarsa = epoch detik; session lewat waktu disapu berkala.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sesi (
+            id TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            kedaluwarsa INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sesi_kedaluwarsa ON sesi (kedaluwarsa)")
+
+
+def _v11_indeks_pencarian(conn):
+    # Indeks FTS5 untuk pencarian/typeahead (cari.py, /api/cari/<jenis>).
+    # users tidak punya INTEGER PRIMARY KEY (rowid bisa berubah saat VACUUM), jadi
+    # users_fts menyimpan salinan kolomnya sendiri dan disinkronkan per nip.
+    # clarifications punya id yang stabil, jadi cukup external content.
+    # prefix='2 3': pencarian awalan 2-3 huruf (typeahead) tidak perlu memindai seluruh term.
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            nip, nama_lengkap, jurusan, detail_jurusan, role UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)
+    isi_users = """INSERT INTO users_fts (nip, nama_lengkap, jurusan, detail_jurusan, role)
+                   VALUES (NEW.nip, NEW.nama_lengkap, NEW.jurusan, NEW."detail jurusan", NEW.role);"""
+    hapus_users = "DELETE FROM users_fts WHERE nip = OLD.nip;"
+    for aksi, isi in [("insert", isi_users), ("delete", hapus_users), ("update", hapus_users + " " + isi_users)]:
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_users_fts_{aksi} AFTER {aksi.upper()} ON users
+            BEGIN {isi} END
+        """)
+    conn.execute("""
+        INSERT INTO users_fts (nip, nama_lengkap, jurusan, detail_jurusan, role)
+        SELECT nip, nama_lengkap, jurusan, "detail jurusan", role FROM users
+    """)
+
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS clarifications_fts USING fts5(
+            nama_lengkap, jenis_surat, kategori_surat,
+            content = 'clarifications', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)
+    isi_klarifikasi = """INSERT INTO clarifications_fts (rowid, nama_lengkap, jenis_surat, kategori_surat)
+                         VALUES (NEW.id, NEW.nama_lengkap, NEW.jenis_surat, NEW.kategori_surat);"""
+    hapus_klarifikasi = """INSERT INTO clarifications_fts (clarifications_fts, rowid, nama_lengkap, jenis_surat, kategori_surat)
+                           VALUES ('delete', OLD.id, OLD.nama_lengkap, OLD.jenis_surat, OLD.kategori_surat);"""
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_clarifications_fts_insert AFTER INSERT ON clarifications
+        BEGIN {isi_klarifikasi} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_clarifications_fts_delete AFTER DELETE ON clarifications
+        BEGIN {hapus_klarifikasi} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_clarifications_fts_update
+        AFTER UPDATE OF id, nama_lengkap, jenis_surat, kategori_surat ON clarifications
+        BEGIN {hapus_klarifikasi} {isi_klarifikasi} END
+    """)
+    conn.execute("INSERT INTO clarifications_fts (clarifications_fts) VALUES ('rebuild')")
+
+
+def _v12_absensi_ringkas(conn):
+    # attendance (teks 'YYYY-MM-DD 00:00:00' & 'HH:MM:SS.ffffff') dipindah ke tabel
+    # absensi berkolom integer: nomor_hari, detik_masuk, detik_pulang, dan
+    # durasi_detik yang dihitung sekali saat ditulis. Aturan 4 jam cukup
+    # "durasi_detik >= 14400" dan filter bulan memakai rentang integer.
+    # rowid lama disalin ke id (INTEGER PRIMARY KEY), jadi tetap sama dan tidak
+    # berubah lagi saat VACUUM (record_ids form klarifikasi, id_absensi input cuti).
+    # attendance menjadi view baca-saja dengan kolom & format lama, untuk query
+    # laporan/skrip yang masih membaca bentuk teks. Penulisan langsung ke absensi.
+    conn.execute("""
+        CREATE TABLE absensi (
+            id INTEGER PRIMARY KEY,
+            nip TEXT,
+            nama_lengkap TEXT,
+            nomor_hari INTEGER,
+            detik_masuk INTEGER,
+            detik_pulang INTEGER,
+            durasi_detik INTEGER GENERATED ALWAYS AS (detik_pulang - detik_masuk) STORED,
+            status TEXT,
+            keterangan TEXT
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO absensi (id, nip, nama_lengkap, nomor_hari, detik_masuk, detik_pulang, status, keterangan)
+        SELECT rowid, nip, nama_lengkap, {SQL_NOMOR_HARI.format('tanggal')},
+               {SQL_DETIK.format('"jam masuk"')}, {SQL_DETIK.format('"jam pulang"')}, status, keterangan
+        FROM attendance
+    """)
+    tidak_terbaca = conn.execute(f"""
+        SELECT COUNT(*) FROM attendance a JOIN absensi b ON b.id = a.rowid
+        WHERE (a.tanggal IS NOT NULL AND b.nomor_hari IS NULL)
+           OR (NULLIF(a."jam masuk", '') IS NOT NULL AND b.detik_masuk IS NULL)
+           OR (NULLIF(a."jam pulang", '') IS NOT NULL AND b.detik_pulang IS NULL)
+    """).fetchone()[0]
+    if tidak_terbaca:
+        logger.warning("Migrasi v12: %s baris absensi punya tanggal/jam yang tidak terbaca, disimpan kosong.",
+                       tidak_terbaca)
+
+    # Trigger & indeks lama ikut terhapus bersama tabelnya
+    conn.execute("DROP TABLE attendance")
+    conn.execute("CREATE UNIQUE INDEX ux_absensi_nip_hari ON absensi (nip, nomor_hari)")
+    conn.execute("CREATE INDEX idx_absensi_hari ON absensi (nomor_hari)")
+    conn.execute(f"""
+        CREATE VIEW attendance AS
+        SELECT id AS rowid, nip, nama_lengkap,
+               {SQL_TANGGAL.format('nomor_hari')} || ' 00:00:00' AS tanggal,
+               time(detik_masuk, 'unixepoch') || '.000000' AS "jam masuk",
+               time(detik_pulang, 'unixepoch') || '.000000' AS "jam pulang",
+               status, keterangan,
+               {SQL_TANGGAL.format('nomor_hari')} AS tgl
+        FROM absensi
+    """)
+
+    # Trigger v2 (ledger cuti), v3 (cache rekap) dan v6 (versi) dibuat ulang di absensi
+    tahun = "substr(" + SQL_TANGGAL.format('{0}.nomor_hari') + ", 1, 4)"
+    bulan = "substr(" + SQL_TANGGAL.format('{0}.nomor_hari') + ", 1, 7)"
+    tambah_cuti = f"""
+        INSERT INTO kuota_cuti (nip, tahun, cuti_tahunan, cuti_lain)
+        SELECT NEW.nip, {tahun.format('NEW')},
+               NEW.keterangan LIKE 'Cuti Tahunan%', NEW.keterangan NOT LIKE 'Cuti Tahunan%'
+        WHERE NEW.nip IS NOT NULL AND NEW.status = 'Disetujui Kajur' AND NEW.keterangan LIKE 'Cuti%'
+        ON CONFLICT (nip, tahun) DO UPDATE SET
+            cuti_tahunan = cuti_tahunan + excluded.cuti_tahunan,
+            cuti_lain = cuti_lain + excluded.cuti_lain;
+    """
+    kurangi_cuti = f"""
+        UPDATE kuota_cuti SET
+            cuti_tahunan = cuti_tahunan - (OLD.keterangan LIKE 'Cuti Tahunan%'),
+            cuti_lain = cuti_lain - (OLD.keterangan NOT LIKE 'Cuti Tahunan%')
+        WHERE nip = OLD.nip AND tahun = {tahun.format('OLD')}
+          AND OLD.status = 'Disetujui Kajur' AND OLD.keterangan LIKE 'Cuti%';
+    """
+    hapus_cache = "DELETE FROM rekap_cache WHERE bulan = " + bulan + " AND nip = {0}.nip;"
+    naik = "INSERT INTO versi_data (kunci, versi) VALUES ({}, 1) ON CONFLICT(kunci) DO UPDATE SET versi = versi + 1;"
+    versi = {
+        "insert": naik.format("'attendance'") + naik.format("'nip:' || IFNULL(NEW.nip, '')"),
+        "delete": naik.format("'attendance'") + naik.format("'nip:' || IFNULL(OLD.nip, '')"),
+        "update": naik.format("'attendance'") + naik.format("'nip:' || IFNULL(OLD.nip, '')")
+                  + naik.format("'nip:' || IFNULL(NEW.nip, '')"),
+    }
+    for nama, kejadian, isi in [
+        ("trg_kuota_cuti_insert", "INSERT", tambah_cuti),
+        ("trg_kuota_cuti_delete", "DELETE", kurangi_cuti),
+        ("trg_kuota_cuti_update", "UPDATE OF nip, nomor_hari, status, keterangan", kurangi_cuti + tambah_cuti),
+        ("trg_rekap_cache_absensi_insert", "INSERT", hapus_cache.format('NEW')),
+        ("trg_rekap_cache_absensi_delete", "DELETE", hapus_cache.format('OLD')),
+        ("trg_rekap_cache_absensi_update", "UPDATE OF nip, nomor_hari, detik_masuk, detik_pulang, status, keterangan",
+         hapus_cache.format('OLD') + " " + hapus_cache.format('NEW')),
+        ("trg_versi_attendance_insert", "INSERT", versi["insert"]),
+        ("trg_versi_attendance_delete", "DELETE", versi["delete"]),
+        ("trg_versi_attendance_update", "UPDATE", versi["update"]),
+    ]:
+        conn.execute(f"CREATE TRIGGER {nama} AFTER {kejadian} ON absensi BEGIN {isi} END")
+
+
+# (versi, keterangan, fungsi). Versi harus urut dan tidak boleh diubah
+# setelah dirilis; perubahan skema berikutnya selalu ditambahkan di akhir.
+MIGRASI = [
+    (1, "kolom tanggal ternormalisasi + indeks absensi & klarifikasi", _v1_indeks_tanggal),
+    (2, "ledger kuota cuti & klarifikasi", _v2_ledger_kuota),
+    (3, "cache rekap laporan bulanan", _v3_cache_rekap),
+    (4, "riwayat impor workbook (backfill)", _v4_riwayat_impor),
+    (5, "indeks paginasi keyset", _v5_indeks_paginasi),
+    (6, "versi data untuk ETag", _v6_versi_data),
+    (7, "referensi file upload (blob store)", _v7_referensi_unggahan),
+    (8, "kalender hari kerja & hari libur", _v8_kalender),
+    (9, "antrean tugas latar belakang", _v9_antrean_tugas),
+    (10, "session server-side", _v10_sesi),
+    (11, "indeks pencarian FTS5 pengguna & klarifikasi", _v11_indeks_pencarian),
+    (12, "absensi ringkas (nomor hari & detik) + view attendance", _v12_absensi_ringkas),
+]
+
+
+def versi_sekarang(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def jalankan_migrasi(database=DATABASE):
+    """Terapkan semua migrasi yang belum dijalankan. Mengembalikan daftar versi yang diterapkan."""
+    conn = sqlite3.connect(database, timeout=30, isolation_level=None)
+    diterapkan = []
+    try:
+        for versi, keterangan, fungsi in MIGRASI:
+            # BEGIN IMMEDIATE mengunci database, jadi kalau beberapa worker
+            # gunicorn start bersamaan hanya satu yang menjalankan migrasi.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if versi_sekarang(conn) >= versi:
+                    conn.execute("ROLLBACK")
+                    continue
+                logger.info("Menjalankan migrasi skema v%s: %s", versi, keterangan)
+                fungsi(conn)
+                conn.execute(f"PRAGMA user_version = {int(versi)}")
+                conn.execute("COMMIT")
+                diterapkan.append(versi)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
+    return diterapkan
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    perintah = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+
+    if perintah == "status":
+        conn = sqlite3.connect(DATABASE)
+        versi = versi_sekarang(conn)
+        conn.close()
+        print(f"Database {DATABASE}: skema versi {versi} (terbaru: {MIGRASI[-1][0]})")
+    elif perintah == "migrate":
+        try:
+            hasil = jalankan_migrasi(DATABASE)
+        except MigrasiGagal as e:
+            raise SystemExit(str(e))
+        if hasil:
+            print(f"Migrasi diterapkan: {', '.join(f'v{v}' for v in hasil)}")
+        else:
+            print("Skema sudah versi terbaru, tidak ada migrasi yang dijalankan.")
+    else:
+        raise SystemExit(f"Perintah tidak dikenal: {perintah} (gunakan 'migrate' atau 'status')")
@@ -0,0 +1,139 @@
+# snapshot.py
+# Snapshot database khusus laporan (LAPORAN_SNAPSHOT=1).
+# Rekap bulanan, unduhan laporan, ekspor dan ringkasan absensi membaca salinan
+# database.db yang dibuat dengan online backup API SQLite, bukan file yang
+# sedang ditulis submit/proses klarifikasi. Scan sebulan penuh di akhir bulan
+# jadi tidak menahan read transaction (dan checkpoint WAL) di database utama.
+#
+# Snapshot diperbarui oleh worker tugas.py: berkala setiap
+# LAPORAN_SNAPSHOT_MENIT, setelah impor workbook, atau saat admin memintanya
+# (tugas jenis 'snapshot'). Salinan ditulis ke file sementara lalu di-rename,
+# jadi pembaca tidak pernah melihat snapshot setengah jadi. Snapshot tidak
+# pernah ditulis setelah di-rename, jadi dibuka dengan immutable=1 (tanpa lock).
+#
+# rekap_cache: sebelum disalin, cache bulan data terakhir & bulan sebelumnya
+# dilengkapi dulu di database utama (dari data terbaru), jadi snapshot membawa
+# cache yang cocok dengan isinya. Baris yang tetap belum ada di cache dihitung
+# dari snapshot tanpa disimpan: menulis hasil hitungan snapshot ke database
+# utama akan menimpa invalidasi trigger dengan data yang sudah basi.
+#
+# Perintah manual:
+#   python snapshot.py perbarui   -> buat/perbarui snapshot sekarang
+#   python snapshot.py status     -> waktu & ukuran snapshot saat ini
+import os
+import sys
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+import db
+import rekap
+
+logger = logging.getLogger(__name__)
+
+DATABASE = os.getenv("DATABASE", "database.db")
+AKTIF = str(os.getenv("LAPORAN_SNAPSHOT", "0")).lower() in ("1", "true", "yes")
+FILE = os.getenv("LAPORAN_SNAPSHOT_FILE", "{}.laporan{}".format(*os.path.splitext(DATABASE)))
+INTERVAL_MENIT = float(os.getenv("LAPORAN_SNAPSHOT_MENIT", "15"))
+
+
+def dibuat(conn):
+    """Waktu snapshot dibuat ('YYYY-MM-DD HH:MM:SS'), atau None kalau conn bukan koneksi snapshot."""
+    try:
+        row = conn.execute("SELECT nilai FROM snapshot_info WHERE kunci = 'dibuat'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def umur_detik(tujuan=FILE):
+    """Umur file snapshot dalam detik, None kalau belum ada."""
+    try:
+        return time.time() - os.path.getmtime(tujuan)
+    except OSError:
+        return None
+
+
+def _bulan_dihangatkan(conn):
+    terakhir = rekap.bulan_terakhir(conn)
+    tahun, bulan = map(int, terakhir.split('-'))
+    sebelumnya = f"{tahun - 1}-12" if bulan == 1 else f"{tahun}-{bulan - 1:02d}"
+    return [terakhir, sebelumnya]
+
+
+def perbarui(database=DATABASE, tujuan=FILE):
+    """Buat snapshot baru dari database lalu ganti file tujuan secara atomik. Mengembalikan info snapshot."""
+    mulai = time.perf_counter()
+    sumber = sqlite3.connect(database, timeout=30)
+    sumber.row_factory = sqlite3.Row
+    # Nama sementara unik: worker lain bisa saja memperbarui di saat yang sama
+    sementara = f"{tujuan}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        for bulan in _bulan_dihangatkan(sumber):
+            for _ in rekap.iter_dosen(sumber, sumber, bulan):
+                pass
+
+        waktu = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        salinan = sqlite3.connect(sementara)
+        try:
+            # Satu langkah = satu read transaction di database utama. Dengan WAL
+            # penulis tetap jalan selama penyalinan; salinan berisi keadaan saat mulai.
+            sumber.backup(salinan)
+            salinan.execute("PRAGMA journal_mode = DELETE")   # dibaca immutable, tanpa file -wal/-shm
+            salinan.execute("CREATE TABLE IF NOT EXISTS snapshot_info (kunci TEXT PRIMARY KEY, nilai TEXT)")
+            salinan.execute("INSERT OR REPLACE INTO snapshot_info VALUES ('dibuat', ?)", (waktu,))
+            # Id session tidak perlu ikut tersalin ke file lain
+            if salinan.execute("SELECT 1 FROM sqlite_master WHERE name = 'sesi'").fetchone():
+                salinan.execute("DELETE FROM sesi")
+            salinan.commit()
+        finally:
+            salinan.close()
+        os.replace(sementara, tujuan)
+    finally:
+        sumber.close()
+        if os.path.exists(sementara):
+            os.remove(sementara)
+
+    return {
+        'snapshot': tujuan,
+        'dibuat': waktu,
+        'ukuran_mib': round(os.path.getsize(tujuan) / 1024 / 1024, 1),
+        'detik_salin': round(time.perf_counter() - mulai, 2),
+    }
+
+
+def perbarui_kalau_basi(database=DATABASE, tujuan=FILE):
+    """Dipanggil loop worker tugas.py: perbarui kalau snapshot belum ada atau lebih tua dari INTERVAL_MENIT."""
+    if not AKTIF:
+        return None
+    umur = umur_detik(tujuan)
+    if umur is not None and umur < INTERVAL_MENIT * 60:
+        return None
+    try:
+        hasil = perbarui(database, tujuan)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("Gagal memperbarui snapshot laporan: %s", e)
+        return None
+    logger.info("Snapshot laporan diperbarui (%s MiB, %s detik).", hasil['ukuran_mib'], hasil['detik_salin'])
+    return hasil
+
+
+if __name__ == '__main__':
+    perintah = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if perintah == "perbarui":
+        hasil = perbarui()
+        print(f"Snapshot {hasil['snapshot']} dibuat {hasil['dibuat']} "
+              f"({hasil['ukuran_mib']} MiB, {hasil['detik_salin']} detik).")
+    elif perintah == "status":
+        if not os.path.exists(FILE):
+            raise SystemExit(f"Snapshot {FILE} belum ada. Jalankan: python snapshot.py perbarui")
+        conn = sqlite3.connect(db.uri_immutable(FILE), uri=True)
+        try:
+            print(f"Snapshot {FILE}: dibuat {dibuat(conn)}, {os.path.getsize(FILE) / 1024 / 1024:.1f} MiB, "
+                  f"mode snapshot {'aktif' if AKTIF else 'tidak aktif (LAPORAN_SNAPSHOT=1)'}")
+        finally:
+            conn.close()
+    else:
+        raise SystemExit("Gunakan: python snapshot.py perbarui | status")
@@ -0,0 +1,143 @@
+# tests/conftest.py
+# Database uji dibangun dari skema awal (tabel yang dibuat migrasi_data.py untuk
+# database baru, sama dengan database.db sebelum migrasi skema), diisi data
+# contoh kecil, lalu dimigrasikan dengan skema.jalankan_migrasi.
+import os
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+from openpyxl import Workbook
+
+import migrasi_data
+import skema
+
+BULAN = "2025-07"
+
+USERS = [
+    # nip, password, nama_lengkap, jurusan, detail jurusan, role
+    ("admin1", "admin1", "Admin Satu", "-", "-", "Admin"),
+    ("kajur_bp", "kajur_bp", "Kajur BP", "BP", "Budidaya Perikanan", "Kajur"),
+    ("kajur_bt", "kajur_bt", "Kajur BT", "BT", "Budidaya Tanaman", "Kajur"),
+    ("dosen1", "dosen1", "Dosen Satu", "BP", "Budidaya Perikanan", "Dosen"),
+    ("dosen2", "dosen2", "Dosen Dua", "BP", "Budidaya Perikanan", "Dosen"),
+    ("dosen3", "dosen3", "Dosen Tiga", "BT", "Budidaya Tanaman", "Dosen"),
+]
+DOSEN = [u for u in USERS if u[5] == "Dosen"]
+
+# Pola jam per hari kerja (indeks hari ke-n bulan itu mod 5): (jam masuk, jam pulang)
+POLA_JAM = [
+    ("07:30:00.000000", "16:00:00.000000"),   # terpenuhi
+    ("08:00:00.000000", "10:15:00.000000"),   # kurang dari 4 jam
+    (None, "16:24:00.000000"),                # lupa absen masuk
+    (None, None),                             # tidak ada data jam
+    ("07:44:00.000000", "11:44:00.000000"),   # tepat 4 jam
+]
+
+
+def hari_kerja(bulan=BULAN):
+    awal = date.fromisoformat(f"{bulan}-01")
+    hari = awal
+    while hari.month == awal.month:
+        if hari.weekday() < 5:
+            yield hari
+        hari += timedelta(days=1)
+
+
+def baris_absensi():
+    """Baris attendance dalam format teks lama: (nip, nama, tanggal, jam masuk, jam pulang, status, keterangan)."""
+    baris = []
+    for urutan_dosen, (nip, _, nama, *_rest) in enumerate(DOSEN):
+        for i, hari in enumerate(hari_kerja()):
+            masuk, pulang = POLA_JAM[(i + urutan_dosen) % len(POLA_JAM)]
+            baris.append((nip, nama, f"{hari} 00:00:00", masuk, pulang, "Hadir", ""))
+    # Beberapa baris yang sudah diproses sebelum migrasi
+    baris[3] = baris[3][:5] + ("Disetujui Kajur", "Cuti Tahunan - keluarga")
+    baris[8] = baris[8][:5] + ("Ditolak Kajur", "surat tidak sesuai")
+    baris[12] = baris[12][:5] + ("Menunggu Persetujuan Kajur", "")
+    baris[13] = baris[13][:5] + ("Disetujui Kajur", "")
+    # Baris tanpa nip dari sheet import
+    baris.append((None, "Tanpa NIP", f"{BULAN}-15 00:00:00", "07:00:00.000000", "15:00:00.000000", "Hadir", ""))
+    return baris
+
+
+def buat_db_awal(path):
+    """Database versi 0 (sebelum migrasi skema) berisi USERS dan baris_absensi()."""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    migrasi_data.pastikan_tabel_inti(cursor)
+    migrasi_data.pastikan_tabel_lain(cursor)
+    cursor.executemany(
+        'INSERT INTO users (nip, password, nama_lengkap, jurusan, "detail jurusan", role) VALUES (?, ?, ?, ?, ?, ?)',
+        USERS
+    )
+    cursor.executemany("INSERT INTO attendance VALUES (?, ?, ?, ?, ?, ?, ?)", baris_absensi())
+    cursor.execute("""
+        INSERT INTO clarifications (nip, nama_lengkap, jurusan, tanggal_klarifikasi, kategori_surat, jenis_surat, status)
+        VALUES ('dosen1', 'Dosen Satu', 'BP', ?, 'Non Fleksibel', 'Surat Tugas', 'Disetujui')
+    """, (f"{BULAN}-18 00:00:00",))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def buat_workbook(path, bulan="2025-08"):
+    """Workbook impor bulanan kecil: satu user baru (dosen4) dan hari kerja bulan itu untuk dosen1 & dosen4."""
+    wb = Workbook()
+    wb.remove(wb.active)
+    ws_users = wb.create_sheet(migrasi_data.USERS_SHEET)
+    ws_users.append(['nip', 'nama_lengkap', 'jurusan', 'detail jurusan', 'role'])
+    ws_users.append(['dosen1', 'Dosen Satu', 'BP', 'Budidaya Perikanan', 'Dosen'])
+    ws_users.append(['dosen4', 'Dosen Empat', 'BP', 'Budidaya Perikanan', 'Dosen'])
+    for sheet in migrasi_data.ATTENDANCE_SHEETS:
+        wb.create_sheet(sheet).append(['nip', 'nama_lengkap', 'jurusan', 'detail jurusan', 'tanggal', 'jam masuk', 'jam pulang'])
+    ws = wb[migrasi_data.ATTENDANCE_SHEETS[0]]
+    for nip, nama in (('dosen1', 'Dosen Satu'), ('dosen4', 'Dosen Empat')):
+        for hari in hari_kerja(bulan):
+            ws.append([nip, nama, 'BP', 'Budidaya Perikanan', hari.isoformat(), '07:30:00', '16:00:00'])
+    wb.save(path)
+    return path
+
+
+@pytest.fixture
+def db_awal(tmp_path):
+    return buat_db_awal(str(tmp_path / "awal.db"))
+
+
+@pytest.fixture
+def conn(db_awal):
+    """Koneksi ke database contoh yang sudah dimigrasikan ke skema terbaru."""
+    skema.jalankan_migrasi(db_awal)
+    conn = sqlite3.connect(db_awal)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def aplikasi(tmp_path_factory):
+    """Modul app dengan database contoh sendiri (app terikat ke DATABASE saat diimpor)."""
+    folder = tmp_path_factory.mktemp("aplikasi")
+    os.environ["DATABASE"] = buat_db_awal(str(folder / "app.db"))
+    cwd = os.getcwd()
+    os.chdir(folder)   # uploads/ dibuat di folder sementara
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    app.app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def klien(aplikasi):
+    with aplikasi.app.test_client() as klien:
+        yield klien
+
+
+def masuk(klien, nip):
+    """Login tanpa form (verifikasi password bukan bagian yang diuji di sini)."""
+    nama, jurusan, role = next((u[2], u[3], u[5]) for u in USERS if u[0] == nip)
+    with klien.session_transaction() as sesi:
+        sesi.clear()
+        sesi.update(user_id=nip, user_name=nama, user_role=role, user_jurusan=jurusan)
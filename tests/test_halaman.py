@@ -0,0 +1,101 @@
+import pytest
+
+import halaman
+
+from conftest import masuk
+
+
+def _semua_halaman(conn, kolom, dari, params, kunci, limit, turun=True):
+    data, cursor, jumlah_halaman = [], None, 0
+    while True:
+        isi, cursor = halaman.ambil(conn, kolom, dari, params, kunci, cursor, limit, turun=turun)
+        data += isi
+        jumlah_halaman += 1
+        if cursor is None:
+            return data, jumlah_halaman
+
+
+@pytest.mark.parametrize("limit", [1, 7, 23, 500])
+@pytest.mark.parametrize("turun", [True, False])
+def test_cursor_tidak_melewatkan_atau_mengulang_baris(conn, limit, turun):
+    # nomor_hari sama untuk banyak nip, jadi urutan bergantung pada kolom unik terakhir (id)
+    dari = "FROM absensi WHERE nip IS NOT NULL"
+    arah = "DESC" if turun else "ASC"
+    harapan = [row[0] for row in conn.execute(f"SELECT id {dari} ORDER BY nomor_hari {arah}, id {arah}")]
+
+    data, jumlah_halaman = _semua_halaman(conn, "id", dari, (), ["nomor_hari", "id"], limit, turun)
+    assert [row["id"] for row in data] == harapan
+    assert jumlah_halaman == max(1, -(-len(harapan) // limit))
+
+
+def test_kunci_teks_dengan_nilai_kembar(conn):
+    # Banyak baris berstatus sama: halaman berikutnya tetap mulai tepat setelah (status, id) terakhir
+    dari = "FROM absensi WHERE 1"
+    harapan = [row[0] for row in conn.execute(f"SELECT id {dari} ORDER BY status, id")]
+    data, _ = _semua_halaman(conn, "id", dari, (), ["status", "id"], 4, turun=False)
+    assert [row["id"] for row in data] == harapan
+
+
+def test_cursor_tidak_valid(conn):
+    for cursor in ("bukan-base64!", halaman.encode_cursor([1]), halaman.encode_cursor({"a": 1})):
+        with pytest.raises(halaman.CursorTidakValid):
+            halaman.ambil(conn, "id", "FROM absensi WHERE 1", (), ["nomor_hari", "id"], cursor)
+
+
+def test_ukuran_halaman_dibatasi():
+    assert halaman.ukuran(None) == halaman.PAGE_SIZE
+    assert halaman.ukuran("abc") == halaman.PAGE_SIZE
+    assert halaman.ukuran("0") == 1
+    assert halaman.ukuran(str(halaman.MAX_PAGE_SIZE + 1)) == halaman.MAX_PAGE_SIZE
+
+
+def test_api_absensi_per_halaman(klien):
+    masuk(klien, "dosen2")
+    semua = klien.get("/api/absensi?limit=500").get_json()["data"]
+    terkumpul, cursor = [], None
+    while True:
+        respons = klien.get("/api/absensi?limit=5" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        terkumpul += respons["data"]
+        cursor = respons["next_cursor"]
+        if cursor is None:
+            break
+    assert [row["id"] for row in terkumpul] == [row["id"] for row in semua]
+    assert len({row["id"] for row in terkumpul}) == len(terkumpul) > 5
+    assert klien.get("/api/absensi?cursor=rusak").status_code == 400
+
+
+USER_NULL = [("tamu1", None, None), ("tamu2", None, "Dosen"), ("tamu3", "Tamu Tiga", None)]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 5])
+@pytest.mark.parametrize("turun", [True, False])
+def test_kunci_null_tidak_hilang(conn, limit, turun):
+    # users.nama_lengkap dan role boleh NULL; barisnya tetap muncul tepat sekali
+    conn.executemany("INSERT INTO users (nip, nama_lengkap, role) VALUES (?, ?, ?)", USER_NULL)
+    data, _ = _semua_halaman(conn, "nip", "FROM users WHERE 1", (), ["role", "nama_lengkap", "rowid"], limit, turun)
+    nip = [row["nip"] for row in data]
+    assert sorted(nip) == sorted(row[0] for row in conn.execute("SELECT nip FROM users"))
+    assert len(set(nip)) == len(nip)
+
+
+def test_api_pengguna_dengan_null(aplikasi, klien):
+    with aplikasi.app.app_context():
+        db = aplikasi.get_db_connection()
+        db.executemany("INSERT INTO users (nip, nama_lengkap, role) VALUES (?, ?, ?)", USER_NULL)
+        db.commit()
+    try:
+        masuk(klien, "admin1")
+        terkumpul, cursor = [], None
+        while True:
+            respons = klien.get("/api/pengguna?limit=2" + (f"&cursor={cursor}" if cursor else "")).get_json()
+            terkumpul += [row["nip"] for row in respons["data"]]
+            cursor = respons["next_cursor"]
+            if cursor is None:
+                break
+        assert {"tamu1", "tamu2", "tamu3"} <= set(terkumpul)
+        assert len(set(terkumpul)) == len(terkumpul)
+    finally:
+        with aplikasi.app.app_context():
+            db = aplikasi.get_db_connection()
+            db.execute("DELETE FROM users WHERE nip LIKE 'tamu%'")
+            db.commit()
@@ -0,0 +1,80 @@
+import sqlite3
+
+import kuota
+import skema
+
+from conftest import masuk
+
+
+def _ajukan(conn, nip, nama, jurusan, tanggal, status="Menunggu Kajur"):
+    return conn.execute("""
+        INSERT INTO clarifications (nip, nama_lengkap, jurusan, tanggal_klarifikasi, kategori_surat, jenis_surat, status)
+        VALUES (?, ?, ?, ?, 'Fleksibel', 'Surat Tugas', ?)
+        RETURNING id
+    """, (nip, nama, jurusan, f"{tanggal} 00:00:00", status)).fetchone()[0]
+
+
+def _status_absensi(conn, nip, tanggal):
+    row = conn.execute(
+        "SELECT status, keterangan FROM absensi WHERE nip = ? AND nomor_hari = ?", (nip, skema.nomor_hari(tanggal))
+    ).fetchone()
+    return tuple(row)
+
+
+def test_batch_hasil_per_id(aplikasi, conn):
+    a = _ajukan(conn, "dosen1", "Dosen Satu", "BP", "2025-07-02")
+    b = _ajukan(conn, "dosen2", "Dosen Dua", "BP", "2025-07-03")
+    lain = _ajukan(conn, "dosen3", "Dosen Tiga", "BT", "2025-07-03")
+    sudah = _ajukan(conn, "dosen1", "Dosen Satu", "BP", "2025-07-08", status="Ditolak")
+    conn.commit()
+
+    hasil = aplikasi.proses_klarifikasi_batch(conn, [a, b, lain, sudah, 99999], "setuju", "", "BP")
+    assert hasil == {a: "ok", b: "ok", lain: "bukan_jurusan", sudah: "sudah_diproses", 99999: "tidak_ditemukan"}
+
+    status = dict(conn.execute("SELECT id, status FROM clarifications").fetchall())
+    assert status[a] == status[b] == "Disetujui"
+    assert status[lain] == "Menunggu Kajur"
+    assert status[sudah] == "Ditolak"
+    assert _status_absensi(conn, "dosen1", "2025-07-02")[0] == "Disetujui Kajur"
+    assert _status_absensi(conn, "dosen2", "2025-07-03")[0] == "Disetujui Kajur"
+    # Absensi jurusan lain dan klarifikasi yang sudah diproses tidak disentuh
+    assert _status_absensi(conn, "dosen3", "2025-07-03") == ("Hadir", "")
+    assert _status_absensi(conn, "dosen1", "2025-07-08") == ("Hadir", "")
+
+    # Memproses ulang yang sudah disetujui ditolak
+    assert aplikasi.proses_klarifikasi_batch(conn, [a], "tolak", "terlambat", "BP") == {a: "sudah_diproses"}
+    assert kuota.verifikasi(conn) == []
+
+
+def test_batch_tolak_menulis_alasan(aplikasi, conn):
+    a = _ajukan(conn, "dosen3", "Dosen Tiga", "BT", "2025-07-09")
+    conn.commit()
+
+    assert aplikasi.proses_klarifikasi_batch(conn, [a], "tolak", "surat salah", "BT") == {a: "ok"}
+    row = conn.execute("SELECT status, alasan_penolakan FROM clarifications WHERE id = ?", (a,)).fetchone()
+    assert tuple(row) == ("Ditolak", "surat salah")
+    assert _status_absensi(conn, "dosen3", "2025-07-09") == ("Ditolak Kajur", "surat salah")
+
+
+def test_rute_proses_menolak_input_tidak_valid(klien):
+    masuk(klien, "kajur_bp")
+    for data in ({"clarification_id": "abc", "action": "setuju"}, {"action": "setuju"}):
+        respons = klien.post("/proses_klarifikasi", data=data)
+        assert respons.status_code == 302
+        with klien.session_transaction() as sesi:
+            assert sesi["_flashes"][-1] == ("error", "Klarifikasi tidak valid.")
+
+
+def test_rute_massal_bukan_jurusan(aplikasi, klien):
+    conn = sqlite3.connect(aplikasi.DATABASE)
+    lain = _ajukan(conn, "dosen3", "Dosen Tiga", "BT", "2025-07-11")
+    conn.commit()
+
+    masuk(klien, "kajur_bp")
+    respons = klien.post("/proses_klarifikasi_massal", json={"ids": [lain], "action": "setuju"})
+    assert respons.get_json() == {"hasil": {str(lain): "bukan_jurusan"}, "diproses": 0}
+    assert conn.execute("SELECT status FROM clarifications WHERE id = ?", (lain,)).fetchone()[0] == "Menunggu Kajur"
+    conn.close()
+
+    assert klien.post("/proses_klarifikasi_massal", json={"ids": ["x"], "action": "setuju"}).status_code == 400
+    assert klien.post("/proses_klarifikasi_massal", json={"ids": [lain], "action": "tolak"}).status_code == 400
@@ -0,0 +1,112 @@
+# Hasil klasifikasi vektor dibandingkan dengan rantai if/elif per baris yang
+# dipakai dashboard_dosen dan rekap_laporan_view sebelum klasifikasi.py ada.
+from datetime import datetime
+
+import klasifikasi
+import skema
+
+FORMAT_JAM = '%H:%M:%S.%f'
+
+
+def _durasi_lama(jam_masuk, jam_pulang):
+    return (datetime.strptime(jam_pulang, FORMAT_JAM) - datetime.strptime(jam_masuk, FORMAT_JAM)).total_seconds()
+
+
+def status_lama(rec):
+    jam_masuk, jam_pulang = rec['jam masuk'], rec['jam pulang']
+    status, keterangan = rec['status'], rec['keterangan']
+    if status and status.strip() == "Menunggu Persetujuan Kajur":
+        return 'Menunggu Persetujuan Kajur', 'yellow', False
+    elif status and status.strip() == "Disetujui Kajur":
+        return (keterangan or 'Disetujui Kajur'), 'green', False
+    elif status and status.strip() == "Ditolak Kajur":
+        return f"Ditolak: {keterangan}", 'red', True
+    elif jam_masuk and jam_pulang:
+        if _durasi_lama(jam_masuk, jam_pulang) >= 4 * 3600:
+            return 'Kehadiran Terpenuhi', 'green', False
+        return 'Kehadiran Kurang Dari 4 Jam', 'red', False
+    return 'Perlu Klarifikasi', 'red', True
+
+
+def kode_lama(rec, clarif_dict):
+    nip, tanggal_str = rec['nip'], rec['tanggal'][:10]
+    status, keterangan = rec['status'], rec['keterangan'] or ''
+    kode = 'PK'
+    if status == 'Disetujui Kajur':
+        if 'Cuti' in keterangan:
+            kode = 'CT'
+        elif (nip, tanggal_str) in clarif_dict:
+            kategori = clarif_dict.get((nip, tanggal_str))
+            if kategori and 'Non Fleksibel' in kategori:
+                kode = 'NF'
+            elif kategori and 'Fleksibel' in kategori:
+                kode = 'FL'
+            else:
+                kode = 'IZ'
+        else:
+            kode = 'IZ'
+    elif status == 'Hadir' and rec['jam masuk'] and rec['jam pulang']:
+        if _durasi_lama(rec['jam masuk'], rec['jam pulang']) >= 4 * 3600:
+            kode = 'KT'
+    return kode
+
+
+def _siapkan_contoh(conn):
+    # Disetujui tanpa keterangan: dengan klarifikasi Non Fleksibel, Fleksibel, kategori lain, dan tanpa klarifikasi
+    disetujui = {"2025-07-07": "Non Fleksibel", "2025-07-08": "Fleksibel", "2025-07-09": "Tugas Lain", "2025-07-10": None}
+    for tanggal, kategori in disetujui.items():
+        conn.execute("UPDATE absensi SET status = 'Disetujui Kajur', keterangan = '' WHERE nip = 'dosen2' AND nomor_hari = ?",
+                     (skema.nomor_hari(tanggal),))
+        if kategori:
+            conn.execute("""
+                INSERT INTO clarifications (nip, nama_lengkap, jurusan, tanggal_klarifikasi, kategori_surat, jenis_surat, status)
+                VALUES ('dosen2', 'Dosen Dua', 'BP', ?, ?, 'Surat Tugas', 'Disetujui')
+            """, (f"{tanggal} 00:00:00", kategori))
+    # Disetujui dengan keterangan bukan cuti, ditolak tanpa alasan
+    conn.execute("UPDATE absensi SET status = 'Disetujui Kajur', keterangan = 'Dinas luar' WHERE nip = 'dosen3' AND nomor_hari = ?",
+                 (skema.nomor_hari("2025-07-14"),))
+    conn.execute("UPDATE absensi SET status = 'Ditolak Kajur', keterangan = '' WHERE nip = 'dosen3' AND nomor_hari = ?",
+                 (skema.nomor_hari("2025-07-15"),))
+    conn.commit()
+
+
+def test_sama_dengan_rantai_if_lama(conn):
+    _siapkan_contoh(conn)
+    klarifikasi_disetujui = conn.execute(
+        "SELECT nip, tanggal_klarifikasi, kategori_surat FROM clarifications WHERE status = 'Disetujui'"
+    ).fetchall()
+    clarif_dict = {(k['nip'], k['tanggal_klarifikasi'].split(' ')[0]): k['kategori_surat'] for k in klarifikasi_disetujui}
+    lama = {row['rowid']: dict(row) for row in conn.execute("SELECT * FROM attendance WHERE nip IS NOT NULL")}
+
+    df = klasifikasi.klasifikasi_absensi(
+        conn.execute("SELECT * FROM absensi WHERE nip IS NOT NULL").fetchall(), klarifikasi=klarifikasi_disetujui
+    )
+    assert len(df) == len(lama)
+    kode_terlihat = set()
+    for rec in klasifikasi.ke_records(df):
+        ref = lama[rec['id']]
+        assert (rec['status_text'], rec['status_color'], rec['checkbox_enabled']) == status_lama(ref), ref
+        assert rec['kode'] == kode_lama(ref, clarif_dict), ref
+        assert rec['tanggal_formatted'] == datetime.strptime(ref['tanggal'], '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y')
+        assert rec['hari'] == int(ref['tanggal'][8:10])
+        for kolom in ('jam masuk', 'jam pulang'):
+            harapan = datetime.strptime(ref[kolom], FORMAT_JAM).strftime('%H:%M') if ref[kolom] else " - "
+            assert rec[f"jam_{kolom.split()[1]}_formatted"] == harapan
+        kode_terlihat.add(rec['kode'])
+    # Contoh mencakup semua kode rekap
+    assert kode_terlihat == set(klasifikasi.KODE_REKAP)
+
+
+def test_gaya_ringkas(conn):
+    df = klasifikasi.klasifikasi_absensi(
+        conn.execute("SELECT * FROM absensi WHERE nip = 'dosen1'").fetchall(), gaya='ringkas'
+    )
+    teks = dict(zip(df['status_text'], df['status_color']))
+    assert teks["Kurang Dari 4 Jam"] == "status-red"
+    assert teks["Kehadiran Terpenuhi"] == "status-green"
+    assert (df['jam_masuk_formatted'] == "-").any()
+
+
+def test_data_kosong():
+    assert klasifikasi.klasifikasi_absensi([]).empty
+    assert klasifikasi.ke_records(klasifikasi.klasifikasi_absensi([])) == []
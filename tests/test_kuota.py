@@ -0,0 +1,102 @@
+import sqlite3
+
+import pytest
+
+import kuota
+import skema
+
+from conftest import masuk
+
+
+@pytest.fixture
+def db(aplikasi):
+    conn = sqlite3.connect(aplikasi.DATABASE)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def _absensi_kosong(db, nip, jumlah=1):
+    """Baris absensi hari kerja tanpa jam yang belum diproses (boleh diisi cuti / diklarifikasi)."""
+    return db.execute("""
+        SELECT a.id, a.nomor_hari, date(a.nomor_hari * 86400, 'unixepoch') AS tgl
+        FROM absensi a
+        JOIN kalender k ON k.tanggal = date(a.nomor_hari * 86400, 'unixepoch')
+        WHERE a.nip = ? AND k.hari_kerja AND a.status = 'Hadir'
+          AND a.detik_masuk IS NULL AND a.detik_pulang IS NULL
+        ORDER BY a.nomor_hari LIMIT ?
+    """, (nip, jumlah)).fetchall()
+
+
+def _cuti(db, nip):
+    row = db.execute("SELECT cuti_tahunan, cuti_lain FROM kuota_cuti WHERE nip = ? AND tahun = '2025'", (nip,)).fetchone()
+    return tuple(row) if row else (0, 0)
+
+
+@pytest.mark.parametrize("nip, nama, jenis_cuti, tambah", [
+    ("dosen1", "Dosen Satu", "Cuti Tahunan", (1, 0)),
+    ("dosen3", "Dosen Tiga", "Cuti Sakit", (0, 1)),
+])
+def test_input_cuti_mengisi_ledger(klien, db, nip, nama, jenis_cuti, tambah):
+    hari = _absensi_kosong(db, nip)[0]
+    sebelum = _cuti(db, nip)
+
+    masuk(klien, "admin1")
+    respons = klien.post("/input_cuti", data={
+        "nip": nip, "nama_lengkap": nama, "tanggal_surat": hari["tgl"],
+        "start_date": hari["tgl"], "end_date": hari["tgl"], "jenis_cuti": jenis_cuti, "alasan_cuti": "uji",
+    })
+    assert respons.status_code == 302
+
+    status = db.execute("SELECT status, keterangan FROM absensi WHERE id = ?", (hari["id"],)).fetchone()
+    assert tuple(status) == ("Disetujui Kajur", f"{jenis_cuti} - uji")
+    assert _cuti(db, nip) == (sebelum[0] + tambah[0], sebelum[1] + tambah[1])
+    assert kuota.verifikasi(db) == []
+
+
+def test_klarifikasi_disetujui_dan_ditolak(klien, db):
+    setuju, tolak = _absensi_kosong(db, "dosen2", 2)
+    bulan_pengajuan = db.execute("SELECT strftime('%Y-%m', 'now')").fetchone()[0]
+    sebelum = kuota.jumlah_klarifikasi(db, "dosen2", bulan_pengajuan).get("Surat Tugas", 0)
+
+    masuk(klien, "dosen2")
+    respons = klien.post("/submit_klarifikasi", data={
+        "record_ids": [str(setuju["id"]), str(tolak["id"])],
+        "kategori_surat": "Fleksibel", "jenis_surat": "Surat Tugas",
+    })
+    assert respons.status_code == 302
+    assert kuota.jumlah_klarifikasi(db, "dosen2", bulan_pengajuan)["Surat Tugas"] == sebelum + 2
+    assert kuota.verifikasi(db) == []
+
+    id_klarifikasi = {
+        row["tgl_klarifikasi"]: row["id"] for row in db.execute(
+            "SELECT id, tgl_klarifikasi FROM clarifications WHERE nip = 'dosen2' AND status = 'Menunggu Kajur'"
+        )
+    }
+    masuk(klien, "kajur_bp")
+    klien.post("/proses_klarifikasi", data={"clarification_id": id_klarifikasi[setuju["tgl"]], "action": "setuju"})
+    klien.post("/proses_klarifikasi", data={
+        "clarification_id": id_klarifikasi[tolak["tgl"]], "action": "tolak", "alasan_penolakan": "tidak lengkap",
+    })
+
+    hasil = {row["id"]: (row["status"], row["keterangan"]) for row in db.execute(
+        "SELECT id, status, keterangan FROM absensi WHERE id IN (?, ?)", (setuju["id"], tolak["id"])
+    )}
+    assert hasil[setuju["id"]][0] == "Disetujui Kajur"
+    assert hasil[tolak["id"]] == ("Ditolak Kajur", "tidak lengkap")
+    # Klarifikasi yang diproses tidak mengubah hitungan pengajuan, cuti juga tidak berubah
+    assert kuota.jumlah_klarifikasi(db, "dosen2", bulan_pengajuan)["Surat Tugas"] == sebelum + 2
+    assert _cuti(db, "dosen2") == (0, 0)
+    assert kuota.verifikasi(db) == []
+
+
+def test_bangun_ulang_sama_dengan_ledger(conn):
+    conn.execute(
+        "UPDATE absensi SET status = 'Disetujui Kajur', keterangan = 'Cuti Tahunan - x' WHERE nip = 'dosen3' AND nomor_hari = ?",
+        (skema.nomor_hari("2025-07-02"),)
+    )
+    conn.commit()
+    sebelum = conn.execute("SELECT * FROM kuota_cuti ORDER BY nip, tahun").fetchall()
+    kuota.bangun_ulang(conn)
+    assert [tuple(r) for r in conn.execute("SELECT * FROM kuota_cuti ORDER BY nip, tahun")] == [tuple(r) for r in sebelum]
+    assert kuota.verifikasi(conn) == []
@@ -0,0 +1,59 @@
+# Impor workbook bulanan (migrasi_data.run_migration): statistik saat berhasil,
+# kesalahan diteruskan ke pemanggil saat gagal.
+import sqlite3
+
+import pytest
+
+import migrasi_data
+from conftest import buat_workbook, hari_kerja
+
+
+def _jumlah(db, sql):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_impor_berhasil(db_awal, tmp_path):
+    workbook = buat_workbook(str(tmp_path / "agustus.xlsx"))
+    jumlah_hari = len(list(hari_kerja("2025-08")))
+
+    hasil = migrasi_data.run_migration(workbook, db_awal)
+    assert hasil['users'] == 1
+    assert hasil['absensi'] == 2 * jumlah_hari
+    assert hasil['dilewati'] == 0
+    assert _jumlah(db_awal, "SELECT COUNT(*) FROM attendance WHERE tanggal LIKE '2025-08-%'") == 2 * jumlah_hari
+
+    # Impor ulang: semua baris sudah ada
+    hasil = migrasi_data.run_migration(workbook, db_awal)
+    assert (hasil['users'], hasil['absensi'], hasil['dilewati']) == (0, 0, 2 * jumlah_hari)
+
+
+def test_impor_gagal_dilempar(db_awal, tmp_path, monkeypatch):
+    workbook = buat_workbook(str(tmp_path / "agustus.xlsx"))
+
+    def gagal(conn, df, chunk_size=None):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(migrasi_data, "tulis_absensi", gagal)
+    with pytest.raises(sqlite3.OperationalError, match="disk I/O error"):
+        migrasi_data.run_migration(workbook, db_awal)
+    # Langkah user sudah di-commit sebelum absensi gagal; impor ulang melanjutkannya
+    assert _jumlah(db_awal, "SELECT COUNT(*) FROM users WHERE nip = 'dosen4'") == 1
+    assert _jumlah(db_awal, "SELECT COUNT(*) FROM attendance WHERE tanggal LIKE '2025-08-%'") == 0
+
+    monkeypatch.undo()
+    hasil = migrasi_data.run_migration(workbook, db_awal)
+    assert hasil['users'] == 0
+    assert hasil['absensi'] == 2 * len(list(hari_kerja("2025-08")))
+
+
+def test_main_keluar_dengan_kode_gagal(tmp_path, monkeypatch):
+    import runpy
+    monkeypatch.setattr("sys.argv", ["migrasi_data.py", str(tmp_path / "tidak_ada.xlsx")])
+    monkeypatch.setenv("DATABASE", str(tmp_path / "kosong.db"))
+    with pytest.raises(SystemExit) as keluar:
+        runpy.run_path(migrasi_data.__file__, run_name="__main__")
+    assert keluar.value.code == 1
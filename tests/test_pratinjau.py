@@ -0,0 +1,52 @@
+# Rute /pratinjau: hanya untuk user yang login, varian gagal tidak di-cache.
+import io
+
+import pytest
+from PIL import Image
+
+import unggahan
+from conftest import masuk
+
+
+def _blob(aplikasi, isi, ext):
+    return unggahan._simpan_stream(io.BytesIO(isi), ext, aplikasi.app.config['UPLOAD_FOLDER'])
+
+
+@pytest.fixture
+def gambar(aplikasi):
+    buffer = io.BytesIO()
+    Image.new('RGB', (1600, 900), 'teal').save(buffer, 'PNG')
+    return _blob(aplikasi, buffer.getvalue(), '.png')
+
+
+def test_perlu_login(klien, gambar):
+    with klien.session_transaction() as sesi:
+        sesi.clear()
+    respons = klien.get(f'/pratinjau/thumb/{gambar}')
+    assert respons.status_code == 302
+    assert '/login' in respons.headers['Location']
+    assert 'immutable' not in respons.headers.get('Cache-Control', '')
+
+
+def test_varian_dibuat_dan_di_cache(klien, gambar):
+    masuk(klien, 'dosen1')
+    respons = klien.get(f'/pratinjau/thumb/{gambar}')
+    assert respons.status_code == 200
+    assert respons.mimetype == 'image/jpeg'
+    assert 'immutable' in respons.headers['Cache-Control']
+    with Image.open(io.BytesIO(respons.data)) as img:
+        assert max(img.size) <= 240
+
+
+def test_varian_gagal_tidak_di_cache(aplikasi, klien):
+    rusak = _blob(aplikasi, b"bukan gambar", '.png')
+    masuk(klien, 'dosen1')
+    respons = klien.get(f'/pratinjau/preview/{rusak}')
+    assert respons.status_code == 200
+    assert respons.data == b"bukan gambar"
+    assert 'no-store' in respons.headers['Cache-Control']
+
+
+def test_varian_tidak_dikenal(klien, gambar):
+    masuk(klien, 'dosen1')
+    assert klien.get(f'/pratinjau/besar/{gambar}').status_code == 404
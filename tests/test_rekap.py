@@ -0,0 +1,39 @@
+# rekap_cache diisi lengkapi_cache tanpa menyentuh transaksi milik pemanggil.
+import json
+
+import pytest
+
+import rekap
+from conftest import BULAN, DOSEN, masuk
+
+NIPS = [d[0] for d in DOSEN]
+
+
+def test_lengkapi_cache_menyimpan_grid(conn):
+    grid = rekap.lengkapi_cache(conn, BULAN, NIPS)
+    assert grid == rekap.hitung_kode(conn, BULAN, NIPS)
+    tersimpan = {row['nip']: json.loads(row['absensi'])
+                 for row in conn.execute("SELECT nip, absensi FROM rekap_cache WHERE bulan = ?", (BULAN,))}
+    assert tersimpan == {nip: {str(hari): kode for hari, kode in g.items()} for nip, g in grid.items()}
+    assert not conn.in_transaction
+
+
+def test_lengkapi_cache_menolak_transaksi_pemanggil(conn):
+    conn.execute("UPDATE users SET jatah_cuti_tahunan = 5 WHERE nip = 'dosen1'")
+    assert conn.in_transaction
+    with pytest.raises(RuntimeError):
+        rekap.lengkapi_cache(conn, BULAN, NIPS)
+    # Perubahan pemanggil tidak ikut di-commit
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute("SELECT jatah_cuti_tahunan FROM users WHERE nip = 'dosen1'").fetchone()[0] == 12
+    assert conn.execute("SELECT COUNT(*) FROM rekap_cache").fetchone()[0] == 0
+
+
+def test_rute_rekap_mengisi_cache(aplikasi, klien):
+    masuk(klien, 'admin1')
+    assert klien.get(f'/rekap_laporan_view?bulan={BULAN}').status_code == 200
+    with aplikasi.app.app_context():
+        jumlah = aplikasi.get_db_connection().execute(
+            "SELECT COUNT(*) FROM rekap_cache WHERE bulan = ?", (BULAN,)).fetchone()[0]
+    assert jumlah == len(NIPS)
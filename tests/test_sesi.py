@@ -0,0 +1,104 @@
+# Session server-side (sesi.py) dengan backend tiruan di memori.
+import pytest
+from flask import Flask, session
+
+import sesi
+
+
+class PenyimpananMemori:
+    def __init__(self):
+        self.data = {}
+
+    def ambil(self, sid, sekarang):
+        return self.data.get(sid)
+
+    def simpan(self, sid, data, kedaluwarsa):
+        self.data[sid] = (data, kedaluwarsa)
+
+    def perpanjang(self, sid, kedaluwarsa):
+        self.data[sid] = (self.data[sid][0], kedaluwarsa)
+
+    def hapus(self, sid):
+        self.data.pop(sid, None)
+
+
+@pytest.fixture
+def app_sesi():
+    app = Flask(__name__)
+    app.secret_key = "uji"
+    penyimpanan = PenyimpananMemori()
+    app.session_interface = sesi.SesiInterface(penyimpanan, app.logger)
+
+    @app.route('/isi/<int:ukuran>')
+    def isi(ukuran):
+        session['data'] = "x" * ukuran
+        return "ok"
+
+    @app.route('/baca')
+    def baca():
+        return session.get('data', '-')
+
+    return app, penyimpanan
+
+
+def test_session_disimpan(app_sesi):
+    app, penyimpanan = app_sesi
+    klien = app.test_client()
+    assert klien.get('/isi/10').status_code == 200
+    assert len(penyimpanan.data) == 1
+    assert klien.get('/baca').get_data(as_text=True) == "x" * 10
+
+
+def test_session_terlalu_besar_saat_testing(app_sesi):
+    app, penyimpanan = app_sesi
+    app.config['TESTING'] = True
+    with pytest.raises(sesi.SesiTerlaluBesar):
+        app.test_client().get(f'/isi/{sesi.MAKS_BYTES}')
+    assert penyimpanan.data == {}
+
+
+def test_session_terlalu_besar_jadi_500(app_sesi, caplog):
+    app, penyimpanan = app_sesi
+    klien = app.test_client()
+    respons = klien.get(f'/isi/{sesi.MAKS_BYTES}')
+    assert respons.status_code == 500
+    assert 'Set-Cookie' not in respons.headers
+    assert penyimpanan.data == {}
+    assert any("melewati batas" in r.getMessage() for r in caplog.records)
+
+
+class RedisTiruan:
+    def __init__(self, isi):
+        self.isi = isi
+        self.jumlah_scan = 0
+
+    def scan_iter(self, match, count):
+        self.jumlah_scan += 1
+        return iter(self.isi)
+
+    def pipeline(self):
+        redis = self
+
+        class Pipa:
+            def __init__(self):
+                self.perintah = []
+
+            def strlen(self, kunci):
+                self.perintah.append(len(redis.isi[kunci]))
+
+            def execute(self):
+                return self.perintah
+        return Pipa()
+
+
+def test_statistik_redis_dipakai_ulang(monkeypatch):
+    redis = RedisTiruan({"sesi:a": b"123", "sesi:b": b"45"})
+    penyimpanan = sesi.PenyimpananRedis(redis)
+    assert penyimpanan.statistik() == {'jumlah': 2, 'bytes': 5, 'kedaluwarsa': 0}
+    redis.isi["sesi:c"] = b"6"
+    assert penyimpanan.statistik()['jumlah'] == 2
+    assert redis.jumlah_scan == 1
+
+    monkeypatch.setattr(sesi, "SAPU_DETIK", 0)
+    assert penyimpanan.statistik()['jumlah'] == 3
+    assert redis.jumlah_scan == 2
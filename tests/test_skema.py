@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+import kuota
+import skema
+
+from conftest import baris_absensi
+
+
+def test_migrasi_sampai_versi_terbaru(db_awal):
+    diterapkan = skema.jalankan_migrasi(db_awal)
+    assert diterapkan == [versi for versi, _, _ in skema.MIGRASI]
+    # Jalan kedua tidak melakukan apa-apa
+    assert skema.jalankan_migrasi(db_awal) == []
+
+    conn = sqlite3.connect(db_awal)
+    assert skema.versi_sekarang(conn) == skema.MIGRASI[-1][0]
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    jenis = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE name IN ('absensi', 'attendance')"))
+    assert jenis == {"absensi": "table", "attendance": "view"}
+
+
+def test_view_attendance_sama_dengan_data_lama(conn):
+    lama = baris_absensi()
+    baru = conn.execute("""
+        SELECT rowid, nip, nama_lengkap, tanggal, "jam masuk", "jam pulang", status, keterangan, tgl
+        FROM attendance ORDER BY rowid
+    """).fetchall()
+    # rowid lama (urutan insert mulai 1) tetap dipakai sebagai id absensi
+    assert [tuple(row)[:8] for row in baru] == [(i,) + row for i, row in enumerate(lama, start=1)]
+    assert all(row["tgl"] == row["tanggal"][:10] for row in baru)
+
+
+def test_absensi_berkolom_integer(conn):
+    row = conn.execute(
+        "SELECT * FROM absensi WHERE nip = 'dosen1' AND nomor_hari = ?", (skema.nomor_hari("2025-07-01"),)
+    ).fetchone()
+    assert (row["detik_masuk"], row["detik_pulang"]) == (7 * 3600 + 30 * 60, 16 * 3600)
+    assert row["durasi_detik"] == row["detik_pulang"] - row["detik_masuk"]
+
+    kosong = conn.execute(
+        "SELECT * FROM absensi WHERE nip = 'dosen1' AND nomor_hari = ?", (skema.nomor_hari("2025-07-04"),)
+    ).fetchone()
+    assert kosong["detik_masuk"] is None and kosong["durasi_detik"] is None
+
+    assert skema.rentang_bulan_hari("2025-07") == (skema.nomor_hari("2025-07-01"), skema.nomor_hari("2025-08-01"))
+
+
+def test_trigger_tetap_jalan_di_tabel_absensi(conn):
+    conn.execute("INSERT INTO rekap_cache (bulan, nip, absensi) VALUES ('2025-07', 'dosen2', '{}')")
+    conn.execute(
+        "UPDATE absensi SET status = 'Disetujui Kajur', keterangan = 'Cuti Tahunan - uji' WHERE nip = 'dosen2' AND nomor_hari = ?",
+        (skema.nomor_hari("2025-07-10"),)
+    )
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM rekap_cache WHERE nip = 'dosen2'").fetchone()[0] == 0
+    assert conn.execute("SELECT cuti_tahunan FROM kuota_cuti WHERE nip = 'dosen2' AND tahun = '2025'").fetchone()[0] == 1
+    assert kuota.verifikasi(conn) == []
+
+
+def _tambah_salinan(db_awal, rowid, status, keterangan, jam_masuk="sama", jam_pulang="sama"):
+    conn = sqlite3.connect(db_awal)
+    conn.execute("""
+        INSERT INTO attendance
+        SELECT nip, nama_lengkap, tanggal,
+               CASE WHEN ? = 'sama' THEN "jam masuk" ELSE ? END,
+               CASE WHEN ? = 'sama' THEN "jam pulang" ELSE ? END,
+               ?, ?
+        FROM attendance WHERE rowid = ?
+    """, (jam_masuk, jam_masuk, jam_pulang, jam_pulang, status, keterangan, rowid))
+    conn.commit()
+    conn.close()
+
+
+def test_v1_menyimpan_baris_yang_berisi(db_awal):
+    # rowid 4 (dosen1, 2025-07-04, jam kosong) dibuat polos; salinan yang sudah disetujui masuk belakangan.
+    conn = sqlite3.connect(db_awal)
+    conn.execute("UPDATE attendance SET status = 'Hadir', keterangan = '' WHERE rowid = 4")
+    conn.commit()
+    conn.close()
+    _tambah_salinan(db_awal, 4, "Disetujui Kajur", "Cuti Tahunan - keluarga")
+    _tambah_salinan(db_awal, 4, "Hadir", "")        # salinan kosong yang sama
+    _tambah_salinan(db_awal, 1, "Hadir", "")        # salinan persis baris lengkap
+
+    skema.jalankan_migrasi(db_awal)
+    conn = sqlite3.connect(db_awal)
+    hasil = conn.execute(
+        "SELECT tgl, status, keterangan FROM attendance WHERE nip = 'dosen1' AND tgl IN ('2025-07-01', '2025-07-04')"
+        " ORDER BY tgl"
+    ).fetchall()
+    assert hasil == [("2025-07-01", "Hadir", ""), ("2025-07-04", "Disetujui Kajur", "Cuti Tahunan - keluarga")]
+    assert conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0] == len(baris_absensi())
+    assert kuota.verifikasi(conn) == []
+
+
+def test_v1_dibatalkan_kalau_isi_duplikat_berbeda(db_awal):
+    _tambah_salinan(db_awal, 1, "Hadir", "", jam_masuk="09:00:00.000000")
+
+    with pytest.raises(skema.MigrasiGagal, match=r"nip dosen1, tanggal 2025-07-01"):
+        skema.jalankan_migrasi(db_awal)
+
+    # Tidak ada yang berubah: versi tetap 0 dan kedua baris masih ada
+    conn = sqlite3.connect(db_awal)
+    assert skema.versi_sekarang(conn) == 0
+    assert conn.execute(
+        "SELECT COUNT(*) FROM attendance WHERE nip = 'dosen1' AND tanggal = '2025-07-01 00:00:00'"
+    ).fetchone()[0] == 2
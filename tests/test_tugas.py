@@ -0,0 +1,77 @@
+# Antrean tugas (tugas.py): tugas impor dijalankan worker sekali jalan.
+import os
+
+import pytest
+
+import migrasi_data
+import skema
+import snapshot
+import tugas
+from conftest import buat_workbook
+
+
+@pytest.fixture
+def antrean(db_awal, tmp_path, monkeypatch):
+    skema.jalankan_migrasi(db_awal)
+    monkeypatch.setattr(tugas, "FOLDER", str(tmp_path / "hasil_tugas"))
+    # Pembaruan snapshot setelah impor dicatat saja
+    dibuat = []
+    monkeypatch.setattr(snapshot, "AKTIF", True)
+    monkeypatch.setattr(snapshot, "perbarui", lambda database: dibuat.append(database) or {'dibuat': 'sekarang'})
+    conn = tugas._connect(db_awal)
+    yield conn, dibuat
+    conn.close()
+
+
+def _jalankan(conn, workbook):
+    database = conn.execute("PRAGMA database_list").fetchone()['file']
+    tugas_id = tugas.kirim(conn, 'impor', {'file': workbook, 'database': database, 'hapus_file': True})
+    tugas.jalankan_worker(database, sekali=True)
+    return tugas.status(conn, tugas_id)
+
+
+def test_impor_berhasil_hapus_upload(antrean, tmp_path):
+    conn, dibuat = antrean
+    workbook = buat_workbook(str(tmp_path / "upload.xlsx"))
+
+    hasil = _jalankan(conn, workbook)
+    assert hasil['status'] == 'selesai'
+    assert hasil['hasil']['users'] == 1 and hasil['hasil']['absensi'] > 0
+    assert hasil['hasil']['snapshot'] == 'sekarang'
+    assert len(dibuat) == 1
+    assert not os.path.exists(workbook)
+
+
+def test_impor_gagal_tidak_dianggap_selesai(antrean, tmp_path, monkeypatch):
+    conn, dibuat = antrean
+    workbook = buat_workbook(str(tmp_path / "upload.xlsx"))
+
+    def gagal(conn, df, chunk_size=None):
+        raise RuntimeError("penulisan absensi gagal")
+
+    monkeypatch.setattr(migrasi_data, "tulis_absensi", gagal)
+    hasil = _jalankan(conn, workbook)
+    assert hasil['status'] == 'gagal'
+    assert "penulisan absensi gagal" in hasil['pesan']
+    assert hasil['hasil'] is None
+    # Snapshot tidak diperbarui dan workbook tetap ada untuk diulang
+    assert dibuat == []
+    assert os.path.exists(workbook)
+
+    monkeypatch.undo()
+    monkeypatch.setattr(tugas, "FOLDER", str(tmp_path / "hasil_tugas"))
+    hasil = _jalankan(conn, workbook)
+    assert hasil['status'] == 'selesai'
+    assert hasil['hasil']['users'] == 0 and hasil['hasil']['absensi'] > 0
+    assert not os.path.exists(workbook)
+
+
+def test_impor_tanpa_statistik_absensi_gagal(antrean, tmp_path, monkeypatch):
+    conn, dibuat = antrean
+    workbook = buat_workbook(str(tmp_path / "upload.xlsx"))
+    monkeypatch.setattr(migrasi_data, "run_migration", lambda file, database: {'users': 1})
+
+    hasil = _jalankan(conn, workbook)
+    assert hasil['status'] == 'gagal'
+    assert dibuat == []
+    assert os.path.exists(workbook)
@@ -0,0 +1,81 @@
+# Blob store upload (unggahan.py): dedup saat simpan, gc hanya menghapus blob
+# yang tidak direferensikan dan sudah lewat masa tenggang.
+import io
+import os
+import time
+
+import pratinjau
+import unggahan
+
+
+def _simpan(folder, isi, ext=".jpg"):
+    return unggahan._simpan_stream(io.BytesIO(isi), ext, folder)
+
+
+def _tua(path):
+    lama = time.time() - unggahan.GC_MASA_TENGGANG - 60
+    os.utime(path, (lama, lama))
+
+
+def _klarifikasi(conn, file_bukti):
+    return conn.execute("""
+        INSERT INTO clarifications (nip, nama_lengkap, jurusan, tanggal_klarifikasi, kategori_surat, jenis_surat, file_bukti)
+        VALUES ('dosen1', 'Dosen Satu', 'BP', '2025-07-21 00:00:00', 'Non Fleksibel', 'Surat Tugas', ?)
+    """, (file_bukti,)).lastrowid
+
+
+def test_simpan_dedup(tmp_path):
+    folder = str(tmp_path)
+    a = _simpan(folder, b"isi sama")
+    assert _simpan(folder, b"isi sama") == a
+    assert unggahan.POLA_BLOB.match(a)
+    assert unggahan.statistik(folder) == {"blob": 1, "byte": len(b"isi sama")}
+    with open(unggahan.path_file(a, folder), "rb") as f:
+        assert f.read() == b"isi sama"
+
+
+def test_gc(conn, tmp_path):
+    folder = str(tmp_path)
+    dipakai = _simpan(folder, b"dipakai")
+    yatim = _simpan(folder, b"yatim")
+    baru = _simpan(folder, b"baru saja diupload")
+    for nama in (dipakai, yatim):
+        _tua(unggahan.path_file(nama, folder))
+    # Varian pratinjau ikut dihapus bersama blobnya
+    thumb = pratinjau.path_varian(unggahan.path_file(yatim, folder), 'thumb')
+    open(thumb, "wb").close()
+    # File sementara dari upload yang terputus
+    sisa_tmp = os.path.join(folder, unggahan.FOLDER_BLOB, "tmp", "tmpabc")
+    open(sisa_tmp, "wb").close()
+    _tua(sisa_tmp)
+
+    id_klarifikasi = _klarifikasi(conn, dipakai)
+    conn.commit()
+
+    assert unggahan.gc(conn, folder, dry_run=True) == (2, len(b"yatim"))
+    assert os.path.exists(unggahan.path_file(yatim, folder))
+
+    assert unggahan.gc(conn, folder) == (2, len(b"yatim"))
+    assert not os.path.exists(unggahan.path_file(yatim, folder))
+    assert not os.path.exists(thumb)
+    assert not os.path.exists(sisa_tmp)
+    # Masih direferensikan / masih dalam masa tenggang
+    assert os.path.exists(unggahan.path_file(dipakai, folder))
+    assert os.path.exists(unggahan.path_file(baru, folder))
+
+    # Baris dihapus -> referensi hilang (trigger unggahan_ref) -> blob ikut dibersihkan
+    conn.execute("DELETE FROM clarifications WHERE id = ?", (id_klarifikasi,))
+    conn.commit()
+    assert unggahan.gc(conn, folder) == (1, len(b"dipakai"))
+    assert not os.path.exists(unggahan.path_file(dipakai, folder))
+
+
+def test_gc_referensi_path_lama(conn, tmp_path):
+    # Kolom masih berisi path lama ('uploads\\<blob>'): tetap dihitung sebagai referensi
+    folder = str(tmp_path)
+    nama = _simpan(folder, b"bukti lama")
+    _tua(unggahan.path_file(nama, folder))
+    _klarifikasi(conn, f"uploads\\{nama}")
+    conn.commit()
+    assert unggahan.gc(conn, folder) == (0, 0)
+    assert os.path.exists(unggahan.path_file(nama, folder))
@@ -0,0 +1,85 @@
+# Weak ETag dari versi data (versi.py): 304 selama versinya belum berubah.
+import pytest
+from flask import Flask
+
+import versi
+from conftest import masuk
+
+
+@pytest.fixture
+def app_versi():
+    app = Flask(__name__)
+    keadaan = {'versi': 1, 'dihitung': 0}
+
+    @app.route('/data')
+    def data():
+        def buat():
+            keadaan['dihitung'] += 1
+            return {"versi": keadaan['versi']}
+        return versi.jawab_json(('data', keadaan['versi']), buat)
+
+    @app.route('/gagal')
+    def gagal():
+        return versi.jawab_json(('gagal',), lambda: ({"error": "x"}, 400))
+
+    return app, keadaan
+
+
+def test_jawab_json_304_sampai_versi_berubah(app_versi):
+    app, keadaan = app_versi
+    klien = app.test_client()
+
+    pertama = klien.get('/data')
+    assert pertama.status_code == 200
+    tag, lemah = pertama.get_etag()
+    assert lemah and pertama.headers['Cache-Control'] == "private, no-cache"
+
+    kedua = klien.get('/data', headers={'If-None-Match': pertama.headers['ETag']})
+    assert kedua.status_code == 304
+    assert kedua.data == b""
+    assert kedua.get_etag() == (tag, True)
+    assert keadaan['dihitung'] == 1   # isi tidak dihitung ulang untuk 304
+
+    keadaan['versi'] += 1
+    ketiga = klien.get('/data', headers={'If-None-Match': pertama.headers['ETag']})
+    assert ketiga.status_code == 200
+    assert ketiga.get_json() == {"versi": 2}
+    assert ketiga.get_etag()[0] != tag
+
+
+def test_jawab_json_error_tanpa_etag(app_versi):
+    app, _ = app_versi
+    respons = app.test_client().get('/gagal')
+    assert respons.status_code == 400
+    assert 'ETag' not in respons.headers
+
+
+def test_api_absensi_304_lalu_berubah_setelah_tulis(aplikasi, klien):
+    masuk(klien, 'dosen1')
+    pertama = klien.get('/api/absensi?limit=3')
+    assert pertama.status_code == 200
+    etag = pertama.headers['ETag']
+    assert klien.get('/api/absensi?limit=3', headers={'If-None-Match': etag}).status_code == 304
+    # Parameter lain = ETag lain
+    assert klien.get('/api/absensi?limit=4', headers={'If-None-Match': etag}).status_code == 200
+
+    # Perubahan absensi dosen1 menaikkan versi nip:dosen1 lewat trigger
+    with aplikasi.app.app_context():
+        db = aplikasi.get_db_connection()
+        id_baris = pertama.get_json()["data"][0]["id"]
+        keterangan = db.execute("SELECT keterangan FROM absensi WHERE id = ?", (id_baris,)).fetchone()[0]
+        db.execute("UPDATE absensi SET keterangan = 'diubah' WHERE id = ?", (id_baris,))
+        db.commit()
+    try:
+        berubah = klien.get('/api/absensi?limit=3', headers={'If-None-Match': etag})
+        assert berubah.status_code == 200
+        assert berubah.headers['ETag'] != etag
+    finally:
+        with aplikasi.app.app_context():
+            db = aplikasi.get_db_connection()
+            db.execute("UPDATE absensi SET keterangan = ? WHERE id = ?", (keterangan, id_baris))
+            db.commit()
+
+    # Dosen lain tidak memakai ETag milik dosen1
+    masuk(klien, 'dosen2')
+    assert klien.get('/api/absensi?limit=3', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,354 @@
+# tugas.py
+# Antrean tugas latar belakang untuk pekerjaan berat admin: menyiapkan rekap
+# bulanan, ekspor Excel/CSV, impor workbook absensi, dan memperbarui snapshot
+# laporan (snapshot.py). Rute web hanya
+# mencatat tugas lalu langsung menjawab, jadi worker gunicorn tidak tertahan
+# (dan tidak kena timeout) selama laporan dihitung.
+#
+# Status, progres dan lokasi file hasil selalu disimpan di tabel tugas
+# (skema.py migrasi v9). Kalau Redis tersedia (TUGAS_REDIS, atau SESSION_REDIS
+# saat SESSION_TYPE=redis) worker dibangunkan lewat list Redis; tanpa Redis
+# worker memeriksa tabel tugas setiap TUGAS_POLL_DETIK.
+#
+# Perintah manual:
+#   python tugas.py worker            -> jalankan worker (lihat Procfile)
+#   python tugas.py worker --sekali   -> kerjakan antrean yang ada lalu berhenti
+#   python tugas.py kirim ekspor 2025-07 [xlsx|csv]
+#   python tugas.py kirim rekap 2025-07
+#   python tugas.py kirim impor db_agustus.xlsx
+#   python tugas.py kirim snapshot -
+#   python tugas.py daftar            -> 20 tugas terakhir
+#   python tugas.py bersihkan         -> hapus tugas & file hasil yang sudah kedaluwarsa
+import os
+import sys
+import json
+import logging
+import time
+import shutil
+import socket
+import sqlite3
+import threading
+
+from redis import Redis, RedisError
+
+import db
+import ekspor
+import rekap
+import snapshot
+
+logger = logging.getLogger(__name__)
+
+DATABASE = os.getenv("DATABASE", "database.db")
+FOLDER = os.getenv("TUGAS_FOLDER", os.path.join(os.getcwd(), "hasil_tugas"))
+POLL_DETIK = float(os.getenv("TUGAS_POLL_DETIK", "2"))
+RETENSI_JAM = int(os.getenv("TUGAS_RETENSI_JAM", "24"))           # umur tugas selesai sebelum dihapus
+BATAS_MACET_DETIK = int(os.getenv("TUGAS_BATAS_MACET_DETIK", "900"))  # tugas berjalan tanpa progres dianggap gagal
+KUNCI_REDIS = "tugas:antrean"
+SETIAP_BARIS = 25   # progres dicatat setiap sekian baris
+
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def _url_redis():
+    if os.getenv("TUGAS_REDIS"):
+        return os.getenv("TUGAS_REDIS")
+    if os.getenv("SESSION_TYPE") == "redis":
+        return os.getenv("SESSION_REDIS")
+    return None
+
+
+def redis_client():
+    """Klien Redis untuk membangunkan worker, atau None kalau Redis tidak dikonfigurasi."""
+    global _redis
+    url = _url_redis()
+    if not url:
+        return None
+    with _redis_lock:
+        if _redis is None:
+            _redis = Redis.from_url(url)
+    return _redis
+
+
+def _connect(database=DATABASE):
+    conn = sqlite3.connect(database, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+# --- Sisi web: mencatat & membaca tugas ---
+def kirim(conn, jenis, parameter, dibuat_oleh=None):
+    """Masukkan tugas ke antrean (langsung di-commit). Mengembalikan id tugas."""
+    if jenis not in JENIS:
+        raise ValueError(f"Jenis tugas tidak dikenal: {jenis}")
+    tugas_id = conn.execute(
+        "INSERT INTO tugas (jenis, parameter, dibuat_oleh) VALUES (?, ?, ?)",
+        (jenis, json.dumps(parameter), dibuat_oleh)
+    ).lastrowid
+    conn.commit()
+
+    r = redis_client()
+    if r is not None:
+        try:
+            r.lpush(KUNCI_REDIS, tugas_id)
+        except RedisError as e:
+            # Tugas tetap tercatat; worker akan menemukannya saat polling
+            logger.warning("Gagal memberi tahu worker lewat Redis: %s", e)
+    return tugas_id
+
+
+def status(conn, tugas_id):
+    row = conn.execute("SELECT * FROM tugas WHERE id = ?", (tugas_id,)).fetchone()
+    return _ke_dict(row) if row else None
+
+
+def daftar(conn, limit=20):
+    return [_ke_dict(row) for row in conn.execute("SELECT * FROM tugas ORDER BY id DESC LIMIT ?", (limit,))]
+
+
+def _ke_dict(row):
+    data = dict(row)
+    data['parameter'] = json.loads(data['parameter'] or '{}')
+    data['hasil'] = json.loads(data['hasil']) if data['hasil'] else None
+    return data
+
+
+# --- Jenis tugas ---
+# Setiap fungsi menerima (conn, parameter, lapor, tujuan) dan mengembalikan dict hasil.
+# lapor(selesai, total) mencatat progres; tujuan adalah path file hasil (tanpa ekstensi).
+def _hitung_dosen(conn):
+    return conn.execute("SELECT COUNT(*) FROM users WHERE role = 'Dosen'").fetchone()[0]
+
+
+def _iter_dengan_progres(data, lapor, total):
+    for nomor, item in enumerate(data, start=1):
+        if nomor % SETIAP_BARIS == 0:
+            lapor(nomor, total)
+        yield item
+
+
+def tugas_rekap(conn, parameter, lapor, tujuan):
+    """Hitung & simpan rekap_cache untuk satu bulan, jadi halaman laporan tinggal membaca cache."""
+    bulan = parameter['bulan']
+    total = _hitung_dosen(conn)
+    lapor(0, total)
+    jumlah = sum(1 for _ in _iter_dengan_progres(rekap.iter_dosen(conn, conn, bulan), lapor, total))
+    return {'bulan': bulan, 'dosen': jumlah}
+
+
+def tugas_ekspor(conn, parameter, lapor, tujuan):
+    """Tulis file rekap. Dengan mode snapshot aktif, data dibaca dari snapshot laporan (cache tidak ditulis)."""
+    bulan = parameter['bulan']
+    format_file = parameter.get('format', 'xlsx')
+    sumber = None
+    if snapshot.AKTIF and os.path.exists(snapshot.FILE):
+        sumber = sqlite3.connect(db.uri_immutable(snapshot.FILE), uri=True)
+        sumber.row_factory = sqlite3.Row
+    try:
+        baca = sumber or conn
+        total = _hitung_dosen(baca)
+        lapor(0, total)
+        days_in_month, _ = rekap.info_bulan(bulan)
+        data_dosen = _iter_dengan_progres(rekap.iter_dosen(baca, None if sumber else conn, bulan), lapor, total)
+
+        path = f"{tujuan}.{format_file}"
+        with open(f"{path}.tmp", "wb") as f:
+            if format_file == 'csv':
+                for potongan in ekspor.iter_csv(data_dosen, days_in_month):
+                    f.write(potongan.encode("utf-8"))
+            else:
+                with ekspor.tulis_xlsx(data_dosen, days_in_month, f"Rekap Absensi {bulan}",
+                                       per_jurusan=parameter.get('per_jurusan', False)) as output:
+                    shutil.copyfileobj(output, f)
+        os.replace(f"{path}.tmp", path)
+        data_per = snapshot.dibuat(sumber) if sumber else None
+    finally:
+        if sumber is not None:
+            sumber.close()
+    return {'file': path, 'nama_unduhan': f"Rekap_Absensi_{bulan}.{format_file}", 'data_per': data_per}
+
+
+def tugas_impor(conn, parameter, lapor, tujuan):
+    """Impor workbook bulanan lewat migrasi_data.run_migration.
+
+    File hasil upload web (parameter hapus_file) dihapus hanya setelah impor
+    berhasil; kalau gagal file tetap ada supaya admin bisa mengulang.
+    """
+    import migrasi_data   # pandas & workbook hanya dimuat di worker yang memang mengimpor
+
+    lapor(0, 1)
+    hasil = migrasi_data.run_migration(parameter['file'], parameter['database'])
+    if 'absensi' not in hasil:
+        raise RuntimeError("Impor workbook tidak selesai, lihat log worker.")
+    if parameter.get('hapus_file') and os.path.exists(parameter['file']):
+        os.remove(parameter['file'])
+    if snapshot.AKTIF:
+        # Data bulan baru langsung terlihat di laporan, tidak menunggu pembaruan berkala
+        hasil['snapshot'] = snapshot.perbarui(parameter['database'])['dibuat']
+    lapor(1, 1)
+    return hasil
+
+
+def tugas_snapshot(conn, parameter, lapor, tujuan):
+    """Perbarui snapshot laporan sekarang (diminta admin)."""
+    lapor(0, 1)
+    hasil = snapshot.perbarui(parameter.get('database', DATABASE))
+    lapor(1, 1)
+    return hasil
+
+
+JENIS = {
+    'rekap': tugas_rekap,
+    'ekspor': tugas_ekspor,
+    'impor': tugas_impor,
+    'snapshot': tugas_snapshot,
+}
+
+
+# --- Sisi worker ---
+def klaim(conn, worker):
+    """Ambil tugas antre tertua dan tandai 'berjalan'. None kalau antrean kosong."""
+    row = conn.execute("""
+        UPDATE tugas SET status = 'berjalan', worker = ?, mulai = CURRENT_TIMESTAMP, diperbarui = CURRENT_TIMESTAMP
+        WHERE id = (SELECT id FROM tugas WHERE status = 'antre' ORDER BY id LIMIT 1) AND status = 'antre'
+        RETURNING id, jenis, parameter
+    """, (worker,)).fetchone()
+    conn.commit()
+    return row
+
+
+def kerjakan(conn, conn_status, tugas):
+    """Jalankan satu tugas yang sudah diklaim dan catat hasil/kegagalannya."""
+    tugas_id = tugas['id']
+
+    def lapor(selesai, total):
+        conn_status.execute(
+            "UPDATE tugas SET progres = ?, total = ?, diperbarui = CURRENT_TIMESTAMP WHERE id = ?",
+            (selesai, total, tugas_id)
+        )
+        conn_status.commit()
+
+    os.makedirs(FOLDER, exist_ok=True)
+    mulai = time.perf_counter()
+    try:
+        hasil = JENIS[tugas['jenis']](conn, json.loads(tugas['parameter']), lapor, os.path.join(FOLDER, f"tugas_{tugas_id}"))
+    except Exception as e:
+        logger.exception("Tugas %s (%s) gagal: %s", tugas_id, tugas['jenis'], e)
+        if conn.in_transaction:
+            conn.rollback()
+        conn_status.execute(
+            "UPDATE tugas SET status = 'gagal', pesan = ?, selesai = CURRENT_TIMESTAMP, diperbarui = CURRENT_TIMESTAMP WHERE id = ?",
+            (str(e), tugas_id)
+        )
+        conn_status.commit()
+        return False
+
+    hasil['detik'] = round(time.perf_counter() - mulai, 2)
+    conn_status.execute("""
+        UPDATE tugas SET status = 'selesai', progres = COALESCE(total, progres), file_hasil = ?, nama_unduhan = ?,
+                         hasil = ?, selesai = CURRENT_TIMESTAMP, diperbarui = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (hasil.pop('file', None), hasil.pop('nama_unduhan', None), json.dumps(hasil), tugas_id))
+    conn_status.commit()
+    logger.info("Tugas %s (%s) selesai dalam %s detik.", tugas_id, tugas['jenis'], hasil['detik'])
+    return True
+
+
+def pulihkan(conn):
+    """Tugas 'berjalan' yang lama tidak melapor (worker mati di tengah jalan) ditandai gagal."""
+    jumlah = conn.execute("""
+        UPDATE tugas SET status = 'gagal', pesan = 'Worker berhenti sebelum tugas selesai', selesai = CURRENT_TIMESTAMP
+        WHERE status = 'berjalan' AND diperbarui < datetime('now', ?)
+    """, (f"-{BATAS_MACET_DETIK} seconds",)).rowcount
+    conn.commit()
+    return jumlah
+
+
+def bersihkan(conn):
+    """Hapus tugas selesai/gagal yang lebih tua dari RETENSI_JAM beserta file hasilnya."""
+    rows = conn.execute("""
+        SELECT id, file_hasil FROM tugas
+        WHERE status IN ('selesai', 'gagal') AND selesai < datetime('now', ?)
+    """, (f"-{RETENSI_JAM} hours",)).fetchall()
+    for row in rows:
+        if row['file_hasil'] and os.path.exists(row['file_hasil']):
+            os.remove(row['file_hasil'])
+    conn.executemany("DELETE FROM tugas WHERE id = ?", [(row['id'],) for row in rows])
+    conn.commit()
+    return len(rows)
+
+
+def _tunggu(r):
+    """Tunggu sinyal tugas baru dari Redis, atau tidur sebentar kalau tanpa Redis."""
+    if r is not None:
+        try:
+            r.brpop(KUNCI_REDIS, timeout=max(1, int(POLL_DETIK)))
+            return
+        except RedisError as e:
+            logger.warning("Redis tidak bisa dihubungi, kembali ke polling: %s", e)
+    time.sleep(POLL_DETIK)
+
+
+def jalankan_worker(database=DATABASE, sekali=False, berhenti=None):
+    """Loop worker. sekali=True: berhenti saat antrean kosong. berhenti: threading.Event opsional."""
+    worker = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    conn, conn_status = _connect(database), _connect(database)
+    r = None if sekali else redis_client()
+    terakhir_bersih = 0
+    try:
+        if pulihkan(conn_status):
+            logger.warning("Tugas macet dari worker sebelumnya ditandai gagal.")
+        while berhenti is None or not berhenti.is_set():
+            if time.time() - terakhir_bersih > 3600:
+                bersihkan(conn_status)
+                terakhir_bersih = time.time()
+            if not sekali:
+                snapshot.perbarui_kalau_basi(database)
+            tugas = klaim(conn_status, worker)
+            if tugas is None:
+                if sekali:
+                    break
+                _tunggu(r)
+                continue
+            kerjakan(conn, conn_status, tugas)
+    finally:
+        conn.close()
+        conn_status.close()
+
+
+def mulai_thread_worker(database=DATABASE):
+    """Worker di dalam proses web (untuk development / satu proses saja, TUGAS_WORKER_INTERNAL=1)."""
+    t = threading.Thread(target=jalankan_worker, args=(database,), name="tugas-worker", daemon=True)
+    t.start()
+    return t
+
+
+if __name__ == '__main__':
+    perintah = sys.argv[1] if len(sys.argv) > 1 else "daftar"
+    if perintah == "worker":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+        print(f"Worker tugas berjalan (Redis: {'ya' if _url_redis() else 'tidak'}, folder hasil: {FOLDER})")
+        jalankan_worker(sekali="--sekali" in sys.argv)
+        raise SystemExit(0)
+
+    conn = _connect()
+    try:
+        if perintah == "kirim" and len(sys.argv) > 3:
+            jenis, argumen = sys.argv[2], sys.argv[3]
+            if jenis == "impor":
+                parameter = {'file': os.path.abspath(argumen), 'database': DATABASE}
+            elif jenis == "snapshot":
+                parameter = {'database': DATABASE}
+            else:
+                parameter = {'bulan': argumen, 'format': sys.argv[4] if len(sys.argv) > 4 else 'xlsx'}
+            print(f"Tugas {kirim(conn, jenis, parameter, 'cli')} masuk antrean.")
+        elif perintah == "daftar":
+            for t in daftar(conn):
+                print(f"  #{t['id']} {t['jenis']:<7} {t['status']:<9} {t['progres']}/{t['total'] or '-'} "
+                      f"{t['dibuat']} {t['pesan'] or t['file_hasil'] or ''}")
+        elif perintah == "bersihkan":
+            print(f"{bersihkan(conn)} tugas kedaluwarsa dihapus.")
+        else:
+            raise SystemExit("Gunakan: python tugas.py worker [--sekali] | kirim <rekap|ekspor|impor|snapshot> <bulan|file|-> [format] | daftar | bersihkan")
+    finally:
+        conn.close()
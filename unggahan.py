@@ -0,0 +1,172 @@
+# unggahan.py
+# Penyimpanan file upload (bukti klarifikasi, surat cuti) berbasis isi (content-addressed).
+# File di-hash sha256 sambil ditulis, lalu disimpan sekali saja di
+#   uploads/blobs/<2 hex>/<2 hex>/<sha256><ext>
+# File yang isinya sama (misalnya foto yang sama diupload beberapa dosen)
+# hanya tersimpan satu kali, dan isi file dengan nama tertentu tidak pernah
+# berubah (aman untuk cache "immutable").
+# Kolom file_bukti / file_surat_cuti menyimpan nama blob ("<sha256>.jpg").
+# Tabel unggahan_ref (dijaga trigger, skema.py migrasi v7) mencatat baris mana
+# yang memakai blob mana, dipakai oleh perintah gc.
+#
+# Perintah manual:
+#   python unggahan.py migrate        -> pindahkan file upload lama ke blob store (dedup)
+#   python unggahan.py gc [--dry-run] -> hapus blob yang tidak dipakai baris mana pun
+#   python unggahan.py stats          -> jumlah & ukuran blob
+import os
+import re
+import sys
+import time
+import hashlib
+import sqlite3
+import tempfile
+
+from werkzeug.utils import secure_filename
+
+import pratinjau
+
+DATABASE = os.getenv("DATABASE", "database.db")
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(os.getcwd(), "uploads"))
+FOLDER_BLOB = "blobs"
+UKURAN_BLOK = 64 * 1024
+# Blob yang lebih muda dari ini tidak dihapus gc: upload yang barisnya belum di-commit
+GC_MASA_TENGGANG = int(os.getenv("UPLOAD_GC_GRACE_SECONDS", "3600"))
+
+POLA_BLOB = re.compile(r"^[0-9a-f]{64}(\.[a-z0-9]+)?$")
+
+
+def nama_file(nilai):
+    """Nilai kolom (nama blob, atau path lama 'uploads\\\\foto.jpg') -> nama file saja."""
+    return re.split(r"[\\/]", nilai)[-1] if nilai else nilai
+
+
+def lokasi_blob(nama):
+    """Path relatif terhadap UPLOAD_FOLDER. Nama yang bukan blob (file lama) dikembalikan apa adanya."""
+    if not POLA_BLOB.match(nama):
+        return nama
+    return os.path.join(FOLDER_BLOB, nama[:2], nama[2:4], nama)
+
+
+def path_file(nama, folder=UPLOAD_FOLDER):
+    return os.path.join(folder, lokasi_blob(nama))
+
+
+def _ekstensi(filename):
+    ext = os.path.splitext(secure_filename(filename or ""))[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,8}", ext) else ""
+
+
+def _simpan_stream(stream, ext, folder):
+    """Tulis stream ke file sementara sambil di-hash, lalu pindahkan ke lokasi blob-nya."""
+    folder_tmp = os.path.join(folder, FOLDER_BLOB, "tmp")
+    os.makedirs(folder_tmp, exist_ok=True)
+    h = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=folder_tmp, delete=False) as tmp:
+        try:
+            for blok in iter(lambda: stream.read(UKURAN_BLOK), b""):
+                h.update(blok)
+                tmp.write(blok)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+
+    nama = f"{h.hexdigest()}{ext}"
+    tujuan = os.path.join(folder, lokasi_blob(nama))
+    if os.path.exists(tujuan):
+        # Isi yang sama sudah tersimpan
+        os.remove(tmp.name)
+    else:
+        os.makedirs(os.path.dirname(tujuan), exist_ok=True)
+        # os.replace atomik: upload bersamaan dengan isi sama aman
+        os.replace(tmp.name, tujuan)
+    return nama
+
+
+def simpan(file, folder=UPLOAD_FOLDER):
+    """Simpan werkzeug FileStorage. Mengembalikan nama blob untuk disimpan di database."""
+    return _simpan_stream(file.stream, _ekstensi(file.filename), folder)
+
+
+# --- Pemeliharaan ---
+def migrasi_file_lama(conn, folder=UPLOAD_FOLDER):
+    """Pindahkan file upload lama yang masih dipakai ke blob store dan ubah kolomnya ke nama blob."""
+    dipindah = {}
+    for tabel, kolom in (("clarifications", "file_bukti"), ("cuti_dosen", "file_surat_cuti")):
+        for (nilai,) in conn.execute(f"SELECT DISTINCT {kolom} FROM {tabel} WHERE {kolom} IS NOT NULL").fetchall():
+            nama = nama_file(nilai)
+            if POLA_BLOB.match(nama):
+                continue
+            if nama not in dipindah:
+                path = os.path.join(folder, nama)
+                if not os.path.isfile(path):
+                    print(f"  ! File tidak ditemukan, dilewati: {nama}")
+                    continue
+                with open(path, "rb") as f:
+                    dipindah[nama] = _simpan_stream(f, _ekstensi(nama), folder)
+            conn.execute(f"UPDATE {tabel} SET {kolom} = ? WHERE {kolom} = ?", (dipindah[nama], nilai))
+    conn.commit()
+
+    # File lama baru dihapus setelah database menunjuk ke blob
+    for nama, blob in dipindah.items():
+        os.remove(os.path.join(folder, nama))
+        print(f"  -> {nama} => {blob}")
+    return dipindah
+
+
+def _semua_blob(folder):
+    root = os.path.join(folder, FOLDER_BLOB)
+    for dirpath, dirnames, filenames in os.walk(root):
+        if os.path.abspath(dirpath) == os.path.abspath(os.path.join(root, "tmp")):
+            continue
+        for nama in filenames:
+            if POLA_BLOB.match(nama):
+                yield nama, os.path.join(dirpath, nama)
+
+
+def gc(conn, folder=UPLOAD_FOLDER, dry_run=False):
+    """Hapus blob yang tidak direferensikan (dan file sementara yang tertinggal). Mengembalikan (jumlah, byte)."""
+    dipakai = {nama_file(row[0]) for row in conn.execute("SELECT DISTINCT blob FROM unggahan_ref")}
+    batas = time.time() - GC_MASA_TENGGANG
+    jumlah = ukuran = 0
+
+    calon = [(nama, path) for nama, path in _semua_blob(folder) if nama not in dipakai]
+    folder_tmp = os.path.join(folder, FOLDER_BLOB, "tmp")
+    if os.path.isdir(folder_tmp):
+        calon += [(nama, os.path.join(folder_tmp, nama)) for nama in os.listdir(folder_tmp)]
+
+    for nama, path in calon:
+        stat = os.stat(path)
+        if stat.st_mtime > batas:
+            continue
+        jumlah += 1
+        ukuran += stat.st_size
+        print(f"  {'(dry-run) ' if dry_run else ''}hapus {nama}")
+        if not dry_run:
+            os.remove(path)
+            pratinjau.hapus_varian(path)
+    return jumlah, ukuran
+
+
+def statistik(folder=UPLOAD_FOLDER):
+    blob = [os.path.getsize(path) for _, path in _semua_blob(folder)]
+    return {"blob": len(blob), "byte": sum(blob)}
+
+
+if __name__ == '__main__':
+    perintah = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    conn = sqlite3.connect(DATABASE)
+    try:
+        if perintah == "migrate":
+            hasil = migrasi_file_lama(conn)
+            print(f"{len(hasil)} file lama dipindahkan ke blob store. Statistik: {statistik()}")
+        elif perintah == "gc":
+            jumlah, ukuran = gc(conn, dry_run="--dry-run" in sys.argv)
+            print(f"{jumlah} blob tidak terpakai ({ukuran / 1024:.1f} KiB)"
+                  f"{' akan dihapus' if '--dry-run' in sys.argv else ' dihapus'}.")
+        elif perintah == "stats":
+            print(statistik())
+        else:
+            raise SystemExit(f"Perintah tidak dikenal: {perintah} (gunakan 'migrate', 'gc' atau 'stats')")
+    finally:
+        conn.close()
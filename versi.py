@@ -0,0 +1,44 @@
+# versi.py
+# ETag untuk respons JSON berdasarkan nomor versi data (tabel versi_data,
+# dinaikkan trigger database, lihat skema.py migrasi v6).
+# Browser menyimpan respons dengan "Cache-Control: private, no-cache" dan
+# selalu bertanya ulang dengan If-None-Match; kalau versinya belum berubah
+# server cukup menjawab 304 tanpa menghitung ulang isi respons.
+import hashlib
+
+from flask import request, make_response
+
+# Naikkan kalau format isi respons JSON berubah, supaya ETag lama tidak berlaku
+FORMAT_RESPONS = "3"
+
+
+def ambil(conn, *kunci):
+    """Versi untuk setiap kunci ('attendance', 'nip:<nip>', ...); 0 kalau belum pernah berubah."""
+    rows = conn.execute(
+        f"SELECT kunci, versi FROM versi_data WHERE kunci IN ({', '.join('?' * len(kunci))})",
+        kunci
+    ).fetchall()
+    versi = {row[0]: row[1] for row in rows}
+    return tuple(versi.get(k, 0) for k in kunci)
+
+
+def etag(*bagian):
+    teks = "|".join(str(b) for b in (FORMAT_RESPONS,) + bagian)
+    return hashlib.sha1(teks.encode()).hexdigest()[:24]
+
+
+def jawab_json(bagian, buat_respons):
+    """Respons JSON dengan weak ETag dari `bagian` (versi data + parameter request).
+
+    buat_respons() hanya dipanggil kalau ETag dari browser sudah tidak cocok.
+    """
+    tag = etag(*bagian)
+    if request.if_none_match.contains_weak(tag):
+        resp = make_response("", 304)
+    else:
+        resp = make_response(buat_respons())
+        if resp.status_code != 200:
+            return resp
+    resp.set_etag(tag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp